@@ -0,0 +1,103 @@
+"""
+benchmark_notes_store.py
+
+Compares the previous notes.json storage (load the whole file, check each incoming note against
+every stored one, rewrite the file) with the SQLite NotesStore at a large number of notes.
+
+Measured per operation:
+    save: one /save-notes call with a small batch of new notes
+    read: one /get-notes call (the whole file before; now one page, selected by cursor)
+    chat: the notes of one chat (the whole file filtered in Python before; now one indexed page)
+
+Usage (from src/api_service):
+    python benchmark_notes_store.py --notes 100000 --batch 10 --repeats 5
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from routers.utils.notes_store import NotesStore, DEFAULT_PAGE_SIZE, encode_cursor
+
+
+def make_note(i):
+    return {
+        "type": "quote" if i % 2 else "link",
+        "datetime": f"2024-11-19T07:27:{i % 60:02d}.{i:06d}Z",
+        "chat_id": f"chat-{i // 20}",
+        "content": f"https://seas.harvard.edu/page/{i} saved from the chat as note number {i}",
+    }
+
+
+def legacy_save(path, notes):
+    """The previous save_notes: read-modify-write of the whole JSON file."""
+    with open(path, "r", encoding="utf-8") as f:
+        existing_notes = json.load(f)
+    new_notes = [note for note in notes if note not in existing_notes]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(existing_notes + new_notes, f, indent=4, ensure_ascii=False)
+    return len(new_notes)
+
+
+def legacy_read(path, chat_id=None):
+    with open(path, "r", encoding="utf-8") as f:
+        notes = json.load(f)
+    return [note for note in notes if note["chat_id"] == chat_id] if chat_id else notes
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark notes.json vs the SQLite notes store")
+    parser.add_argument("--notes", type=int, default=100_000, help="Notes already stored")
+    parser.add_argument("--batch", type=int, default=10, help="New notes per save")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement (best is reported)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    existing = [make_note(i) for i in range(args.notes)]
+    counter = [args.notes]
+
+    def next_batch():
+        start = counter[0]
+        counter[0] += args.batch
+        return [make_note(i) for i in range(start, start + args.batch)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "notes.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(existing, f, indent=4, ensure_ascii=False)
+        store = NotesStore(os.path.join(tmp, "notes.db"))
+        store.add_notes(existing)
+        middle = existing[args.notes // 2]
+        cursor = encode_cursor(middle["datetime"], args.notes // 2 + 1)
+        chat_id = middle["chat_id"]
+
+        results = [
+            ("save", best_of(lambda: legacy_save(json_path, next_batch()), args.repeats),
+             best_of(lambda: store.add_notes(next_batch()), args.repeats)),
+            ("read", best_of(lambda: legacy_read(json_path), args.repeats),
+             best_of(lambda: store.list_notes(DEFAULT_PAGE_SIZE, cursor=cursor), args.repeats)),
+            ("chat", best_of(lambda: legacy_read(json_path, chat_id), args.repeats),
+             best_of(lambda: store.list_notes(DEFAULT_PAGE_SIZE, chat_id=chat_id), args.repeats)),
+        ]
+
+    print(f"{args.notes} stored notes, {args.batch} new notes per save, page size {DEFAULT_PAGE_SIZE}")
+    print(f"{'operation':<10}{'notes.json ms':>15}{'sqlite ms':>12}{'speedup':>10}")
+    for name, old, new in results:
+        print(f"{name:<10}{old * 1000:>15.2f}{new * 1000:>12.2f}{old / new:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+benchmark_query_path.py
+
+Compares the blocking /llm/query pipeline against the async pipeline using local stubs
+for Vertex AI (generation + embedding) and Qdrant, so no cloud credentials are needed.
+
+Each simulated request runs: query preprocessing (1 LLM call), query embedding,
+Qdrant search and the final LLM call. The sync path calls the blocking utilities from
+inside a coroutine, exactly like the old chat_query handler, so concurrent requests
+serialize on the event loop. The async path awaits every remote call.
+
+Usage (from src/api_service):
+    python benchmark_query_path.py --requests 20 --llm_latency 0.2 --embed_latency 0.05 --search_latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from routers.utils import qdrant_utils
+from routers.utils.chat_utils import preprocess_user_query, preprocess_user_query_async
+from routers.utils.llm_utils import generate_llm_response, generate_llm_response_async, create_final_prompt
+from routers.utils.qdrant_utils import get_documents_from_qdrant, get_documents_from_qdrant_async
+
+PREPROCESS_RESPONSE = json.dumps({
+    "retrieval_component": "CS degree requirements",
+    "llm_instruction_component": {
+        "format": "bullet points",
+        "content_structure": "brief list",
+        "additional_instructions": "none"
+    }
+})
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """Mimics vertexai GenerativeModel with a fixed round-trip latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        time.sleep(self.latency)
+        return StubResponse(PREPROCESS_RESPONSE)
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        await asyncio.sleep(self.latency)
+        return StubResponse(PREPROCESS_RESPONSE)
+
+
+class StubPoint:
+    def __init__(self, i):
+        self.id = i
+        self.score = 1.0
+        self.payload = {"text": f"document {i}", "url": f"https://seas.harvard.edu/{i}"}
+
+
+class StubQdrantClient:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def search(self, collection_name, query_vector, limit, **kwargs):
+        time.sleep(self.latency)
+        return [StubPoint(i) for i in range(limit)]
+
+
+class StubAsyncQdrantClient(StubQdrantClient):
+    async def search(self, collection_name, query_vector, limit, **kwargs):
+        await asyncio.sleep(self.latency)
+        return [StubPoint(i) for i in range(limit)]
+
+
+def make_embedding_stubs(latency, vector_dim):
+    def embed(text, model, vector_dim_=None):
+        time.sleep(latency)
+        return [0.0] * vector_dim
+
+    async def embed_async(text, model, vector_dim_=None):
+        await asyncio.sleep(latency)
+        return [0.0] * vector_dim
+
+    return embed, embed_async
+
+
+async def sync_request(query, model, client, config, rag_config, prompts):
+    instruction_dict = preprocess_user_query(query, model, config, [], {}, prompts)
+    documents = get_documents_from_qdrant(instruction_dict["retrieval_component"], config, rag_config, client)
+    final_prompt = create_final_prompt(query, instruction_dict["llm_instruction_component"], documents, [], prompts)
+    return generate_llm_response(final_prompt, model, rag_config)
+
+
+async def async_request(query, model, client, config, rag_config, prompts):
+    instruction_dict = await preprocess_user_query_async(query, model, config, [], {}, prompts)
+    documents = await get_documents_from_qdrant_async(instruction_dict["retrieval_component"], config, rag_config, client)
+    final_prompt = create_final_prompt(query, instruction_dict["llm_instruction_component"], documents, [], prompts)
+    return await generate_llm_response_async(final_prompt, model, rag_config)
+
+
+async def run_concurrent(handler, num_requests, *args):
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(f"question {i}", *args) for i in range(num_requests)))
+    return time.perf_counter() - start
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async /llm/query pipeline with local stubs")
+    parser.add_argument("--requests", type=int, default=20, help="Number of concurrent chat requests")
+    parser.add_argument("--llm_latency", type=float, default=0.2, help="Simulated Gemini latency in seconds")
+    parser.add_argument("--embed_latency", type=float, default=0.05, help="Simulated embedding latency in seconds")
+    parser.add_argument("--search_latency", type=float, default=0.05, help="Simulated Qdrant latency in seconds")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = {"embedding_model": "stub", "vector_dim": 256, "qdrant_collection": "stub"}
+    rag_config = {"temperature": 0.75, "max_output_tokens": 2000, "top_p": 0.95, "num_documents": 20}
+    prompts = {"llm_output": "Answer the question.", "query_processing": "Extract the retrieval component."}
+    model = StubGenerativeModel(args.llm_latency)
+    embed, embed_async = make_embedding_stubs(args.embed_latency, config["vector_dim"])
+
+    with patch.object(qdrant_utils, "get_dense_embedding", embed), \
+            patch.object(qdrant_utils, "get_dense_embedding_async", embed_async):
+        sync_time = asyncio.run(run_concurrent(
+            sync_request, args.requests, model, StubQdrantClient(args.search_latency), config, rag_config, prompts
+        ))
+        async_time = asyncio.run(run_concurrent(
+            async_request, args.requests, model, StubAsyncQdrantClient(args.search_latency), config, rag_config, prompts
+        ))
+
+    print(f"Concurrent requests: {args.requests}")
+    print(f"Sync path:  {sync_time:.2f}s total, {args.requests / sync_time:.2f} req/s")
+    print(f"Async path: {async_time:.2f}s total, {args.requests / async_time:.2f} req/s")
+    print(f"Speedup: {sync_time / async_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
+import asyncio
 from fastapi import Depends, HTTPException, Header, APIRouter
 from pydantic import BaseModel
 from typing import List, Optional
-from routers.utils.qdrant_utils import get_documents_from_qdrant, initialize_qdrant_client
-from routers.utils.llm_utils import get_prompts, generate_llm_response, create_final_prompt
+from routers.utils.qdrant_utils import get_documents_from_qdrant_async, initialize_async_qdrant_client
+from routers.utils.llm_utils import get_prompts, generate_llm_response_async, create_final_prompt, LLM_ERROR_MESSAGE
 from routers.utils.config_utils import get_configuration
-from routers.utils.chat_utils import manage_chat_session, preprocess_user_query
+from routers.utils.rate_limiter import configure_shared_rate_limiter, get_shared_rate_limiter
+from routers.utils.embedding_cache import configure_shared_embedding_cache, get_shared_embedding_cache
+from routers.utils.chat_utils import manage_chat_session, preprocess_user_query_async, summarize_history_async
+from routers.utils.embedding_utils import get_dense_embedding_async
+from routers.utils.answer_cache import SemanticAnswerCache, refresh_collection_version
+from routers.utils.session_store import SessionStore, SQLiteSessionBackend
+from routers.utils.history_manager import HistoryManager
 from vertexai.generative_models import GenerativeModel
 
 # Define Router
@@ -24,7 +31,7 @@ QDRANT_API_KEY = "5qJBIKdEycPYlWfaDiAwd-1Hz2z88qaBsSV_UAa4AljpqWpWGzmRTg"
 
 
 # Initialize global dependencies
-qdrant_client = initialize_qdrant_client(QDRANT_URL, QDRANT_API_KEY)
+qdrant_client = initialize_async_qdrant_client(QDRANT_URL, QDRANT_API_KEY)
 print(f"projects/{GCP_PROJECT}/locations/{LOCATION}/endpoints/{MODEL_ENDPOINT}")
 generative_model = GenerativeModel(f"projects/{GCP_PROJECT}/locations/{LOCATION}/endpoints/{MODEL_ENDPOINT}")
 # f"projects/cs-crimsonchat/locations/us-central1/endpoints/1654493420430819328"
@@ -34,8 +41,44 @@ rag_config = {
     "max_output_tokens": 2000,
     "top_p": 0.95,
     "num_documents": 20,
-    "max_history_tokens": 8000,
+    "max_history_tokens": 2000,  # Token budget of the chat history in the final prompt
+    "history_keep_turns": 4,  # Most recent turns never summarized; older ones stay verbatim until summarized
+    "history_summary_max_tokens": 300,
+    "history_summarize_every_turns": 2,  # Turns collected before the rolling summary is updated
+    "requests_per_second": 5,  # Vertex AI request quota shared by all LLM calls in this worker
+    "tokens_per_minute": 1_000_000,  # Vertex AI token quota shared by all LLM calls in this worker
+    "embedding_cache_size": 10_000,  # Max cached query embeddings
+    "embedding_cache_ttl_seconds": 24 * 60 * 60,
+    "embedding_cache_path": None,  # Optional SQLite file to persist query embeddings
+    "answer_cache_size": 1000,  # Max cached answers for history-free queries
+    "answer_cache_max_distance": 0.05,  # Max cosine distance between retrieval embeddings for a cache hit
+    "answer_cache_ttl_seconds": 60 * 60,
+    "session_max_sessions": 10_000,  # Max chat sessions kept in memory
+    "session_max_total_chars": 50_000_000,  # Max characters of chat history kept in memory
+    "session_ttl_seconds": 2 * 60 * 60,  # Idle time after which a chat session expires
+    "session_store_path": "data/sessions.db",  # SQLite file shared by all uvicorn workers (or pass a redis client as backend)
 }
+configure_shared_rate_limiter(rag_config["requests_per_second"], rag_config["tokens_per_minute"])
+configure_shared_embedding_cache(
+    rag_config["embedding_cache_size"], rag_config["embedding_cache_ttl_seconds"], rag_config["embedding_cache_path"]
+)
+answer_cache = SemanticAnswerCache(
+    rag_config["answer_cache_size"], rag_config["answer_cache_max_distance"], rag_config["answer_cache_ttl_seconds"]
+)
+session_store = SessionStore(
+    rag_config["session_max_sessions"],
+    rag_config["session_max_total_chars"],
+    rag_config["session_ttl_seconds"],
+    backend=SQLiteSessionBackend(rag_config["session_store_path"]) if rag_config["session_store_path"] else None,
+)
+history_manager = HistoryManager(
+    rag_config["history_keep_turns"],
+    rag_config["max_history_tokens"],
+    rag_config["history_summary_max_tokens"],
+    rag_config["history_summarize_every_turns"],
+)
+# Background summary updates in flight, at most one per chat_id
+_compaction_tasks = {}
 
 
 # Predefined auth key for demonstration purposes
@@ -71,12 +114,16 @@ async def verify_auth_key(authorization: Optional[str] = Header(None)) -> str:
 
 class ChatRequest(BaseModel):
     query: str
+    # With a chat_id the history is kept server-side and chat_history is only used to start the session
+    chat_id: Optional[str] = None
     chat_history: Optional[List[str]] = []
 
 
 class ChatResponse(BaseModel):
     response: str
-    updated_history: List[str]
+    # Only returned to clients that send their history instead of a chat_id
+    updated_history: Optional[List[str]] = None
+    chat_id: Optional[str] = None
 
 
 @router.post("/query", response_model=ChatResponse, summary="Query the chat endpoint", description="Handles chat queries by the user.")
@@ -88,28 +135,52 @@ async def chat_query(
     Handles chat queries by the user.
 
     Args:
-        request: The chat request containing the query and chat history.
+        request: The chat request containing the query and either a chat_id or the chat history.
         token: The validated token from the Authorization header.
 
     Returns:
-        A ChatResponse object with the response and updated history.
+        A ChatResponse object with the response, and the updated history for clients without a chat_id.
     """
     user_query = request.query.strip()
-    chat_history = request.chat_history or []
+    chat_id = request.chat_id
+    summary = ""
+    if chat_id:
+        if request.chat_history:
+            await asyncio.to_thread(session_store.seed, chat_id, request.chat_history)
+        summary, chat_history, _ = await asyncio.to_thread(session_store.get_with_summary, chat_id)
+    else:
+        chat_history = request.chat_history or []
+
+    # Rolling summary plus the latest turns, within the max_history_tokens budget
+    prompt_history, history_tokens = history_manager.context(summary, chat_history)
 
     # Check if the session should end
-    should_end, end_reason = manage_chat_session(user_query, chat_history, rag_config)
+    should_end, end_reason = manage_chat_session(user_query, prompt_history, rag_config, history_tokens)
     if should_end:
+        if chat_id:
+            await asyncio.to_thread(session_store.clear, chat_id)
         raise HTTPException(status_code=400, detail=end_reason)
 
     # Preprocess user query
-    instruction_dict = preprocess_user_query(
+    instruction_dict = await preprocess_user_query_async(
         user_query, generative_model, master_config, chat_history, {}, prompts
     )
 
+    # Serve history-free queries from the semantic answer cache when a close enough query was answered before
+    query_vector = None
+    use_answer_cache = not chat_history and not summary
+    if use_answer_cache:
+        query_vector = await get_dense_embedding_async(
+            instruction_dict["retrieval_component"], master_config['embedding_model'], master_config['vector_dim']
+        )
+        await refresh_collection_version(answer_cache, qdrant_client, master_config['qdrant_collection'])
+        cached_response = answer_cache.lookup(query_vector)
+        if cached_response is not None:
+            return await finish_turn(chat_id, chat_history, user_query, cached_response)
+
     # Perform Qdrant search
-    knowledge_documents = get_documents_from_qdrant(
-        instruction_dict["retrieval_component"], master_config, rag_config, qdrant_client
+    knowledge_documents = await get_documents_from_qdrant_async(
+        instruction_dict["retrieval_component"], master_config, rag_config, qdrant_client, query_vector
     )
 
     # Create final structured prompt
@@ -117,17 +188,60 @@ async def chat_query(
         user_query=user_query,
         instruction_dict=instruction_dict["llm_instruction_component"],
         knowledge_documents=knowledge_documents,
-        chat_history=chat_history,
+        chat_history=prompt_history,
         prompts=prompts,
     )
 
     # Generate response
-    llm_response = generate_llm_response(
+    llm_response = await generate_llm_response_async(
         final_prompt=final_prompt, generative_model=generative_model, rag_config=rag_config
     )
 
-    # Update chat history
+    if use_answer_cache and query_vector and llm_response != LLM_ERROR_MESSAGE:
+        answer_cache.store(query_vector, llm_response)
+
+    return await finish_turn(chat_id, chat_history, user_query, llm_response)
+
+
+async def finish_turn(chat_id: Optional[str], chat_history: List[str], user_query: str, response: str) -> ChatResponse:
+    """Record the turn in the session store, or return the whole history to clients without a chat_id."""
+    if chat_id:
+        history, _ = await asyncio.to_thread(session_store.append_turn, chat_id, user_query, response)
+        if history_manager.lines_to_compact(history) and chat_id not in _compaction_tasks:
+            # Summarize after responding, so the extra LLM call does not delay this turn
+            task = asyncio.create_task(compact_session(chat_id))
+            _compaction_tasks[chat_id] = task
+            task.add_done_callback(lambda _: _compaction_tasks.pop(chat_id, None))
+        return ChatResponse(response=response, chat_id=chat_id)
     chat_history.append(f"User: {user_query}")
-    chat_history.append(f"Response: {llm_response}")
+    chat_history.append(f"Response: {response}")
+    return ChatResponse(response=response, updated_history=chat_history)
+
+
+async def compact_session(chat_id: str) -> None:
+    """Fold the turns that left the verbatim window of a session into its rolling summary."""
+    try:
+        summary, history, summarized = await asyncio.to_thread(session_store.get_with_summary, chat_id)
 
-    return ChatResponse(response=llm_response, updated_history=chat_history)
+        async def summarize(previous_summary, lines):
+            return await summarize_history_async(previous_summary, lines, generative_model, rag_config)
+
+        result = await history_manager.compact(summary, history, summarize)
+        if result:
+            new_summary, num_lines = result
+            await asyncio.to_thread(session_store.compact, chat_id, new_summary, num_lines, summarized)
+    except Exception as e:
+        print(f"Failed to summarize chat history: {e}")
+
+
+@router.get("/metrics", summary="LLM service metrics", description="Returns rate limiter and cache statistics.")
+async def llm_metrics(_: str = Depends(verify_auth_key)):
+    """
+    Returns queueing delay statistics of the shared Vertex AI rate limiter and embedding cache counters.
+    """
+    return {
+        "rate_limiter": get_shared_rate_limiter().metrics(),
+        "embedding_cache": get_shared_embedding_cache().stats(),
+        "answer_cache": answer_cache.stats(),
+        "sessions": session_store.stats(),
+    }
@@ -0,0 +1,163 @@
+"""
+answer_cache.py
+
+Semantic response cache for /llm/query.
+
+Stores the final LLM answer together with the embedding of the query's retrieval_component.
+A new query whose retrieval embedding lies within `max_distance` (cosine distance) of a cached
+one is answered from the cache, skipping the Qdrant search and the final LLM call.
+
+Embeddings live in one preallocated float32 matrix with unit-normalized rows, so a lookup is a
+single matrix-vector product over the cache. The cache is bounded (least recently used entries
+are replaced first), entries expire after a TTL, and the whole cache is dropped when the Qdrant
+collection changes. Ingestion writes a new version into a reserved point of the collection after
+every write (see vector_database/utils/qdrant_upsert_utils.py); it is read at most every
+`version_check_seconds`.
+
+Usage:
+    cache = SemanticAnswerCache(max_entries=1000, max_distance=0.05)
+    answer = cache.lookup(query_vector)
+    if answer is None:
+        answer = run_rag(...)
+        cache.store(query_vector, answer)
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_DISTANCE = 0.05
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_VERSION_CHECK_SECONDS = 60
+# Reserved point holding the collection version; must match vector_database's qdrant_upsert_utils
+COLLECTION_VERSION_POINT_ID = "b2acfac5-15b3-509d-8364-b5113d6447aa"
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_distance: float = DEFAULT_MAX_DISTANCE,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        version_check_seconds: float = DEFAULT_VERSION_CHECK_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            max_entries (int): Maximum number of cached answers.
+            max_distance (float): Maximum cosine distance between query embeddings for a hit.
+            ttl_seconds (float): Time after which an answer expires. None keeps answers until evicted.
+            version_check_seconds (float): Minimum interval between collection version checks.
+            clock (Callable): Wall clock, injectable for testing.
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._embeddings: Optional[np.ndarray] = None  # allocated on first store, once the dimension is known
+        self._expires_at = np.full(max_entries, -np.inf)
+        self._last_used = np.full(max_entries, -np.inf)
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._collection_version = None
+        self._version_checked_at = -np.inf
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> Optional[np.ndarray]:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        if v.ndim != 1 or norm == 0:
+            return None
+        return v / norm
+
+    def lookup(self, vector: List[float]) -> Optional[str]:
+        """Return the cached answer closest to `vector` if it is within max_distance, else None."""
+        q = self._normalize(vector)
+        now = self._clock()
+        with self._lock:
+            if q is None or self._embeddings is None or q.shape[0] != self._embeddings.shape[1]:
+                self._misses += 1
+                return None
+            similarities = self._embeddings @ q
+            similarities[self._expires_at <= now] = -np.inf
+            best = int(np.argmax(similarities))
+            if 1.0 - similarities[best] > self.max_distance:
+                self._misses += 1
+                return None
+            self._last_used[best] = now
+            self._hits += 1
+            return self._answers[best]
+
+    def store(self, vector: List[float], answer: str) -> None:
+        """Cache `answer` for the query embedding `vector`, replacing the least recently used slot."""
+        v = self._normalize(vector)
+        if v is None:
+            return
+        now = self._clock()
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != v.shape[0]:
+                self._embeddings = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+                self._clear_slots()
+            # Expired and empty slots have the lowest priority, then least recently used
+            priority = np.where(self._expires_at <= now, -np.inf, self._last_used)
+            slot = int(np.argmin(priority))
+            self._embeddings[slot] = v
+            self._answers[slot] = answer
+            self._last_used[slot] = now
+            self._expires_at[slot] = now + self.ttl_seconds if self.ttl_seconds else np.inf
+
+    def _clear_slots(self) -> None:
+        self._expires_at[:] = -np.inf
+        self._last_used[:] = -np.inf
+        self._answers = [None] * self.max_entries
+
+    def invalidate(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._clear_slots()
+            self._invalidations += 1
+
+    def version_check_due(self) -> bool:
+        return self._clock() - self._version_checked_at >= self.version_check_seconds
+
+    def update_collection_version(self, version) -> None:
+        """Record the collection version (None if no version was written yet); a change since the last check invalidates the cache."""
+        if self._version_checked_at > -np.inf and version != self._collection_version:
+            self.invalidate()
+        self._version_checked_at = self._clock()
+        self._collection_version = version
+
+    def stats(self) -> Dict[str, float]:
+        """Hit-rate metrics since the cache was created."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "size": int(np.count_nonzero(self._expires_at > self._clock())),
+                "invalidations": self._invalidations,
+            }
+
+
+async def refresh_collection_version(cache: SemanticAnswerCache, qdrant_client, collection_name: str) -> None:
+    """
+    Invalidate `cache` if the Qdrant collection changed since the last check.
+    The version is the one ingestion last wrote into the reserved version point.
+    """
+    if not cache.version_check_due():
+        return
+    try:
+        records = await qdrant_client.retrieve(
+            collection_name=collection_name, ids=[COLLECTION_VERSION_POINT_ID], with_payload=True, with_vectors=False
+        )
+        cache.update_collection_version(records[0].payload.get("collection_version") if records else None)
+    except Exception as e:
+        print(f"Failed to check collection version: {e}")
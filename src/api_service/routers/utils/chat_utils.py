@@ -1,14 +1,16 @@
 import json
-from routers.utils.llm_utils import get_llm_response
+from routers.utils.llm_utils import get_llm_response, get_llm_response_async, LLM_ERROR_MESSAGE
+from routers.utils.rate_limiter import estimate_tokens
 
 
-def manage_chat_session(query, chat_history, rag_config):
+def manage_chat_session(query, chat_history, rag_config, history_tokens=None):
     """
     Check if session should end based on user input or chat history limits.
     Args:
         query: The user's query
         chat_history: List of chat messages
         rag_config: dict of config containing max_history_tokens
+        history_tokens: Token estimate of chat_history if already known (e.g. kept by the session store)
     Returns:
         (bool, str): Tuple containing:
         - should_end: True if session should end, False if continuing
@@ -18,8 +20,9 @@ def manage_chat_session(query, chat_history, rag_config):
     if query.lower() == 'end':
         return True, "User requested to end the session."
     # Check chat history token limit
-    combined_history = "\n".join(chat_history)
-    token_count = history_estimate_tokens_from_words(combined_history)
+    if history_tokens is None:
+        history_tokens = history_estimate_tokens_from_words("\n".join(chat_history))
+    token_count = history_tokens
 
     if token_count > rag_config['max_history_tokens']:
         return True, "Chat history has exceeded the maximum token limit. Please start a new session."
@@ -30,8 +33,7 @@ def history_estimate_tokens_from_words(text):
     # Estimate the number of tokens in a string or list of strings
     if isinstance(text, list):  # Join list elements if input is a list of strings
         text = " ".join(text)
-    words = text.split()  # Split text into words to estimate token count
-    return int(len(words) * 1.3)  # Estimate: 1 word ~ 1.3 tokens
+    return estimate_tokens(text)
 
 
 def preprocess_user_query(query, generative_model, config, chat_history, last_instruction_dict, prompts):
@@ -67,6 +69,34 @@ def preprocess_user_query(query, generative_model, config, chat_history, last_in
     return result or get_fallback_response(query)
 
 
+async def preprocess_user_query_async(query, generative_model, config, chat_history, last_instruction_dict, prompts):
+    """
+    Async variant of preprocess_user_query; awaits the LLM instead of blocking the event loop.
+
+    Returns:
+        dict: Same structure as preprocess_user_query.
+    """
+    instruction_prompt = prompts['query_processing']
+    query = add_context_to_query(query, chat_history, last_instruction_dict)
+
+    response = await get_llm_response_async(
+        prompt=build_preprocess_prompt(query, instruction_prompt),
+        generative_model=generative_model,
+        rag_config=config
+    )
+    result = parse_and_validate_llm_response(response)
+
+    if not result:
+        print("Debug: First response parsing failed. Response:", response)
+        retry_response = await get_llm_response_async(
+            prompt=build_json_retry_prompt(query, instruction_prompt),
+            generative_model=generative_model,
+            rag_config=config
+        )
+        result = parse_and_validate_llm_response(retry_response)
+    return result or get_fallback_response(query)
+
+
 def add_context_to_query(query, chat_history, last_instruction_dict):
     """
     Append relevant context from chat history and last instructions to the user query.
@@ -80,24 +110,45 @@ def add_context_to_query(query, chat_history, last_instruction_dict):
     return query
 
 
-def get_llm_preprocess_user_prompt(query, prompt, generative_model, config):
+JSON_FORMAT_INSTRUCTIONS = (
+    "IMPORTANT: Return response ONLY in this JSON format, do not wrap in ``` or 'json':\n"
+    '{"retrieval_component": "what to retrieve",\n'
+    ' "llm_instruction_component": {\n'
+    '    "format": "output format",\n'
+    '    "content_structure": "content structure",\n'
+    '    "additional_instructions": "other instructions"\n'
+    '}}'
+)
+
+
+def build_preprocess_prompt(query, prompt):
     """
-    Retrieve the LLM response with a specific prompt to preprocess the user query.
+    Build the prompt asking the LLM to split the user query into retrieval and instruction components.
     """
-    full_prompt = (
+    return (
         f"Query might contain history/context, extract what seems helpful for current query, ignore irrelevant, and combine with latest query\n"
         f"query: {query} \n"
         f"{prompt}\n\n"
-        "IMPORTANT: Return response ONLY in this JSON format, do not wrap in ``` or 'json':\n"
-        '{"retrieval_component": "what to retrieve",\n'
-        ' "llm_instruction_component": {\n'
-        '    "format": "output format",\n'
-        '    "content_structure": "content structure",\n'
-        '    "additional_instructions": "other instructions"\n'
-        '}}'
+        f"{JSON_FORMAT_INSTRUCTIONS}"
+    )
+
+
+def build_json_retry_prompt(query, prompt):
+    """
+    Build the stricter retry prompt used when the first preprocessing response is not valid JSON.
+    """
+    return (
+        f"Query: {query}, Instruction Prompt: {prompt}\n\n"
+        f"{JSON_FORMAT_INSTRUCTIONS}"
     )
+
+
+def get_llm_preprocess_user_prompt(query, prompt, generative_model, config):
+    """
+    Retrieve the LLM response with a specific prompt to preprocess the user query.
+    """
     return get_llm_response(
-        prompt=full_prompt,
+        prompt=build_preprocess_prompt(query, prompt),
         generative_model=generative_model,
         rag_config=config
     )
@@ -143,18 +194,8 @@ def retry_with_json_format_prompt(query, prompt, generative_model, config):
     """
     Retry the LLM response with a prompt enforcing a specific JSON response format.
     """
-    retry_prompt = (
-        f"Query: {query}, Instruction Prompt: {prompt}\n\n"
-        "IMPORTANT: Return response ONLY in this JSON format, do not wrap in ``` or 'json':\n"
-        '{"retrieval_component": "what to retrieve",\n'
-        ' "llm_instruction_component": {\n'
-        '    "format": "output format",\n'
-        '    "content_structure": "content structure",\n'
-        '    "additional_instructions": "other instructions"\n'
-        '}}'
-    )
     response = get_llm_response(
-        prompt=retry_prompt,
+        prompt=build_json_retry_prompt(query, prompt),
         generative_model=generative_model,
         rag_config=config
     )
@@ -173,3 +214,43 @@ def get_fallback_response(query):
             "additional_instructions": "Keep response concise"
         }
     }
+
+
+def build_summary_prompt(previous_summary, lines, max_words):
+    """
+    Build the prompt asking the LLM to fold new conversation turns into the running summary.
+    """
+    previous = previous_summary or "None yet."
+    turns = "\n".join(lines)
+    return (
+        f"Update the summary of a conversation between a user and the Harvard SEAS assistant.\n"
+        f"Keep the facts, names, courses, links and user preferences that later questions may refer to; "
+        f"drop greetings and repetition. Answer with the updated summary only, in at most {max_words} words.\n\n"
+        f"Current summary: {previous}\n\n"
+        f"New turns:\n{turns}"
+    )
+
+
+async def summarize_history_async(previous_summary, lines, generative_model, rag_config):
+    """
+    Fold conversation turns into the rolling summary with one LLM call.
+
+    Args:
+        previous_summary (str): Summary of the turns before `lines` (may be empty)
+        lines (list): "User: ..." / "Response: ..." lines to fold in
+        generative_model: The LLM model instance
+        rag_config (dict): RAG configuration; history_summary_max_tokens caps the summary length
+
+    Returns:
+        str: The updated summary, or None if the LLM call failed.
+    """
+    max_tokens = rag_config.get("history_summary_max_tokens", 300)
+    summary_config = {**rag_config, "temperature": 0.2, "max_output_tokens": max_tokens}
+    response = await get_llm_response_async(
+        prompt=build_summary_prompt(previous_summary, lines, int(max_tokens / 1.3)),
+        generative_model=generative_model,
+        rag_config=summary_config
+    )
+    if not response or response == LLM_ERROR_MESSAGE:
+        return None
+    return response.strip()
@@ -0,0 +1,180 @@
+"""
+embedding_cache.py
+
+LRU + TTL cache for query embeddings, placed in front of get_dense_embedding.
+
+Entries are keyed by (normalized text, model name, vector_dim). Normalization lower-cases
+the text and collapses whitespace, so "CS degree requirements" and " cs  degree requirements"
+share an entry. Vectors are stored as compact float64 arrays, so a hit returns exactly the values
+the model returned on the miss that cached them.
+Optionally, entries are persisted to a SQLite file so popular queries survive restarts.
+
+Usage:
+    from embedding_cache import configure_shared_embedding_cache, get_shared_embedding_cache
+    configure_shared_embedding_cache(max_entries=10000, ttl_seconds=86400, persist_path="data/embeddings.db")
+    cache = get_shared_embedding_cache()
+    vector = cache.get(text, model_name, vector_dim)
+    if vector is None:
+        vector = embed(text)
+        cache.put(text, model_name, vector_dim, vector)
+    cache.stats()  # hits, misses, hit_rate, size, evictions
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+PRUNE_EVERY_N_PUTS = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case and collapse whitespace so trivially different queries share a cache entry."""
+    return " ".join(text.lower().split())
+
+
+def make_cache_key(text: str, model_name: str, vector_dim: Optional[int]) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}|{vector_dim}|{digest}"
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        persist_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            max_entries (int): Maximum number of entries kept in memory (and on disk).
+            ttl_seconds (float): Time after which an entry expires. None keeps entries until evicted.
+            persist_path (str): Optional SQLite file used to persist entries across restarts.
+            clock (Callable): Wall clock, injectable for testing.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._puts_since_prune = 0
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, expires_at REAL)"
+            )
+            self._prune_db()
+
+    def _expires_at(self) -> float:
+        return self._clock() + self.ttl_seconds if self.ttl_seconds else float("inf")
+
+    def get(self, text: str, model_name: str, vector_dim: Optional[int] = None) -> Optional[List[float]]:
+        """Return the cached embedding, or None on a miss or expired entry."""
+        key = make_cache_key(text, model_name, vector_dim)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._load_from_db(key)
+                if entry is not None:
+                    self._insert(key, entry)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._entries.pop(key, None)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1].tolist()
+
+    def put(self, text: str, model_name: str, vector_dim: Optional[int], vector: List[float]) -> None:
+        """Store an embedding; empty vectors (failed embeddings) are not cached."""
+        if not vector:
+            return
+        key = make_cache_key(text, model_name, vector_dim)
+        entry = (self._expires_at(), array("d", vector))
+        with self._lock:
+            self._insert(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, expires_at) VALUES (?, ?, ?)",
+                    (key, entry[1].tobytes(), entry[0]),
+                )
+                self._db.commit()
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= PRUNE_EVERY_N_PUTS:
+                    self._prune_db()
+
+    def _insert(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _load_from_db(self, key: str) -> Optional[tuple]:
+        row = self._db.execute("SELECT vector, expires_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("d")
+        vector.frombytes(row[0])
+        return (row[1], vector)
+
+    def _prune_db(self) -> None:
+        """Drop expired rows and keep at most max_entries rows, newest first."""
+        self._db.execute("DELETE FROM embeddings WHERE expires_at <= ?", (self._clock(),))
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key NOT IN "
+            "(SELECT key FROM embeddings ORDER BY expires_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._db.commit()
+        self._puts_since_prune = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters since the cache was created."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "evictions": self._evictions,
+            }
+
+
+_shared_cache = EmbeddingCache()
+
+
+def configure_shared_embedding_cache(
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+    persist_path: Optional[str] = None,
+) -> EmbeddingCache:
+    """Replace the process-wide embedding cache."""
+    global _shared_cache
+    _shared_cache = EmbeddingCache(max_entries, ttl_seconds, persist_path)
+    return _shared_cache
+
+
+def get_shared_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache used by get_dense_embedding."""
+    return _shared_cache
@@ -43,10 +43,12 @@ Author: Artem Dinh
 Date: 10/10/2024
 """
 
-from typing import List
+from typing import List, Dict, Tuple, Optional
 from google.cloud import aiplatform
 import logging
+import threading
 from vertexai.language_models import TextEmbeddingModel
+from routers.utils.embedding_cache import get_shared_embedding_cache
 
 
 def initialize_vertex_ai(project_id: str, location: str):
@@ -54,11 +56,47 @@ def initialize_vertex_ai(project_id: str, location: str):
     aiplatform.init(project=project_id, location=location)
 
 
+# Process-wide registry of model handles, keyed by (model name, output dimension)
+_embedding_models: Dict[Tuple[str, Optional[int]], TextEmbeddingModel] = {}
+_embedding_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: str, vector_dim: int = None) -> TextEmbeddingModel:
+    """Return a cached TextEmbeddingModel, constructing it only on first use for this name and dimension."""
+    key = (model_name, vector_dim)
+    model = _embedding_models.get(key)
+    if model is None:
+        with _embedding_models_lock:
+            model = _embedding_models.get(key)
+            if model is None:
+                model = TextEmbeddingModel.from_pretrained(model_name)
+                _embedding_models[key] = model
+    return model
+
+
+def clear_embedding_models():
+    """Drop all cached model handles (mainly for tests)."""
+    with _embedding_models_lock:
+        _embedding_models.clear()
+
+
+def _cache_model_name(model) -> Optional[str]:
+    """Name used in the embedding cache key; None disables caching for unknown model objects."""
+    if isinstance(model, str):
+        return model
+    return getattr(model, "_model_id", None)
+
+
 def get_dense_embedding(text: str, model: TextEmbeddingModel, vector_dim: int = None) -> List[float]:
-    """Generate an embedding for the given text using the Vertex AI model."""
+    """Generate an embedding for the given text using the Vertex AI model, served from the embedding cache when possible."""
+    cache = get_shared_embedding_cache()
+    model_name = _cache_model_name(model)
+    if model_name:
+        cached = cache.get(text, model_name, vector_dim)
+        if cached is not None:
+            return cached
     if not isinstance(model, TextEmbeddingModel):
-        # if type(model) != TextEmbeddingModel:
-        model = TextEmbeddingModel.from_pretrained(model)
+        model = get_embedding_model(model, vector_dim)
     try:
         # Create the input as a simple string or a list of strings
         inputs = [text]
@@ -67,7 +105,34 @@ def get_dense_embedding(text: str, model: TextEmbeddingModel, vector_dim: int =
         # Generate the embeddings
         embeddings = model.get_embeddings(inputs, **kwargs)
         # Return the first embedding vector
-        return embeddings[0].values
+        values = embeddings[0].values
+        if model_name:
+            cache.put(text, model_name, vector_dim, values)
+        return values
+
+    except Exception as e:
+        logging.error(f"Error in embedding text: {e}")
+        return []
+
+
+async def get_dense_embedding_async(text: str, model: TextEmbeddingModel, vector_dim: int = None) -> List[float]:
+    """Async variant of get_dense_embedding that does not block the event loop on the Vertex AI call."""
+    cache = get_shared_embedding_cache()
+    model_name = _cache_model_name(model)
+    if model_name:
+        cached = cache.get(text, model_name, vector_dim)
+        if cached is not None:
+            return cached
+    if not isinstance(model, TextEmbeddingModel):
+        model = get_embedding_model(model, vector_dim)
+    try:
+        inputs = [text]
+        kwargs = {"output_dimensionality": vector_dim} if vector_dim else {}
+        embeddings = await model.get_embeddings_async(inputs, **kwargs)
+        values = embeddings[0].values
+        if model_name:
+            cache.put(text, model_name, vector_dim, values)
+        return values
 
     except Exception as e:
         logging.error(f"Error in embedding text: {e}")
@@ -0,0 +1,129 @@
+"""
+history_manager.py
+
+Token-budgeted chat history for the final LLM prompt.
+
+The prompt gets a rolling summary followed, verbatim, by every turn the summary does not cover
+yet, and never more than `max_history_tokens` in total: the summary is capped at
+`summary_max_tokens` and the oldest verbatim turns are dropped (and, as a last resort, the
+remaining lines truncated) until the budget holds. Prompt size, and with it LLM latency, therefore
+stays flat however long the session runs, instead of growing until the session has to be ended.
+
+The summary is updated incrementally: once `summarize_every_turns` turns are older than the last
+`keep_turns`, one LLM call folds just those turns into the previous summary. Until then they stay in
+the verbatim window, so within the budget every turn is either in the summary or verbatim, and the
+window holds between `keep_turns` and `keep_turns + summarize_every_turns - 1` turns. The call is made
+by the caller-supplied `summarize(previous_summary, lines)` coroutine, typically after the response
+has been returned, so it does not add to the latency of the turn.
+
+Usage:
+    manager = HistoryManager(keep_turns=4, max_history_tokens=2000, summary_max_tokens=300)
+    context, tokens = manager.context(summary, history)
+    result = await manager.compact(summary, history, summarize)
+    if result:
+        new_summary, num_lines = result
+"""
+
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .rate_limiter import estimate_tokens
+
+SUMMARY_PREFIX = "Summary of earlier conversation: "
+LINES_PER_TURN = 2  # "User: ..." and "Response: ..."
+
+DEFAULT_KEEP_TURNS = 4
+DEFAULT_MAX_HISTORY_TOKENS = 2000
+DEFAULT_SUMMARY_MAX_TOKENS = 300
+DEFAULT_SUMMARIZE_EVERY_TURNS = 2
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the leading words of `text` that fit in `max_tokens`."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    return " ".join(words[:max(0, int(max_tokens / 1.3) - 1)]) + " ..."
+
+
+class HistoryManager:
+    def __init__(
+        self,
+        keep_turns: int = DEFAULT_KEEP_TURNS,
+        max_history_tokens: int = DEFAULT_MAX_HISTORY_TOKENS,
+        summary_max_tokens: int = DEFAULT_SUMMARY_MAX_TOKENS,
+        summarize_every_turns: int = DEFAULT_SUMMARIZE_EVERY_TURNS,
+    ):
+        """
+        Args:
+            keep_turns (int): Most recent turns that are never folded into the summary.
+            max_history_tokens (int): Token budget of the whole history section of the prompt.
+            summary_max_tokens (int): Token budget of the rolling summary.
+            summarize_every_turns (int): Turns older than the last `keep_turns` that are folded into the summary at once.
+        """
+        self.keep_turns = keep_turns
+        self.max_history_tokens = max_history_tokens
+        self.summary_max_tokens = min(summary_max_tokens, max_history_tokens)
+        self.summarize_every_turns = max(1, summarize_every_turns)
+
+    def context(self, summary: str, history: List[str]) -> Tuple[List[str], int]:
+        """
+        Build the history lines for the prompt within the token budget.
+
+        Args:
+            summary (str): Rolling summary of the turns before `history` (may be empty).
+            history (List[str]): Turns not covered by the summary, oldest first.
+
+        Returns:
+            Tuple[List[str], int]: The prompt lines (summary first) and their token estimate.
+        """
+        lines = []
+        budget = self.max_history_tokens
+        if summary:
+            summary_line = SUMMARY_PREFIX + truncate_to_tokens(summary, self.summary_max_tokens)
+            lines.append(summary_line)
+            budget -= estimate_tokens(summary_line)
+
+        # Older turns stay verbatim until compact() has folded them into the summary
+        recent = list(history)
+        recent_tokens = [estimate_tokens(line) for line in recent]
+        # Drop the oldest turns until the rest fits; the latest turn is always kept, truncated if needed
+        while len(recent) > LINES_PER_TURN and sum(recent_tokens) > budget:
+            recent, recent_tokens = recent[LINES_PER_TURN:], recent_tokens[LINES_PER_TURN:]
+        if sum(recent_tokens) > budget:
+            per_line = max(0, budget) // max(1, len(recent))
+            recent = [truncate_to_tokens(line, per_line) for line in recent]
+            recent_tokens = [estimate_tokens(line) for line in recent]
+        lines.extend(recent)
+        return lines, self.max_history_tokens - budget + sum(recent_tokens)
+
+    def lines_to_compact(self, history: List[str]) -> int:
+        """Number of leading history lines to fold into the summary now (0 if not due yet)."""
+        older = len(history) - self.keep_turns * LINES_PER_TURN
+        older -= older % LINES_PER_TURN
+        return older if older >= self.summarize_every_turns * LINES_PER_TURN else 0
+
+    async def compact(
+        self,
+        summary: str,
+        history: List[str],
+        summarize: Callable[[str, List[str]], Awaitable[Optional[str]]],
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Fold the turns older than the last `keep_turns` into the summary.
+
+        Args:
+            summary (str): Current rolling summary.
+            history (List[str]): Turns not covered by the summary, oldest first.
+            summarize: Coroutine (previous_summary, lines) -> new summary, or None if summarization failed.
+
+        Returns:
+            Optional[Tuple[str, int]]: The new summary and the number of leading history lines it now covers,
+            or None if no update is due or summarization failed.
+        """
+        num_lines = self.lines_to_compact(history)
+        if not num_lines:
+            return None
+        new_summary = await summarize(summary, history[:num_lines])
+        if not new_summary:
+            return None
+        return truncate_to_tokens(new_summary.strip(), self.summary_max_tokens), num_lines
@@ -1,5 +1,7 @@
 import os  # To check file existence and read files
-import time
+from routers.utils.rate_limiter import get_shared_rate_limiter, estimate_tokens
+
+LLM_ERROR_MESSAGE = "I apologize, but I encountered an error generating a response. Please try again."
 
 
 def get_prompts():
@@ -60,6 +62,20 @@ def create_final_prompt(user_query, instruction_dict, knowledge_documents, chat_
     return final_prompt
 
 
+def build_input_prompt(prompt):
+    """Wrap a prompt with the shared instruction prefix sent to the LLM."""
+    return f"Following prompt has question to be answered, context knowledge, and instructions, respond strictly using provided knowledge and guidelines: {prompt}"
+
+
+def build_generation_config(rag_config):
+    """Use only needed config parameters from the RAG config."""
+    return {
+        "temperature": rag_config.get("temperature", 0.75),
+        "max_output_tokens": rag_config.get("max_output_tokens", 2000),
+        "top_p": rag_config.get("top_p", 0.95)
+    }
+
+
 def get_llm_response(prompt, generative_model, rag_config):
     """
     Get response from LLM using prompt and config.
@@ -73,15 +89,10 @@ def get_llm_response(prompt, generative_model, rag_config):
     Returns:
         str: Generated response from the LLM
     """
-    input_prompt = f"Following prompt has question to be answered, context knowledge, and instructions, respond strictly using provided knowledge and guidelines: {prompt}"
-
-    # Use only needed config parameters
-    generation_config = {
-        "temperature": rag_config.get("temperature", 0.75),
-        "max_output_tokens": rag_config.get("max_output_tokens", 2000),
-        "top_p": rag_config.get("top_p", 0.95)
-    }
-    time.sleep(1)
+    input_prompt = build_input_prompt(prompt)
+    generation_config = build_generation_config(rag_config)
+    # Only waits when the shared Vertex AI quota is close to its limit
+    get_shared_rate_limiter().acquire(tokens=estimate_tokens(input_prompt))
     # Generate response
     try:
         response = generative_model.generate_content(
@@ -92,7 +103,7 @@ def get_llm_response(prompt, generative_model, rag_config):
         return response.text
     except Exception as e:
         print(f"Error generating response: {e}")
-        return "I apologize, but I encountered an error generating a response. Please try again."
+        return LLM_ERROR_MESSAGE
 
 
 def generate_llm_response(final_prompt, generative_model, rag_config):
@@ -105,12 +116,52 @@ def generate_llm_response(final_prompt, generative_model, rag_config):
     Returns:
         str: Formatted LLM response
     """
-    # Get LLM response
+    return get_llm_response(
+        prompt=final_prompt,
+        generative_model=generative_model,
+        rag_config=rag_config
+    )
+
+
+async def get_llm_response_async(prompt, generative_model, rag_config):
+    """
+    Async variant of get_llm_response using generate_content_async, so the event loop keeps serving other requests.
 
-    response = get_llm_response(
+    Args:
+        prompt (str): Prompt text to guide the model's response
+        generative_model: The LLM model instance
+        rag_config (dict): Configuration parameters for generation
+
+    Returns:
+        str: Generated response from the LLM
+    """
+    input_prompt = build_input_prompt(prompt)
+    generation_config = build_generation_config(rag_config)
+    await get_shared_rate_limiter().acquire_async(tokens=estimate_tokens(input_prompt))
+    try:
+        response = await generative_model.generate_content_async(
+            [input_prompt],
+            generation_config=generation_config,
+            stream=False
+        )
+        return response.text
+    except Exception as e:
+        print(f"Error generating response: {e}")
+        return LLM_ERROR_MESSAGE
+
+
+async def generate_llm_response_async(final_prompt, generative_model, rag_config):
+    """
+    Async variant of generate_llm_response.
+    Args:
+        final_prompt (str): Formatted prompt for LLM containing user query, knowledge, and instructions
+        generative_model: The LLM model instance
+        rag_config (dict): RAG Configuration parameters
+    Returns:
+        str: Formatted LLM response
+    """
+    return await get_llm_response_async(
         prompt=final_prompt,
         generative_model=generative_model,
         rag_config=rag_config
     )
-    time.sleep(1)
-    return response
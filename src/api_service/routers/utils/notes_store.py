@@ -0,0 +1,245 @@
+"""
+notes_store.py
+
+SQLite storage for the notes saved from the frontend (/save-notes, /get-notes).
+
+Notes live in one table with a UNIQUE content hash column, so saving a batch is a single
+INSERT OR IGNORE per note: duplicates are rejected by the index instead of by comparing every
+incoming note with every stored one, and the cost of a save is proportional to the new notes,
+not to the size of the store. The database runs in WAL mode, so reads are not blocked by a
+concurrent write.
+
+Writes are safe across processes (e.g. several uvicorn workers sharing data/notes.db): each write
+is one BEGIN IMMEDIATE transaction, which takes SQLite's database write lock up front, and a
+writer that finds the lock taken waits up to `busy_timeout` seconds instead of failing. No save
+can overwrite another one. The methods block, so async callers should run them with
+asyncio.to_thread. Files written by the store (export_json) are written to a temporary file in
+the same directory and renamed over the target, so readers never see a partial file.
+
+Reads are filtered by chat_id, type and a datetime range, ordered by (datetime, id) and paginated
+with an opaque cursor holding the (datetime, id) of the last returned note. The next page starts
+with an index seek past the cursor, on (chat_id, datetime, id) when a chat is selected or on
+(datetime, id) otherwise, so the cost of a page depends on the page size and not on the number
+of stored notes (unlike LIMIT/OFFSET, which scans every skipped row).
+
+Notes from the previous data/notes.json file are imported once, the first time the store opens.
+
+Usage:
+    store = NotesStore("data/notes.db", legacy_json_path="data/notes.json")
+    saved = store.add_notes([{"type": "quote", "datetime": "...", "chat_id": "...", "content": "..."}])
+    notes, next_cursor = store.list_notes(limit=100, chat_id="1234")
+    notes, next_cursor = store.list_notes(limit=100, chat_id="1234", cursor=next_cursor)
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+NOTE_FIELDS = ("type", "datetime", "chat_id", "content")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_BUSY_TIMEOUT = 30.0
+
+
+def note_hash(note: Dict[str, str]) -> str:
+    """SHA-256 of the note fields; two notes with the same fields are duplicates."""
+    payload = json.dumps([note.get(field) for field in NOTE_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_cursor(datetime: str, note_id: int) -> str:
+    """Opaque page cursor for the position after the note with this datetime and row id."""
+    return base64.urlsafe_b64encode(json.dumps([datetime, note_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        datetime, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(datetime, str) or not isinstance(note_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return datetime, note_id
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """Write `data` as JSON to a temporary file next to `path`, then rename it over `path`."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class NotesStore:
+    def __init__(
+        self,
+        db_path: str,
+        legacy_json_path: Optional[str] = None,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ):
+        """
+        Args:
+            db_path (str): SQLite database file (created if missing).
+            legacy_json_path (str): Optional notes.json file imported once when the store is created.
+            busy_timeout (float): Seconds to wait for another process's write lock before failing.
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly by _write
+        self._db = sqlite3.connect(db_path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._write():
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, content_hash TEXT NOT NULL UNIQUE, "
+                "type TEXT, datetime TEXT, chat_id TEXT, content TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_notes_chat_datetime ON notes (chat_id, datetime, id)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_notes_datetime ON notes (datetime, id)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if legacy_json_path:
+            self._import_legacy_json(legacy_json_path)
+
+    @contextmanager
+    def _write(self):
+        """One write transaction, holding the database write lock from its start."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def add_notes(self, notes: List[Dict[str, str]]) -> int:
+        """
+        Store the notes that are not already stored.
+
+        Args:
+            notes (List[Dict[str, str]]): Notes with type, datetime, chat_id and content.
+
+        Returns:
+            int: Number of notes that were new.
+        """
+        with self._write():
+            return self._insert(notes)
+
+    def _insert(self, notes: List[Dict[str, str]]) -> int:
+        """INSERT OR IGNORE the notes inside the current write transaction; returns how many were new."""
+        rows = [(note_hash(note), *(note.get(field) for field in NOTE_FIELDS)) for note in notes]
+        before = self._db.total_changes
+        self._db.executemany(
+            "INSERT OR IGNORE INTO notes (content_hash, type, datetime, chat_id, content) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        return self._db.total_changes - before
+
+    def list_notes(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        chat_id: Optional[str] = None,
+        note_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        Return one page of notes, ordered by datetime.
+
+        Args:
+            limit (int): Maximum number of notes in the page (capped at MAX_PAGE_SIZE).
+            cursor (str): next_cursor of the previous page; None for the first page.
+            chat_id (str): Only notes of this chat.
+            note_type (str): Only notes of this type (e.g. "quote" or "link").
+            since (str): Only notes with datetime >= since (ISO 8601, compared as text).
+            until (str): Only notes with datetime < until (ISO 8601, compared as text).
+
+        Returns:
+            Tuple[List[Dict[str, str]], Optional[str]]: The notes and the cursor of the next page
+            (None on the last page).
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions, params = [], []
+        if chat_id is not None:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        if note_type is not None:
+            conditions.append("type = ?")
+            params.append(note_type)
+        if since is not None:
+            conditions.append("datetime >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("datetime < ?")
+            params.append(until)
+        if cursor is not None:
+            conditions.append("(datetime, id) > (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, type, datetime, chat_id, content FROM notes {where} ORDER BY datetime, id LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+        return [dict(zip(NOTE_FIELDS, row[1:])) for row in rows], next_cursor
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def export_json(self, path: str) -> int:
+        """Atomically write every note, oldest first, to a JSON file in the old notes.json format."""
+        with self._lock:
+            rows = self._db.execute("SELECT type, datetime, chat_id, content FROM notes ORDER BY datetime, id").fetchall()
+        atomic_write_json(path, [dict(zip(NOTE_FIELDS, row)) for row in rows])
+        return len(rows)
+
+    def _import_legacy_json(self, json_path: str) -> None:
+        """
+        Import notes.json once; the meta table records that the import happened.
+        The check and the import share one transaction, so concurrent workers import it only once.
+        """
+        if not os.path.exists(json_path):
+            return
+        with self._write():
+            if self._db.execute("SELECT value FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+                return
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    notes = json.load(f)
+            except json.JSONDecodeError as e:
+                logging.error(f"Skipping import of corrupted notes file {json_path}: {e}")
+                return
+            imported = self._insert(notes)
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_imported', ?)", (json_path,))
+        logging.info(f"Imported {imported} notes from {json_path}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -26,11 +26,12 @@ Date: 10/10/2024
 # import logging
 # import time
 from typing import List, Optional, Dict, Any
-from qdrant_client import QdrantClient  # , models
-from qdrant_client.models import Filter, FieldCondition, MatchValue  # , Distance, VectorParams,
+from qdrant_client import QdrantClient, AsyncQdrantClient  # , models
+from qdrant_client.models import Filter, FieldCondition, HasIdCondition, MatchValue  # , Distance, VectorParams,
 # from qdrant_client import http as qhttp
 # from langchain.schema import Document
-from routers.utils.embedding_utils import get_dense_embedding
+from routers.utils.embedding_utils import get_dense_embedding, get_dense_embedding_async
+from routers.utils.answer_cache import COLLECTION_VERSION_POINT_ID
 
 
 def initialize_qdrant_client(qdrant_url: str, qdrant_api_key: str) -> QdrantClient:
@@ -43,6 +44,61 @@ def initialize_qdrant_client(qdrant_url: str, qdrant_api_key: str) -> QdrantClie
     )
 
 
+def initialize_async_qdrant_client(qdrant_url: str, qdrant_api_key: str) -> AsyncQdrantClient:
+    """
+    Initialize and return an async Qdrant client instance for use inside the event loop.
+    """
+    return AsyncQdrantClient(
+        url=qdrant_url,
+        api_key=qdrant_api_key,
+    )
+
+
+def build_search_params(
+    collection_name: str,
+    query_vector: List[float],
+    limit: int = 10,
+    filter_field: Optional[str] = None,
+    filter_value: Optional[Any] = None
+) -> Dict[str, Any]:
+    """
+    Build the keyword arguments shared by the sync and async Qdrant search calls.
+    The reserved collection version point is always excluded.
+    """
+    search_params = {
+        "collection_name": collection_name,
+        "query_vector": query_vector,
+        "limit": limit
+    }
+
+    must = []
+    if filter_field and filter_value is not None:
+        must.append(
+            FieldCondition(
+                key=filter_field,
+                match=MatchValue(value=filter_value)
+            )
+        )
+    search_params["query_filter"] = Filter(
+        must=must or None,
+        must_not=[HasIdCondition(has_id=[COLLECTION_VERSION_POINT_ID])],
+    )
+    return search_params
+
+
+def format_search_results(search_results) -> List[Dict[str, Any]]:
+    """
+    Convert Qdrant ScoredPoints into plain dictionaries.
+    """
+    return [
+        {
+            "id": result.id,
+            "score": result.score,
+            "payload": result.payload
+        } for result in search_results
+    ]
+
+
 def qdrant_search(
     client: QdrantClient,
     collection_name: str,
@@ -65,32 +121,38 @@ def qdrant_search(
     Returns:
         List[Dict[str, Any]]: List of search results.
     """
-    search_params = {
-        "collection_name": collection_name,
-        "query_vector": query_vector,
-        "limit": limit
-    }
-
-    if filter_field and filter_value is not None:
-        search_params["query_filter"] = Filter(
-            must=[
-                FieldCondition(
-                    key=filter_field,
-                    match=MatchValue(value=filter_value)
-                )
-            ]
-        )
-
+    search_params = build_search_params(collection_name, query_vector, limit, filter_field, filter_value)
     search_results = client.search(**search_params)
 
     # Process and return the results
-    return [
-        {
-            "id": result.id,
-            "score": result.score,
-            "payload": result.payload
-        } for result in search_results
-    ]
+    return format_search_results(search_results)
+
+
+async def qdrant_search_async(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    query_vector: List[float],
+    limit: int = 10,
+    filter_field: Optional[str] = None,
+    filter_value: Optional[Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    Perform a search in Qdrant collection without blocking the event loop.
+
+    Args:
+        client (AsyncQdrantClient): Initialized async Qdrant client.
+        collection_name (str): Name of the collection to search in.
+        query_vector (List[float]): The query vector to search with.
+        limit (int): Maximum number of results to return. Defaults to 10.
+        filter_field (Optional[str]): Field name to filter on. Defaults to None.
+        filter_value (Optional[Any]): Value to filter by. Defaults to None.
+
+    Returns:
+        List[Dict[str, Any]]: List of search results.
+    """
+    search_params = build_search_params(collection_name, query_vector, limit, filter_field, filter_value)
+    search_results = await client.search(**search_params)
+    return format_search_results(search_results)
 
 
 def get_documents_from_qdrant(query, config, rag_config, qdrant_client):
@@ -111,3 +173,26 @@ def get_documents_from_qdrant(query, config, rag_config, qdrant_client):
         rag_config['num_documents']  # Retrieve number of documents from RAG config
     )
     return [result['payload']['text'] + ", retrieved from: " + result['payload']['url'] for result in search_results]
+
+
+async def get_documents_from_qdrant_async(query, config, rag_config, qdrant_client, query_vector=None):
+    """
+    Async variant of get_documents_from_qdrant, embedding the query and searching Qdrant without blocking.
+    Args:
+        query (str): The search query.
+        config (dict): Configuration settings.
+        rag_config (dict): RAG Configuration settings containing num_documents
+        qdrant_client: The AsyncQdrantClient instance.
+        query_vector (list): Precomputed embedding of the query, if the caller already has one.
+    Returns:
+        list: A list of document texts retrieved from Qdrant.
+    """
+    if query_vector is None:
+        query_vector = await get_dense_embedding_async(query, config['embedding_model'], config['vector_dim'])
+    search_results = await qdrant_search_async(
+        qdrant_client,
+        config['qdrant_collection'],
+        query_vector,
+        rag_config['num_documents']
+    )
+    return [result['payload']['text'] + ", retrieved from: " + result['payload']['url'] for result in search_results]
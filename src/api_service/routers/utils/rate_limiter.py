@@ -0,0 +1,133 @@
+"""
+rate_limiter.py
+
+Token-bucket rate limiter for Vertex AI calls.
+
+Two buckets are tracked: one for requests per second and one for tokens per minute.
+A caller reserves capacity up front and only waits when a bucket is actually empty,
+so requests go out immediately while the quota has headroom. Reservations are
+thread-safe and can be awaited from the event loop or slept on from sync code.
+
+Usage:
+    from rate_limiter import configure_shared_rate_limiter, get_shared_rate_limiter
+    configure_shared_rate_limiter(requests_per_second=5, tokens_per_minute=1_000_000)
+    limiter = get_shared_rate_limiter()
+    limiter.acquire(tokens=estimate_tokens(prompt))          # sync code
+    await limiter.acquire_async(tokens=estimate_tokens(prompt))  # async code
+    limiter.metrics()  # queueing delay statistics
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+DEFAULT_REQUESTS_PER_SECOND = 5.0
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a prompt (1 word ~ 1.3 tokens)."""
+    return int(len(text.split()) * 1.3)
+
+
+class TokenBucket:
+    """A single token bucket refilled continuously at `rate` units per second."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` from the bucket and return how long the caller must wait for it."""
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        delay = max(0.0, (amount - self.level) / self.rate)
+        # The level may go negative: later callers then queue behind this reservation
+        self.level -= amount
+        return delay
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = DEFAULT_REQUESTS_PER_SECOND,
+        tokens_per_minute: Optional[float] = DEFAULT_TOKENS_PER_MINUTE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            requests_per_second (float): Sustained request rate; also the burst size. None disables the limit.
+            tokens_per_minute (float): Token quota per minute; also the burst size. None disables the limit.
+            clock (Callable): Monotonic clock, injectable for testing.
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+        self._request_bucket = TokenBucket(requests_per_second, requests_per_second, now) if requests_per_second else None
+        self._token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute, now) if tokens_per_minute else None
+        self._requests = 0
+        self._delayed_requests = 0
+        self._total_delay = 0.0
+        self._max_delay = 0.0
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserve one request and `tokens` tokens; return the delay in seconds before sending."""
+        with self._lock:
+            now = self._clock()
+            delay = 0.0
+            if self._request_bucket:
+                delay = max(delay, self._request_bucket.reserve(1, now))
+            if self._token_bucket and tokens:
+                delay = max(delay, self._token_bucket.reserve(tokens, now))
+            self._requests += 1
+            if delay > 0:
+                self._delayed_requests += 1
+                self._total_delay += delay
+                self._max_delay = max(self._max_delay, delay)
+            return delay
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block the current thread until the request may be sent. Returns the time waited."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """Wait without blocking the event loop until the request may be sent. Returns the time waited."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def metrics(self) -> Dict[str, float]:
+        """Queueing delay statistics since the limiter was created."""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "delayed_requests": self._delayed_requests,
+                "total_queue_delay_seconds": round(self._total_delay, 4),
+                "max_queue_delay_seconds": round(self._max_delay, 4),
+                "mean_queue_delay_seconds": round(self._total_delay / self._requests, 4) if self._requests else 0.0,
+            }
+
+
+_shared_limiter = RateLimiter()
+
+
+def configure_shared_rate_limiter(
+    requests_per_second: Optional[float] = DEFAULT_REQUESTS_PER_SECOND,
+    tokens_per_minute: Optional[float] = DEFAULT_TOKENS_PER_MINUTE,
+) -> RateLimiter:
+    """Replace the process-wide limiter, e.g. with the quota values from rag_config."""
+    global _shared_limiter
+    _shared_limiter = RateLimiter(requests_per_second, tokens_per_minute)
+    return _shared_limiter
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter shared by every LLM call in this service."""
+    return _shared_limiter
@@ -0,0 +1,363 @@
+"""
+session_store.py
+
+Server-side chat sessions for /llm/query, keyed by chat_id.
+
+Clients send only the new query and their chat_id; the history lives here instead of being sent,
+re-joined and re-tokenized on every turn. Each session keeps its history lines together with a
+running token estimate, so checking the history budget costs nothing per turn. Older turns can be
+folded into a rolling summary with compact() (see history_manager.py), which also keeps the
+memory of a long session flat.
+
+Without a backend, sessions are held in an in-memory LRU bounded both by the number of sessions and
+by the total number of characters of history. A session expires `ttl_seconds` after its last use.
+
+An optional backend keeps sessions across restarts and shares them between uvicorn workers. It
+only needs the Redis commands get / setex / delete, plus an atomic read-modify-write: the
+SQLiteSessionBackend below provides update(), and a redis-py client (created with
+decode_responses=True) is updated with WATCH / MULTI. With a backend the sessions live only there,
+since another worker may have served the previous turn, and the in-memory LRU is not used. Every
+append or compaction reads, changes and writes the session in one transaction, so an append and a
+background compaction of the same chat cannot overwrite each other. The stored value includes the
+token estimate, so it is not recomputed. /llm/query uses the SQLite backend by default, since
+clients send only their chat_id and a follow-up may reach any worker.
+
+Usage:
+    store = SessionStore(max_sessions=10000, ttl_seconds=7200, backend=SQLiteSessionBackend("data/sessions.db"))
+    history, tokens = store.get(chat_id)
+    store.append_turn(chat_id, user_query, response)
+    summary, history, summarized = store.get_with_summary(chat_id)
+    store.compact(chat_id, new_summary, num_lines=4, summarized=summarized)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .rate_limiter import estimate_tokens
+
+DEFAULT_MAX_SESSIONS = 10_000
+DEFAULT_MAX_TOTAL_CHARS = 50_000_000
+DEFAULT_TTL_SECONDS = 2 * 60 * 60
+
+
+class ChatSession:
+    # history holds the turns not yet folded into summary; summarized counts the folded lines
+    __slots__ = ("history", "tokens", "chars", "expires_at", "summary", "summarized")
+
+    def __init__(self, history: List[str], tokens: int, expires_at: float, summary: str = "", summarized: int = 0):
+        self.history = history
+        self.tokens = tokens
+        self.chars = sum(len(line) for line in history) + len(summary)
+        self.expires_at = expires_at
+        self.summary = summary
+        self.summarized = summarized
+
+
+class SQLiteSessionBackend:
+    """Persistent session backend with the subset of the Redis API used by SessionStore."""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_sessions: int = 10 * DEFAULT_MAX_SESSIONS,
+        prune_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            db_path (str): SQLite file, shared by all workers.
+            max_sessions (int): Maximum number of stored sessions; the ones closest to expiry are dropped first.
+            prune_interval (float): Seconds between deletions of expired and excess sessions.
+            clock (Callable): Wall clock, injectable for testing.
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.max_sessions = max_sessions
+        self.prune_interval = prune_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        self._db.commit()
+        self._pruned_at = float("-inf")
+        with self._lock:
+            self._prune(self._clock())
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM sessions WHERE key = ? AND expires_at > ?", (key, self._clock())
+            ).fetchone()
+        return row[0] if row else None
+
+    def setex(self, key: str, ttl_seconds: int, value: str) -> None:
+        with self._lock:
+            now = self._clock()
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_seconds),
+            )
+            self._db.commit()
+            self._prune(now)
+
+    def update(self, key: str, ttl_seconds: int, update: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        """
+        Atomically replace the value of `key` with update(current value), across all processes.
+
+        The read and the write run in one IMMEDIATE transaction, which holds the database write
+        lock, so no other worker can change the key in between. If update returns None, the key
+        is left unchanged.
+
+        Returns:
+            Optional[str]: The value written, or None if nothing was written.
+        """
+        with self._lock:
+            now = self._clock()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT value FROM sessions WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                value = update(row[0] if row else None)
+                if value is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, now + ttl_seconds),
+                    )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._prune(now)
+        return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _prune(self, now: float) -> None:
+        """Delete expired sessions, then the ones closest to expiry beyond max_sessions; at most every prune_interval."""
+        if now - self._pruned_at < self.prune_interval:
+            return
+        self._pruned_at = now
+        self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+        self._db.commit()
+
+
+class SessionStore:
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_total_chars: int = DEFAULT_MAX_TOTAL_CHARS,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        backend=None,
+        key_prefix: str = "chat_session:",
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            max_sessions (int): Maximum number of sessions kept in memory, without a backend.
+            max_total_chars (int): Maximum total characters of history kept in memory, without a backend.
+            ttl_seconds (float): Idle time after which a session expires.
+            backend: Optional SQLiteSessionBackend or redis.Redis client; replaces the in-memory LRU.
+            key_prefix (str): Prefix of the backend keys.
+            clock (Callable): Wall clock, injectable for testing.
+        """
+        self.max_sessions = max_sessions
+        self.max_total_chars = max_total_chars
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._total_chars = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, chat_id: str) -> Tuple[List[str], int]:
+        """Return a copy of the session history and its token estimate; empty for unknown or expired sessions."""
+        session = self._read(chat_id)
+        if session is None:
+            return [], 0
+        return list(session.history), session.tokens
+
+    def append_turn(self, chat_id: str, user_query: str, response: str) -> Tuple[List[str], int]:
+        """Append one user/response turn and return the updated history and token estimate."""
+        lines = [f"User: {user_query}", f"Response: {response}"]
+
+        def append(session: Optional[ChatSession]) -> ChatSession:
+            session = session or ChatSession([], 0, 0.0)
+            tokens = session.tokens + sum(estimate_tokens(line) for line in lines)
+            return ChatSession(session.history + lines, tokens, 0.0, session.summary, session.summarized)
+
+        session = self._update(chat_id, append)
+        return list(session.history), session.tokens
+
+    def get_with_summary(self, chat_id: str) -> Tuple[str, List[str], int]:
+        """Return the rolling summary, a copy of the turns not folded into it, and the number of folded lines."""
+        session = self._read(chat_id)
+        if session is None:
+            return "", [], 0
+        return session.summary, list(session.history), session.summarized
+
+    def compact(self, chat_id: str, summary: str, num_lines: int, summarized: int) -> bool:
+        """
+        Replace the summary and drop the first `num_lines` history lines, which it now covers.
+
+        `summarized` is the folded line count the summary was computed from (from get_with_summary);
+        if another request compacted the session in the meantime, nothing is changed. The check and
+        the write are one atomic update, so turns appended meanwhile are kept.
+
+        Returns:
+            bool: True if the session was compacted.
+        """
+
+        def fold(session: Optional[ChatSession]) -> Optional[ChatSession]:
+            if session is None or session.summarized != summarized or len(session.history) < num_lines:
+                return None
+            history = session.history[num_lines:]
+            tokens = sum(estimate_tokens(line) for line in history) + estimate_tokens(summary)
+            return ChatSession(history, tokens, 0.0, summary, summarized + num_lines)
+
+        return self._update(chat_id, fold) is not None
+
+    def seed(self, chat_id: str, history: List[str]) -> None:
+        """Start a session from a history sent by a client that does not rely on the store yet."""
+        self._update(chat_id, lambda session: self._make_session(list(history)) if session is None else None)
+
+    def clear(self, chat_id: str) -> None:
+        if self.backend is not None:
+            self.backend.delete(self.key_prefix + chat_id)
+            return
+        with self._lock:
+            session = self._sessions.pop(chat_id, None)
+            if session is not None:
+                self._total_chars -= session.chars
+
+    def _make_session(self, history: List[str]) -> ChatSession:
+        return ChatSession(history, sum(estimate_tokens(line) for line in history), 0.0)
+
+    @staticmethod
+    def _serialize(session: ChatSession) -> str:
+        return json.dumps({
+            "history": session.history,
+            "tokens": session.tokens,
+            "summary": session.summary,
+            "summarized": session.summarized,
+        })
+
+    @staticmethod
+    def _deserialize(value: str) -> ChatSession:
+        stored = json.loads(value)
+        return ChatSession(
+            stored["history"], stored["tokens"], 0.0, stored.get("summary", ""), stored.get("summarized", 0)
+        )
+
+    def _read(self, chat_id: str) -> Optional[ChatSession]:
+        """Return the live session, from the backend if there is one."""
+        if self.backend is not None:
+            value = self.backend.get(self.key_prefix + chat_id)
+            return self._deserialize(value) if value is not None else None
+        with self._lock:
+            return self._load(chat_id)
+
+    def _update(
+        self, chat_id: str, update: Callable[[Optional[ChatSession]], Optional[ChatSession]]
+    ) -> Optional[ChatSession]:
+        """
+        Replace the session with update(current session) as one atomic step.
+
+        `update` must not modify its argument, and may be called again if a redis transaction is
+        retried. If it returns None, the session is left unchanged.
+
+        Returns:
+            Optional[ChatSession]: The new session, or None if nothing was changed.
+        """
+        if self.backend is None:
+            with self._lock:
+                current = self._load(chat_id)
+                session = update(current)
+                if session is not None:
+                    if current is not None:
+                        self._total_chars -= self._sessions.pop(chat_id).chars
+                    self._insert(chat_id, session)
+            return session
+
+        updated = None
+
+        def apply(value: Optional[str]) -> Optional[str]:
+            nonlocal updated
+            updated = update(self._deserialize(value) if value is not None else None)
+            return self._serialize(updated) if updated is not None else None
+
+        key, ttl = self.key_prefix + chat_id, int(self.ttl_seconds)
+        if hasattr(self.backend, "update"):
+            self.backend.update(key, ttl, apply)
+        else:
+            # redis-py: the transaction is retried if another worker writes the key after WATCH
+            def transaction(pipe) -> None:
+                value = apply(pipe.get(key))
+                pipe.multi()
+                if value is not None:
+                    pipe.setex(key, ttl, value)
+
+            self.backend.transaction(transaction, key)
+        return updated
+
+    def _load(self, chat_id: str) -> Optional[ChatSession]:
+        """Return the live in-memory session; refreshes its TTL and LRU position."""
+        now = self._clock()
+        session = self._sessions.get(chat_id)
+        if session is None:
+            return None
+        if session.expires_at <= now:
+            self._total_chars -= self._sessions.pop(chat_id).chars
+            self._expirations += 1
+            return None
+        session.expires_at = now + self.ttl_seconds
+        self._sessions.move_to_end(chat_id)
+        return session
+
+    def _insert(self, chat_id: str, session: ChatSession) -> None:
+        session.expires_at = self._clock() + self.ttl_seconds
+        self._sessions[chat_id] = session
+        self._total_chars += session.chars
+        # Evict least recently used sessions; the newest one is kept even if it alone exceeds the bound
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_chars > self.max_total_chars
+        ):
+            _, evicted = self._sessions.popitem(last=False)
+            self._total_chars -= evicted.chars
+            self._evictions += 1
+
+    def prune(self) -> int:
+        """Drop expired sessions from memory; returns how many were dropped."""
+        now = self._clock()
+        with self._lock:
+            expired = [chat_id for chat_id, s in self._sessions.items() if s.expires_at <= now]
+            for chat_id in expired:
+                self._total_chars -= self._sessions.pop(chat_id).chars
+            self._expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "total_chars": self._total_chars,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
@@ -1,15 +1,37 @@
-import json
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query
 # from pydantic import BaseModel
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from starlette.middleware.cors import CORSMiddleware
 from routers import llm_chat_routers
 from pydantic import BaseModel
-from routers.llm_chat_routers import verify_auth_key
+from routers.llm_chat_routers import verify_auth_key, master_config
+from routers.utils.embedding_utils import get_embedding_model
+from routers.utils.notes_store import NotesStore, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warms the embedding model registry at startup so query embedding latency
+    does not include model handle construction.
+    """
+    try:
+        get_embedding_model(master_config['embedding_model'], master_config['vector_dim'])
+    except Exception as e:
+        # Model will be constructed lazily on the first query instead
+        logging.error(f"Failed to warm embedding model: {e}")
+    # Open the notes database (and import the legacy notes.json) before the first request
+    await asyncio.to_thread(get_notes_store)
+    yield
+
 
 # Setup FastAPI app
-app = FastAPI(title="API Server", description="API Server", version="v1")
+app = FastAPI(title="API Server", description="API Server", version="v1", lifespan=lifespan)
 
 # Enable CORSMiddleware
 app.add_middleware(
@@ -21,7 +43,19 @@ app.add_middleware(
 )
 
 
-DATA_PATH = Path("data/notes.json")
+NOTES_DB_PATH = Path("data/notes.db")
+LEGACY_NOTES_PATH = Path("data/notes.json")
+_notes_store = None
+_notes_store_lock = threading.Lock()
+
+
+def get_notes_store() -> NotesStore:
+    """Return the process-wide notes store, opening it on first use."""
+    global _notes_store
+    with _notes_store_lock:
+        if _notes_store is None:
+            _notes_store = NotesStore(str(NOTES_DB_PATH), legacy_json_path=str(LEGACY_NOTES_PATH))
+    return _notes_store
 
 
 class Note(BaseModel):
@@ -37,7 +71,7 @@ async def save_notes(
     _: str = Depends(verify_auth_key)  # Authorization dependency
 ):
     """
-    Saves notes received from the frontend to a JSON file, appending only non-duplicate notes.
+    Saves notes received from the frontend, skipping notes that are already stored.
 
 
     Args:
@@ -48,57 +82,51 @@ async def save_notes(
     Returns:
         A success message or raises an HTTPException for errors.
     """
-    # Ensure the data/ directory exists
-    DATA_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    # Load existing notes from the file if it exists
-    existing_notes = []
-    if DATA_PATH.exists():
-        try:
-            with open(DATA_PATH, "r", encoding="utf-8") as f:
-                existing_notes = json.load(f)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail="Corrupted notes file.")
-
-    # Filter out duplicates
-    new_notes = []
-    for note in notes:
-        if note.model_dump() not in existing_notes:
-            new_notes.append(note.model_dump())
-
-    # Append new notes to the existing ones
-    all_notes = existing_notes + new_notes
-
-    # Save back to the JSON file
     try:
-        with open(DATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(all_notes, f, indent=4, ensure_ascii=False)
+        # SQLite I/O runs in a worker thread so the event loop keeps serving other requests
+        saved = await asyncio.to_thread(get_notes_store().add_notes, [note.model_dump() for note in notes])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save notes: {e}")
 
-    return {"message": f"{len(new_notes)} new notes saved successfully."}
+    return {"message": f"{saved} new notes saved successfully."}
 
-DATA_PATH = Path("data/notes.json")
 
-
-@app.get("/get-notes", summary="Retrieve all notes", description="Fetches all notes stored in the JSON file.")
-async def get_notes():
+@app.get("/get-notes", summary="Retrieve notes", description="Fetches one page of the stored notes, filtered by chat, type and datetime.")
+async def get_notes(
+    chat_id: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[str] = Query(None, description="Only notes with datetime >= since (ISO 8601)"),
+    until: Optional[str] = Query(None, description="Only notes with datetime < until (ISO 8601)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    _: str = Depends(verify_auth_key)  # Authorization dependency
+):
     """
-    Fetches all notes stored in the JSON file.
+    Fetches one page of the stored notes, ordered by datetime.
+
+    Args:
+        chat_id: Only notes of this chat.
+        type: Only notes of this type.
+        since: Only notes saved at or after this datetime.
+        until: Only notes saved before this datetime.
+        limit: Maximum number of notes to return.
+        cursor: Cursor returned with the previous page.
+        _: Authorization token (validated by verify_auth_key).
 
     Returns:
-        A list of notes or raises an HTTPException if the file is missing or corrupted.
+        The notes of the page and the cursor of the next page (None on the last page).
     """
-    if not DATA_PATH.exists():
-        raise HTTPException(status_code=404, detail="Notes file not found.")
-
     try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            notes = json.load(f)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Corrupted notes file.")
+        notes, next_cursor = await asyncio.to_thread(
+            get_notes_store().list_notes,
+            limit=limit, cursor=cursor, chat_id=chat_id, note_type=type, since=since, until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read notes: {e}")
 
-    return {"notes": notes}
+    return {"notes": notes, "next_cursor": next_cursor}
 
 
 class authRequest(BaseModel):
@@ -0,0 +1,129 @@
+"""
+Unit tests for the SemanticAnswerCache in routers/utils/answer_cache.py.
+
+Functions Overview:
+- lookup / store: nearest-neighbour answer lookup within a cosine distance threshold.
+- Size bound: least recently used answers are replaced first.
+- TTL and collection version invalidation.
+- stats: hit-rate metrics.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from api_service.routers.utils.answer_cache import COLLECTION_VERSION_POINT_ID, SemanticAnswerCache, refresh_collection_version
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lookup_empty_cache_is_miss():
+    cache = SemanticAnswerCache()
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lookup_within_distance_is_hit():
+    """
+    Test case: A slightly different query embedding is looked up.
+    Expected Output: The stored answer; hit counted.
+    """
+    cache = SemanticAnswerCache(max_distance=0.05)
+    cache.store([1.0, 0.0, 0.0], "CS requirements answer")
+    assert cache.lookup([0.99, 0.05, 0.0]) == "CS requirements answer"
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_outside_distance_is_miss():
+    cache = SemanticAnswerCache(max_distance=0.05)
+    cache.store([1.0, 0.0], "answer")
+    assert cache.lookup([0.0, 1.0]) is None
+
+
+def test_lookup_returns_nearest_answer():
+    cache = SemanticAnswerCache(max_distance=0.5)
+    cache.store([1.0, 0.0], "first")
+    cache.store([0.8, 0.6], "second")
+    assert cache.lookup([0.79, 0.61]) == "second"
+
+
+def test_size_bound_replaces_least_recently_used():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(max_entries=2, max_distance=0.01, clock=clock)
+    cache.store([1.0, 0.0, 0.0], "a")
+    clock.now += 1
+    cache.store([0.0, 1.0, 0.0], "b")
+    clock.now += 1
+    assert cache.lookup([1.0, 0.0, 0.0]) == "a"  # "b" becomes least recently used
+    clock.now += 1
+    cache.store([0.0, 0.0, 1.0], "c")
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0]) == "a"
+    assert cache.stats()["size"] == 2
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(ttl_seconds=60, clock=clock)
+    cache.store([1.0, 0.0], "answer")
+    clock.now += 61
+    assert cache.lookup([1.0, 0.0]) is None
+
+
+def version_client(version):
+    """Mock Qdrant client whose reserved version point holds `version` (None: no version point)."""
+    client = MagicMock()
+    records = [MagicMock(payload={"collection_version": version})] if version is not None else []
+    client.retrieve = AsyncMock(return_value=records)
+    return client
+
+
+def test_collection_version_change_invalidates():
+    """
+    Test case: Ingestion writes a new collection version after replacing points.
+    Expected Behavior: All cached answers are dropped.
+    Why: Content-hash IDs and pruning can swap N points for N others, leaving the point count unchanged.
+    """
+    clock = FakeClock()
+    cache = SemanticAnswerCache(version_check_seconds=0, clock=clock)
+    client = version_client(100)
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    cache.store([1.0, 0.0], "answer")
+    client.retrieve.assert_awaited_with(
+        collection_name="collection", ids=[COLLECTION_VERSION_POINT_ID], with_payload=True, with_vectors=False
+    )
+
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    assert cache.lookup([1.0, 0.0]) == "answer"
+
+    client.retrieve.return_value = [MagicMock(payload={"collection_version": 101})]
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_first_collection_version_invalidates():
+    """
+    Test case: The collection had no version point when the cache started, then ingestion writes one.
+    Expected Behavior: All cached answers are dropped.
+    """
+    cache = SemanticAnswerCache(version_check_seconds=0, clock=FakeClock())
+    client = version_client(None)
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    cache.store([1.0, 0.0], "answer")
+
+    client.retrieve.return_value = [MagicMock(payload={"collection_version": 1})]
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    assert cache.lookup([1.0, 0.0]) is None
+
+
+def test_version_check_is_rate_limited():
+    cache = SemanticAnswerCache(version_check_seconds=60, clock=FakeClock())
+    client = version_client(1)
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    asyncio.run(refresh_collection_version(cache, client, "collection"))
+    client.retrieve.assert_awaited_once()
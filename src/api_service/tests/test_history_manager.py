@@ -0,0 +1,134 @@
+"""
+Unit tests for the HistoryManager in routers/utils/history_manager.py.
+
+Functions Overview:
+- context: rolling summary plus every turn not folded into it yet, within a fixed token budget.
+- lines_to_compact / compact: incremental folding of older turns into the summary.
+- Together with SessionStore.compact: long sessions keep a flat prompt size and memory.
+"""
+
+import asyncio
+from api_service.routers.utils.history_manager import HistoryManager, SUMMARY_PREFIX, estimate_tokens, truncate_to_tokens
+from api_service.routers.utils.session_store import SessionStore
+
+
+def _turns(n, words=5, start=0):
+    lines = []
+    for i in range(start, start + n):
+        lines.append(f"User: question {i} " + "word " * words)
+        lines.append(f"Response: answer {i} " + "word " * words)
+    return lines
+
+
+def test_context_keeps_unsummarized_turns_after_summary():
+    """
+    Test case: A summary and three unsummarized turns, keep_turns=2 and summarize_every_turns=2.
+    Expected Output: The summary line followed by all three turns, including the one older than keep_turns
+    that is not due for summarization yet.
+    Why: A turn must be in the summary or in the verbatim window, never in neither.
+    """
+    manager = HistoryManager(keep_turns=2, max_history_tokens=1000, summarize_every_turns=2)
+    history = _turns(3)
+    assert manager.lines_to_compact(history) == 0
+    lines, tokens = manager.context("User asked about CS courses.", history)
+    assert lines == [SUMMARY_PREFIX + "User asked about CS courses."] + history
+    assert tokens == sum(estimate_tokens(line) for line in lines)
+
+
+def test_context_without_summary_or_history():
+    manager = HistoryManager()
+    assert manager.context("", []) == ([], 0)
+    assert manager.context("", _turns(1)) == (_turns(1), sum(estimate_tokens(line) for line in _turns(1)))
+
+
+def test_context_drops_oldest_turns_to_fit_budget():
+    """
+    Test case: Long turns that do not all fit in the budget.
+    Expected Output: Oldest verbatim turns are dropped; the latest turn is always kept.
+    """
+    manager = HistoryManager(keep_turns=4, max_history_tokens=150)
+    history = _turns(4, words=40)
+    lines, tokens = manager.context("", history)
+    assert lines == history[-2:]
+    assert tokens <= 150
+
+
+def test_context_truncates_single_turn_over_budget():
+    manager = HistoryManager(keep_turns=4, max_history_tokens=50, summary_max_tokens=10)
+    lines, tokens = manager.context("word " * 100, _turns(1, words=200))
+    assert lines[0].startswith(SUMMARY_PREFIX)
+    assert tokens <= 50
+
+
+def test_truncate_to_tokens():
+    assert truncate_to_tokens("a b c", 10) == "a b c"
+    assert estimate_tokens(truncate_to_tokens("word " * 100, 20)) <= 20
+
+
+def test_lines_to_compact_waits_for_enough_old_turns():
+    manager = HistoryManager(keep_turns=2, summarize_every_turns=2)
+    assert manager.lines_to_compact(_turns(3)) == 0
+    assert manager.lines_to_compact(_turns(4)) == 4
+    assert manager.lines_to_compact(_turns(5)) == 6
+
+
+def test_compact_folds_only_old_turns():
+    """
+    Test case: Five turns with keep_turns=2.
+    Expected Output: One summarize call with the previous summary and the three oldest turns.
+    """
+    manager = HistoryManager(keep_turns=2, summarize_every_turns=2)
+    calls = []
+
+    async def summarize(previous, lines):
+        calls.append((previous, lines))
+        return "new summary"
+
+    history = _turns(5)
+    assert asyncio.run(manager.compact("old summary", history, summarize)) == ("new summary", 6)
+    assert calls == [("old summary", history[:6])]
+
+
+def test_compact_failure_keeps_history():
+    manager = HistoryManager(keep_turns=1, summarize_every_turns=1)
+
+    async def summarize(previous, lines):
+        return None
+
+    assert asyncio.run(manager.compact("", _turns(3), summarize)) is None
+
+
+def test_long_session_stays_within_budget():
+    """
+    Test case: A 200-turn session with incremental summarization through SessionStore.compact.
+    Expected Output: Every prompt history fits max_history_tokens and holds every turn not in the summary,
+    the summary is updated incrementally (each call folds only the new turns), and the stored session stays small.
+    Why: Prompt size, and so LLM latency, must stay flat instead of growing until the session is ended.
+    """
+    manager = HistoryManager(keep_turns=4, max_history_tokens=800, summary_max_tokens=100, summarize_every_turns=2)
+    store = SessionStore()
+    folded = []
+
+    async def summarize(previous, lines):
+        folded.append(len(lines))
+        return (previous + " " + " ".join(line.split()[2] for line in lines)).strip()
+
+    max_tokens, max_chars = 0, 0
+    for turn in range(200):
+        summary, history, summarized = store.get_with_summary("chat")
+        lines, tokens = manager.context(summary, history)
+        max_tokens = max(max_tokens, tokens)
+        # Every earlier turn is in the summary or verbatim in the prompt
+        assert lines[int(bool(summary)):] == history
+        history, _ = store.append_turn("chat", f"question {turn} " + "word " * 20, f"answer {turn} " + "word " * 60)
+        result = asyncio.run(manager.compact(summary, history, summarize))
+        if result:
+            assert store.compact("chat", result[0], result[1], summarized)
+        max_chars = max(max_chars, store.stats()["total_chars"])
+
+    summary, history, summarized = store.get_with_summary("chat")
+    assert max_tokens <= 800
+    assert set(folded) == {4}
+    assert summarized + len(history) == 400
+    assert len(history) <= (4 + 2) * 2
+    assert max_chars < 5000
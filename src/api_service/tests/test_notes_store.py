@@ -0,0 +1,199 @@
+"""
+Unit tests for the NotesStore in routers/utils/notes_store.py.
+
+Functions Overview:
+- add_notes: stores new notes, skipping duplicates by content hash.
+- list_notes: filtered reads ordered by datetime, paginated with a cursor.
+- Legacy import: notes.json is imported once when the store is first opened.
+- Concurrency: parallel saves from threads and processes lose no notes.
+- export_json: atomic snapshot in the old notes.json format.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import pytest
+from api_service.routers.utils.notes_store import NotesStore, note_hash, atomic_write_json, MAX_PAGE_SIZE
+
+
+def _note(i, chat_id="1234"):
+    return {"type": "quote", "datetime": f"2024-11-19T07:{i:02d}:00Z", "chat_id": chat_id, "content": f"Note {i}"}
+
+
+def test_add_notes_skips_duplicates(tmp_path):
+    """
+    Test case: A batch containing stored notes and a duplicate within the batch.
+    Expected Output: Only the notes that were not stored yet are counted and kept.
+    """
+    store = NotesStore(str(tmp_path / "notes.db"))
+    assert store.add_notes([_note(0), _note(1)]) == 2
+    assert store.add_notes([_note(1), _note(2), _note(2)]) == 1
+    assert store.count() == 3
+
+
+def test_note_hash_covers_every_field():
+    assert note_hash(_note(0)) == note_hash(dict(reversed(list(_note(0).items()))))
+    assert note_hash(_note(0)) != note_hash(_note(0, chat_id="5678"))
+
+
+def _all_pages(store, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        notes, cursor = store.list_notes(limit=limit, cursor=cursor, **filters)
+        pages.append(notes)
+        if cursor is None:
+            return pages
+
+
+def test_list_notes_cursor_pagination(tmp_path):
+    """
+    Test case: Five notes read two at a time, inserted out of datetime order.
+    Expected Output: Pages of 2, 2 and 1 notes in datetime order; no cursor after the last page.
+    """
+    store = NotesStore(str(tmp_path / "notes.db"))
+    store.add_notes([_note(i) for i in (3, 0, 4, 1, 2)])
+    assert _all_pages(store, limit=2) == [[_note(0), _note(1)], [_note(2), _note(3)], [_note(4)]]
+    notes, cursor = store.list_notes(limit=MAX_PAGE_SIZE + 1)
+    assert len(notes) == 5 and cursor is None
+
+
+def test_list_notes_cursor_handles_equal_datetimes(tmp_path):
+    store = NotesStore(str(tmp_path / "notes.db"))
+    notes = [{**_note(0), "content": f"Same time {i}"} for i in range(5)]
+    store.add_notes(notes)
+    assert [n for page in _all_pages(store, limit=2) for n in page] == notes
+
+
+def test_list_notes_filters(tmp_path):
+    """
+    Test case: Notes of two chats and two types.
+    Expected Output: Only the notes matching chat_id, type and the [since, until) datetime range.
+    """
+    store = NotesStore(str(tmp_path / "notes.db"))
+    link = {**_note(5, chat_id="5678"), "type": "link"}
+    store.add_notes([_note(i) for i in range(5)] + [_note(i, chat_id="5678") for i in range(3)] + [link])
+
+    assert store.list_notes(chat_id="5678", note_type="link")[0] == [link]
+    assert store.list_notes(chat_id="1234", since=_note(1)["datetime"], until=_note(3)["datetime"])[0] == [_note(1), _note(2)]
+    assert _all_pages(store, limit=2, chat_id="5678", note_type="quote") == [[_note(0, "5678"), _note(1, "5678")], [_note(2, "5678")]]
+    assert store.list_notes(chat_id="unknown") == ([], None)
+
+
+def test_list_notes_rejects_malformed_cursor(tmp_path):
+    store = NotesStore(str(tmp_path / "notes.db"))
+    with pytest.raises(ValueError):
+        store.list_notes(cursor="not-a-cursor")
+
+
+def test_chat_queries_use_index(tmp_path):
+    """
+    Test case: Query plan of a chat page after a cursor.
+    Expected Output: An index search on (chat_id, datetime, id) instead of a table scan.
+    """
+    path = tmp_path / "notes.db"
+    NotesStore(str(path))
+    plan = sqlite3.connect(path).execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM notes WHERE chat_id = ? AND (datetime, id) > (?, ?) ORDER BY datetime, id LIMIT 10",
+        ("1234", "2024", 1),
+    ).fetchall()
+    assert any("idx_notes_chat_datetime" in row[-1] for row in plan)
+
+
+def test_store_uses_wal_mode(tmp_path):
+    path = tmp_path / "notes.db"
+    NotesStore(str(path))
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    """
+    Test case: A notes.json file from the previous file-based storage.
+    Expected Output: Its notes are imported on first open; reopening after the file changed does not import again.
+    """
+    json_path = tmp_path / "notes.json"
+    json_path.write_text(json.dumps([_note(0), _note(1)]), encoding="utf-8")
+    store = NotesStore(str(tmp_path / "notes.db"), legacy_json_path=str(json_path))
+    assert store.list_notes()[0] == [_note(0), _note(1)]
+    store.close()
+
+    json_path.write_text(json.dumps([_note(2)]), encoding="utf-8")
+    reopened = NotesStore(str(tmp_path / "notes.db"), legacy_json_path=str(json_path))
+    assert reopened.count() == 2
+
+
+def test_corrupted_legacy_json_is_skipped(tmp_path):
+    json_path = tmp_path / "notes.json"
+    json_path.write_text("[{", encoding="utf-8")
+    store = NotesStore(str(tmp_path / "notes.db"), legacy_json_path=str(json_path))
+    assert store.count() == 0
+
+
+def _save_from_process(db_path, worker, batches, batch_size):
+    store = NotesStore(db_path)
+    for b in range(batches):
+        # Every batch also re-sends one note of the first worker, which must stay a duplicate
+        notes = [{**_note(0), "content": f"Worker {worker} batch {b} note {i}"} for i in range(batch_size)]
+        store.add_notes(notes + [{**_note(0), "content": "Worker 0 batch 0 note 0"}])
+    store.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs the fork start method")
+def test_parallel_saves_from_processes_lose_no_notes(tmp_path):
+    """
+    Test case: 8 processes (like uvicorn workers) save 25 batches of 10 notes each at the same time.
+    Expected Output: All 2,000 distinct notes are stored exactly once.
+    Why: With notes.json, concurrent read-merge-overwrite saves silently dropped each other's notes.
+    """
+    db_path = str(tmp_path / "notes.db")
+    NotesStore(db_path).close()
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_save_from_process, args=(db_path, w, 25, 10)) for w in range(8)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+
+    store = NotesStore(db_path)
+    assert store.count() == 8 * 25 * 10
+    notes, _ = store.list_notes(limit=MAX_PAGE_SIZE)
+    assert len({note["content"] for note in notes}) == len(notes)
+
+
+def test_parallel_saves_from_event_loop_threads(tmp_path):
+    """
+    Test case: 50 concurrent saves offloaded with asyncio.to_thread, as in /save-notes.
+    Expected Output: Every save reports its notes as new and all of them are stored.
+    """
+    store = NotesStore(str(tmp_path / "notes.db"))
+
+    async def save_all():
+        batches = [[{**_note(0), "content": f"Save {s} note {i}"} for i in range(4)] for s in range(50)]
+        return await asyncio.gather(*(asyncio.to_thread(store.add_notes, batch) for batch in batches))
+
+    assert asyncio.run(save_all()) == [4] * 50
+    assert store.count() == 200
+
+
+def test_export_json_writes_snapshot_atomically(tmp_path):
+    store = NotesStore(str(tmp_path / "notes.db"))
+    store.add_notes([_note(1), _note(0)])
+    path = tmp_path / "export" / "notes.json"
+    assert store.export_json(str(path)) == 2
+    assert json.loads(path.read_text(encoding="utf-8")) == [_note(0), _note(1)]
+    assert os.listdir(path.parent) == ["notes.json"]
+
+
+def test_atomic_write_json_keeps_old_file_on_failure(tmp_path):
+    """
+    Test case: Serialization fails halfway through writing the new file.
+    Expected Output: The previous file is untouched and no temporary file is left behind.
+    """
+    path = tmp_path / "notes.json"
+    atomic_write_json(str(path), [_note(0)])
+    with pytest.raises(TypeError):
+        atomic_write_json(str(path), [_note(1), object()])
+    assert json.loads(path.read_text(encoding="utf-8")) == [_note(0)]
+    assert os.listdir(tmp_path) == ["notes.json"]
@@ -0,0 +1,281 @@
+"""
+Unit tests for the SessionStore in routers/utils/session_store.py.
+
+Functions Overview:
+- get / append_turn: server-side chat history keyed by chat_id, with a running token estimate.
+- Bounds: least recently used sessions are evicted by session count and total characters.
+- TTL: idle sessions expire.
+- Backends: SQLiteSessionBackend (Redis-style get / setex / delete) shares sessions between stores.
+"""
+
+import threading
+
+from api_service.routers.utils.session_store import SessionStore, SQLiteSessionBackend, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_append_turn_builds_history_and_token_count():
+    """
+    Test case: Two turns of one chat.
+    Expected Output: History in the "User: / Response:" format and the token estimate of the whole history.
+    """
+    store = SessionStore()
+    store.append_turn("chat-1", "What are the CS requirements?", "Eleven courses.")
+    history, tokens = store.append_turn("chat-1", "And for AM?", "Twelve courses.")
+    assert history == [
+        "User: What are the CS requirements?",
+        "Response: Eleven courses.",
+        "User: And for AM?",
+        "Response: Twelve courses.",
+    ]
+    assert tokens == sum(estimate_tokens(line) for line in history)
+    assert store.get("chat-1") == (history, tokens)
+    assert store.get("chat-2") == ([], 0)
+
+
+def test_get_returns_a_copy():
+    store = SessionStore()
+    store.append_turn("chat-1", "q", "a")
+    history, _ = store.get("chat-1")
+    history.append("User: injected")
+    assert len(store.get("chat-1")[0]) == 2
+
+
+def test_lru_eviction_by_session_count():
+    store = SessionStore(max_sessions=2)
+    store.append_turn("a", "q", "a")
+    store.append_turn("b", "q", "a")
+    store.get("a")
+    store.append_turn("c", "q", "a")
+    assert store.get("b") == ([], 0)
+    assert store.get("a")[0] and store.get("c")[0]
+    assert store.stats()["evictions"] == 1
+
+
+def test_lru_eviction_by_total_chars():
+    """
+    Test case: Histories whose total size exceeds max_total_chars.
+    Expected Output: Oldest sessions are evicted until the total fits; the size counter stays exact.
+    """
+    store = SessionStore(max_total_chars=100)
+    store.append_turn("a", "x" * 30, "y" * 10)
+    store.append_turn("b", "x" * 30, "y" * 10)
+    assert store.get("a") == ([], 0)
+    assert store.stats()["sessions"] == 1
+    assert store.stats()["total_chars"] == len("User: " + "x" * 30) + len("Response: " + "y" * 10)
+
+
+def test_sessions_expire_after_ttl():
+    clock = FakeClock()
+    store = SessionStore(ttl_seconds=60, clock=clock)
+    store.append_turn("a", "q", "a")
+    clock.now += 59
+    assert store.get("a")[0]
+    clock.now += 59
+    assert store.get("a")[0]  # each use extends the session
+    clock.now += 61
+    assert store.get("a") == ([], 0)
+    assert store.stats() == {"sessions": 0, "total_chars": 0, "evictions": 0, "expirations": 1}
+
+
+def test_prune_drops_expired_sessions():
+    clock = FakeClock()
+    store = SessionStore(ttl_seconds=60, clock=clock)
+    store.append_turn("a", "q", "a")
+    store.append_turn("b", "q", "a")
+    clock.now += 61
+    assert store.prune() == 2
+    assert store.stats()["total_chars"] == 0
+
+
+def test_seed_starts_session_only_once():
+    store = SessionStore()
+    store.seed("a", ["User: hi", "Response: hello"])
+    store.seed("a", ["User: ignored"])
+    history, tokens = store.get("a")
+    assert history == ["User: hi", "Response: hello"]
+    assert tokens == estimate_tokens("User: hi") + estimate_tokens("Response: hello")
+
+
+def test_clear_removes_session():
+    store = SessionStore()
+    store.append_turn("a", "q", "a")
+    store.clear("a")
+    assert store.get("a") == ([], 0)
+    assert store.stats()["total_chars"] == 0
+
+
+def test_sqlite_backend_shares_sessions_between_workers(tmp_path):
+    """
+    Test case: Two stores (two uvicorn workers) on one SQLite backend serve alternate turns of a chat.
+    Expected Output: Each worker sees the turns recorded by the other, and sessions survive a restart.
+    """
+    path = str(tmp_path / "data" / "sessions.db")
+    worker_1 = SessionStore(backend=SQLiteSessionBackend(path))
+    worker_2 = SessionStore(backend=SQLiteSessionBackend(path))
+    worker_1.append_turn("a", "q1", "a1")
+    worker_2.append_turn("a", "q2", "a2")
+    history, tokens = worker_1.append_turn("a", "q3", "a3")
+    assert history == ["User: q1", "Response: a1", "User: q2", "Response: a2", "User: q3", "Response: a3"]
+
+    restarted = SessionStore(backend=SQLiteSessionBackend(path))
+    assert restarted.get("a") == (history, tokens)
+    restarted.clear("a")
+    assert worker_1.get("a") == ([], 0)
+    assert worker_1.stats()["sessions"] == 0  # with a backend, nothing is kept in memory
+
+
+def test_sqlite_backend_concurrent_appends_keep_every_turn(tmp_path):
+    """
+    Test case: Two workers append turns of one chat from several threads at once.
+    Expected Output: Every turn is in the stored history.
+    """
+    path = str(tmp_path / "sessions.db")
+    workers = [SessionStore(backend=SQLiteSessionBackend(path)) for _ in range(2)]
+
+    def append(worker, thread):
+        for i in range(10):
+            worker.append_turn("a", f"q{thread}-{i}", "a")
+
+    threads = [threading.Thread(target=append, args=(workers[t % 2], t)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(workers[0].get("a")[0]) == 80
+
+
+def test_compact_keeps_turn_appended_by_another_worker(tmp_path):
+    """
+    Test case: A worker summarizes a chat while another worker appends a turn to it.
+    Expected Output: The compaction applies to the stored session, so the new turn is kept.
+    """
+    path = str(tmp_path / "sessions.db")
+    worker_1 = SessionStore(backend=SQLiteSessionBackend(path))
+    worker_2 = SessionStore(backend=SQLiteSessionBackend(path))
+    worker_1.append_turn("a", "q0", "a0")
+    _, _, summarized = worker_1.get_with_summary("a")
+    worker_2.append_turn("a", "q1", "a1")
+    assert worker_1.compact("a", "Asked q0", 2, summarized)
+    assert not worker_2.compact("a", "stale", 2, summarized)
+    assert worker_2.get_with_summary("a") == ("Asked q0", ["User: q1", "Response: a1"], 2)
+
+
+def test_sqlite_backend_expires_sessions(tmp_path):
+    clock = FakeClock()
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), clock=clock)
+    backend.setex("key", 60, "value")
+    assert backend.get("key") == "value"
+    clock.now += 61
+    assert backend.get("key") is None
+
+
+def test_sqlite_backend_prunes_expired_and_excess_rows(tmp_path):
+    """
+    Test case: Writes to a backend holding expired sessions and more sessions than max_sessions.
+    Expected Output: Expired rows are deleted once prune_interval has passed, then the rows closest to expiry.
+    """
+    clock = FakeClock()
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), max_sessions=2, prune_interval=30, clock=clock)
+    backend.setex("expired", 10, "value")
+    clock.now += 20
+    backend.setex("a", 60, "value")
+    backend.setex("b", 70, "value")
+    backend.setex("c", 80, "value")
+
+    def keys():
+        return {row[0] for row in backend._db.execute("SELECT key FROM sessions")}
+
+    assert keys() == {"expired", "a", "b", "c"}
+    clock.now += 10
+    backend.setex("c", 80, "value")
+    assert keys() == {"b", "c"}
+
+
+def test_compact_replaces_old_lines_with_summary():
+    """
+    Test case: Three turns, the first two folded into a summary.
+    Expected Output: Only the last turn stays verbatim; tokens include the summary.
+    """
+    store = SessionStore()
+    for i in range(3):
+        store.append_turn("a", f"q{i}", f"a{i}")
+    summary, history, summarized = store.get_with_summary("a")
+    assert (summary, summarized) == ("", 0)
+    assert store.compact("a", "Asked q0 and q1", 4, summarized)
+
+    summary, history, summarized = store.get_with_summary("a")
+    assert (summary, history, summarized) == ("Asked q0 and q1", ["User: q2", "Response: a2"], 4)
+    assert store.get("a")[1] == estimate_tokens("Asked q0 and q1") + estimate_tokens("User: q2") + estimate_tokens("Response: a2")
+
+
+def test_compact_skips_stale_summary():
+    store = SessionStore()
+    for i in range(3):
+        store.append_turn("a", f"q{i}", f"a{i}")
+    assert store.compact("a", "first", 2, 0)
+    assert not store.compact("a", "computed before the first compaction", 2, 0)
+    assert store.get_with_summary("a")[0] == "first"
+
+
+def test_compacted_session_survives_backend_roundtrip(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SessionStore(backend=SQLiteSessionBackend(path))
+    store.append_turn("a", "q0", "a0")
+    store.append_turn("a", "q1", "a1")
+    store.compact("a", "Asked q0", 2, 0)
+    assert SessionStore(backend=SQLiteSessionBackend(path)).get_with_summary("a") == ("Asked q0", ["User: q1", "Response: a1"], 2)
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis-py get / setex / delete / transaction calls."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl_seconds, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def transaction(self, func, *watches):
+        store = self
+
+        class Pipeline:
+            def __init__(self):
+                self.commands = []
+
+            def get(self, key):
+                return store.get(key)
+
+            def multi(self):
+                pass
+
+            def setex(self, key, ttl_seconds, value):
+                self.commands.append((key, ttl_seconds, value))
+
+        pipe = Pipeline()
+        func(pipe)
+        for command in pipe.commands:
+            self.setex(*command)
+
+
+def test_redis_backend_updates_in_a_transaction():
+    redis = FakeRedis()
+    store = SessionStore(backend=redis)
+    store.append_turn("a", "q0", "a0")
+    store.append_turn("a", "q1", "a1")
+    assert store.compact("a", "Asked q0", 2, 0)
+    assert not store.compact("a", "stale", 2, 0)
+    assert SessionStore(backend=redis).get_with_summary("a") == ("Asked q0", ["User: q1", "Response: a1"], 2)
@@ -0,0 +1,131 @@
+"""Crawl throughput benchmark against a local stand-in for seas.harvard.edu.
+
+Starts a threaded HTTP server on localhost that serves synthetic SEAS-like pages with a fixed
+per-request latency, then crawls them once per crawl profile and reports pages/sec.
+The latency stands in for the round trip to the real site, which is what concurrency and
+AutoThrottle trade against; no request leaves the machine.
+
+Usage (from src/data_pipeline):
+    python benchmark_crawl.py --pages 500 --latency 0.05 --profiles polite fast benchmark
+"""
+
+import argparse
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scrapy
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.reactor import install_reactor
+
+from crawl_profiles import PROFILES, get_profile
+
+PAGE = (
+    "<html><head><title>SEAS page {i}</title></head><body>"
+    '<div id="header">Harvard John A. Paulson School of Engineering</div>'
+    "<h1>Page {i}</h1>{paragraphs}"
+    '<div id="footer">Footer</div></body></html>'
+)
+PARAGRAPH = "<p>Computer science research and teaching at SEAS, paragraph {j}.</p>"
+
+
+def make_handler(latency):
+    body_cache = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path not in body_cache:
+                paragraphs = "".join(PARAGRAPH.format(j=j) for j in range(30))
+                body_cache[self.path] = PAGE.format(i=self.path, paragraphs=paragraphs).encode()
+            body = body_cache[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(latency):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_spider(profile_name, urls):
+    """Returns a spider class crawling `urls` with the settings of one profile."""
+    settings = get_profile(profile_name)
+    settings.pop("HTTPCACHE_DIR", None)
+    settings.update({"HTTPCACHE_ENABLED": False, "ROBOTSTXT_OBEY": False, "LOG_LEVEL": "ERROR"})
+
+    class BenchmarkSpider(scrapy.Spider):
+        name = f"benchmark_{profile_name}"
+        start_urls = urls
+        custom_settings = settings
+        pages = 0
+
+        def parse(self, response):
+            text = response.xpath("//body//*[not(self::script or self::style)]/text()").getall()
+            BenchmarkSpider.pages += bool(text)
+
+    return BenchmarkSpider
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark crawl profiles against a local server")
+    parser.add_argument("--pages", type=int, default=500, help="Pages to crawl per profile")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Server latency per request in seconds"
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=sorted(PROFILES),
+        default=["polite", "fast", "benchmark"],
+        help="Profiles to compare",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+    from twisted.internet import defer, reactor
+
+    logging.getLogger("scrapy").setLevel(logging.ERROR)
+    server = start_server(args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base_url}/page/{i}" for i in range(args.pages)]
+    runner = CrawlerRunner({"LOG_LEVEL": "ERROR"})
+    results = []
+
+    @defer.inlineCallbacks
+    def crawl_all():
+        try:
+            for profile_name in args.profiles:
+                spider = make_spider(profile_name, urls)
+                start = time.perf_counter()
+                yield runner.crawl(spider)
+                results.append((profile_name, spider.pages, time.perf_counter() - start))
+        finally:
+            reactor.stop()
+
+    crawl_all()
+    reactor.run()
+    server.shutdown()
+
+    print(f"{args.pages} pages, {args.latency * 1000:.0f} ms server latency")
+    print(f"{'profile':<12}{'pages':>8}{'seconds':>10}{'pages/s':>10}")
+    for profile_name, pages, seconds in results:
+        print(f"{profile_name:<12}{pages:>8}{seconds:>10.2f}{pages / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
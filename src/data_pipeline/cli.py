@@ -1,11 +1,13 @@
 import argparse
 import subprocess
 
+from crawl_profiles import DEFAULT_PROFILE, PROFILES, get_profile, to_scrapy_args
 
-def scrape_links():
+
+def scrape_links(profile_args=()):
     """Run the Scrapy spider to scrape all links."""
     print("Running scrapy to scrape links...")
-    subprocess.run(["scrapy", "runspider", "scrape_links.py"])
+    subprocess.run(["scrapy", "runspider", "scrape_links.py", *profile_args])
 
 
 def filter_links():
@@ -14,10 +16,10 @@ def filter_links():
     subprocess.run(["python", "filter_links.py"])
 
 
-def scrape_content():
+def scrape_content(profile_args=()):
     """Run the Scrapy spider to scrape content."""
     print("Running scrapy to scrape content...")
-    subprocess.run(["scrapy", "runspider", "scrape_content_scrapy.py"])
+    subprocess.run(["scrapy", "runspider", "scrape_content_scrapy.py", *profile_args])
 
 
 def main():
@@ -36,15 +38,30 @@ def main():
         "--scrape_content", action="store_true", help="Scrape text content with scrapy"
     )
 
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="Crawl profile (concurrency, AutoThrottle, caches, timeout) for the spiders",
+    )
+    parser.add_argument(
+        "--setting",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Override a Scrapy setting of the crawl profile (repeatable)",
+    )
+
     args = parser.parse_args()
+    profile_args = to_scrapy_args(get_profile(args.profile, args.setting))
 
     # Determine which command was run and execute the corresponding function
     if args.scrape_links:
-        scrape_links()
+        scrape_links(profile_args)
     elif args.filter_links:
         filter_links()
     elif args.scrape_content:
-        scrape_content()
+        scrape_content(profile_args)
     else:
         # If no command is provided, print the help message
         parser.print_help()
@@ -0,0 +1,372 @@
+"""Sharded JSON Lines writer for the scraped corpus.
+
+Each scraped page becomes one line:
+    {"url": ..., "text_content": ..., "metadata": {...}}
+
+Records are written as soon as a page is parsed, so a crawl never holds the corpus in memory.
+A new shard is started every `records_per_shard` records; shards are named
+`<prefix>-00000.jsonl[.gz]` and are written under a `.tmp` name that is renamed when the
+shard is complete, so readers only ever see whole shards. Compression is chosen per writer:
+None or "gzip" (the default).
+
+ShardedCorpusPipeline wraps the writer as a Scrapy item pipeline with periodic checkpoints, so
+an interrupted crawl can be resumed without scraping the finished pages again.
+
+merge_latest_records folds the pages of a crawl into an existing corpus, keeping one record
+per URL, so a corpus that is updated crawl after crawl never holds two versions of a page.
+
+src/data_pipeline_dynamic/corpus_writer.py has only the shard-writing part of this module, since
+each pipeline is its own Docker build context.
+
+Usage:
+    with ShardedJsonlWriter("/app/data/scraped_shards", compression="gzip") as writer:
+        writer.write(url, text_content, metadata)
+    for record in iter_records("/app/data/scraped_shards/scraped-00000.jsonl.gz"):
+        ...
+"""
+
+import gzip
+import io
+import json
+import os
+import time
+from typing import Iterator, List, Optional, Set
+
+EXTENSIONS = {None: ".jsonl", "gzip": ".jsonl.gz"}
+
+
+def open_shard_for_write(path: str, compression: Optional[str]) -> io.TextIOBase:
+    """Opens a shard file for writing text with the given compression.
+
+    Args:
+        path (str): File to create.
+        compression (Optional[str]): None or "gzip".
+
+    Returns:
+        io.TextIOBase: A text stream; closing it closes the file.
+    """
+    if compression is None:
+        return open(path, "w", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def open_shard_for_read(path: str) -> io.TextIOBase:
+    """Opens a shard file for reading text, detecting compression from its extension.
+
+    Args:
+        path (str): Shard file ending in .jsonl or .jsonl.gz.
+
+    Returns:
+        io.TextIOBase: A text stream over the decompressed lines.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Yields the records of one shard, one line at a time.
+
+    Args:
+        path (str): Shard file.
+
+    Yields:
+        dict: One record per non-empty line.
+    """
+    with open_shard_for_read(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def list_shards(directory: str, prefix: str = "") -> List[str]:
+    """Returns the complete shard files in a directory, sorted by name.
+
+    Args:
+        directory (str): Directory holding the shards.
+        prefix (str): Only shards whose name starts with this prefix.
+
+    Returns:
+        List[str]: Paths of the shards (in-progress .tmp files are excluded).
+    """
+    names = sorted(
+        name
+        for name in os.listdir(directory)
+        if name.startswith(prefix) and name.endswith(tuple(EXTENSIONS.values()))
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def shard_index(path: str, prefix: str) -> int:
+    """Returns the index of a shard from its file name, `<prefix>-00000.jsonl[.gz]`.
+
+    Args:
+        path (str): Shard file.
+        prefix (str): Shard file name prefix.
+
+    Returns:
+        int: The shard index.
+    """
+    name = os.path.basename(path)
+    return int(name[len(prefix) + 1:].split(".", 1)[0])
+
+
+def remove_shards(directory: str, prefix: str = ""):
+    """Deletes the shards (and leftover .tmp files) of an earlier run.
+
+    Args:
+        directory (str): Directory holding the shards.
+        prefix (str): Only shards whose name starts with this prefix.
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and ".jsonl" in name:
+            os.remove(os.path.join(directory, name))
+
+
+def merge_latest_records(
+    base_shards: List[str],
+    update_shards: List[List[str]],
+    output_dir: str,
+    prefix: str = "scraped",
+    records_per_shard: int = 5000,
+    compression: Optional[str] = "gzip",
+) -> int:
+    """Writes a corpus with exactly one record per URL, the most recent one.
+
+    The update groups are applied oldest first, so a URL's record from a later group replaces the
+    one from an earlier group, and any update replaces the record of `base_shards`. Only the updates
+    are held in memory; the base corpus is streamed.
+
+    Args:
+        base_shards (List[str]): Shards of the current corpus.
+        update_shards (List[List[str]]): Groups of shards with newer records, oldest group first.
+        output_dir (str): Directory for the merged shards (created if missing).
+        prefix (str): Shard file name prefix.
+        records_per_shard (int): Records per shard before rotating.
+        compression (Optional[str]): None or "gzip".
+
+    Returns:
+        int: Number of records (URLs) in the merged corpus.
+    """
+    updates = {}
+    for group in update_shards:
+        for path in group:
+            for record in iter_records(path):
+                updates[record["url"]] = record
+    written = set()
+    with ShardedJsonlWriter(output_dir, prefix, records_per_shard, compression) as writer:
+        for path in base_shards:
+            for record in iter_records(path):
+                url = record["url"]
+                if url in updates or url in written:
+                    continue
+                written.add(url)
+                writer.write(url, record["text_content"], record["metadata"])
+        for url, record in updates.items():
+            writer.write(url, record["text_content"], record["metadata"])
+    return writer.records_written
+
+
+class ShardedJsonlWriter:
+    """Writes one JSON line per scraped page, rotating to a new shard every N records."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        prefix: str = "scraped",
+        records_per_shard: int = 5000,
+        compression: Optional[str] = "gzip",
+        start_shard: int = 0,
+    ):
+        """Creates the writer; the first shard is opened on the first write.
+
+        Args:
+            output_dir (str): Directory for the shards (created if missing).
+            prefix (str): Shard file name prefix.
+            records_per_shard (int): Records per shard before rotating.
+            compression (Optional[str]): None or "gzip".
+            start_shard (int): Index of the first shard, e.g. to append to an earlier run.
+        """
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.records_per_shard = records_per_shard
+        self.compression = compression
+        self.shard_index = start_shard
+        self.records_written = 0
+        self.shard_paths: List[str] = []
+        self._file = None
+        self._records_in_shard = 0
+        self._tmp_path = None
+
+    def _shard_path(self, index: int) -> str:
+        name = f"{self.prefix}-{index:05d}{EXTENSIONS[self.compression]}"
+        return os.path.join(self.output_dir, name)
+
+    def _open_shard(self):
+        self._tmp_path = self._shard_path(self.shard_index) + ".tmp"
+        self._file = open_shard_for_write(self._tmp_path, self.compression)
+        self._records_in_shard = 0
+
+    def _close_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        final_path = self._shard_path(self.shard_index)
+        os.replace(self._tmp_path, final_path)
+        self.shard_paths.append(final_path)
+        self._file = None
+        self.shard_index += 1
+
+    def write(self, url: str, text_content: str, metadata: dict):
+        """Appends one page record, rotating the shard when it is full.
+
+        Args:
+            url (str): Page URL.
+            text_content (str): Cleaned page text.
+            metadata (dict): Page metadata (last_modified, scraped_at, word_count, ...).
+        """
+        if self._file is None:
+            self._open_shard()
+        record = {"url": url, "text_content": text_content, "metadata": metadata}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._records_in_shard += 1
+        self.records_written += 1
+        if self._records_in_shard >= self.records_per_shard:
+            self._close_shard()
+
+    def flush(self):
+        """Closes the current shard so everything written so far is in complete shard files."""
+        self._close_shard()
+
+    def close(self):
+        self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ShardedCorpusPipeline:
+    """Scrapy item pipeline that streams scraped pages to JSONL shards as they arrive.
+
+    Items are dicts with "url", "text_content" and "metadata" keys. Every completed shard is a
+    checkpoint: the shard is renamed into place and a small checkpoint file records the next shard
+    index. A shard is completed when it holds `records_per_shard` records or when `flush_seconds`
+    have passed since the last checkpoint, so a crash loses at most one partial shard.
+
+    If a checkpoint exists when the spider opens, the crawl resumes: the partial shard and any shard
+    completed after the last checkpoint are discarded, new shards continue after the checkpointed
+    ones and the URLs already in them are exposed to the spider as `spider.completed_urls`.
+    A crawl that finishes normally removes its checkpoint.
+
+    Settings:
+        CORPUS_SHARD_DIR: Directory for the shards.
+        CORPUS_SHARD_PREFIX: Shard file name prefix.
+        CORPUS_RECORDS_PER_SHARD: Records per shard.
+        CORPUS_FLUSH_SECONDS: Maximum seconds between checkpoints.
+        CORPUS_COMPRESSION: None or "gzip".
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        prefix: str = "scraped",
+        records_per_shard: int = 5000,
+        flush_seconds: float = 60.0,
+        compression: Optional[str] = "gzip",
+    ):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.records_per_shard = records_per_shard
+        self.flush_seconds = flush_seconds
+        self.compression = compression
+        self.checkpoint_path = os.path.join(output_dir, f"{prefix}.checkpoint.json")
+        self.completed_urls: Set[str] = set()
+        self.writer: Optional[ShardedJsonlWriter] = None
+        self._last_checkpoint = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+
+        settings = crawler.settings
+        pipeline = cls(
+            output_dir=settings.get("CORPUS_SHARD_DIR", "/app/data/scraped_shards"),
+            prefix=settings.get("CORPUS_SHARD_PREFIX", "scraped"),
+            records_per_shard=settings.getint("CORPUS_RECORDS_PER_SHARD", 5000),
+            flush_seconds=settings.getfloat("CORPUS_FLUSH_SECONDS", 60.0),
+            compression=settings.get("CORPUS_COMPRESSION", "gzip"),
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def _load_checkpoint(self) -> int:
+        """Returns the shard index to continue from, recovering the completed URLs."""
+        if not os.path.exists(self.checkpoint_path):
+            remove_shards(self.output_dir, prefix=self.prefix)
+            return 0
+        with open(self.checkpoint_path, "r") as f:
+            next_shard = json.load(f)["next_shard"]
+        for name in os.listdir(self.output_dir):
+            if name.startswith(self.prefix) and name.endswith(".tmp"):
+                os.remove(os.path.join(self.output_dir, name))
+        for path in list_shards(self.output_dir, prefix=self.prefix + "-"):
+            # A shard at or past next_shard was renamed into place but never checkpointed
+            # (crash in between); it is rewritten by the resumed crawl, so its pages are redone
+            if shard_index(path, self.prefix) >= next_shard:
+                os.remove(path)
+                continue
+            for record in iter_records(path):
+                self.completed_urls.add(record["url"])
+        return next_shard
+
+    def _write_checkpoint(self):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"next_shard": self.writer.shard_index, "pages": len(self.completed_urls)}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self._last_checkpoint = time.monotonic()
+
+    def open_spider(self, spider):
+        os.makedirs(self.output_dir, exist_ok=True)
+        start_shard = self._load_checkpoint()
+        self.writer = ShardedJsonlWriter(
+            self.output_dir,
+            prefix=self.prefix,
+            records_per_shard=self.records_per_shard,
+            compression=self.compression,
+            start_shard=start_shard,
+        )
+        spider.completed_urls = self.completed_urls
+        if self.completed_urls:
+            spider.logger.info(f"Resuming crawl: {len(self.completed_urls)} pages already scraped")
+
+    def process_item(self, item, spider):
+        shard_index = self.writer.shard_index
+        self.writer.write(item["url"], item["text_content"], item["metadata"])
+        self.completed_urls.add(item["url"])
+        if self.writer.shard_index == shard_index and (
+            time.monotonic() - self._last_checkpoint >= self.flush_seconds
+        ):
+            self.writer.flush()
+        if self.writer.shard_index != shard_index:
+            self._write_checkpoint()
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        self._write_checkpoint()
+
+    def spider_closed(self, spider, reason):
+        # Keep the checkpoint of an interrupted crawl so the next run resumes it
+        if reason == "finished" and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
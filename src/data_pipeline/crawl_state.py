@@ -0,0 +1,98 @@
+"""Per-URL HTTP validators kept between crawls, for conditional re-crawling.
+
+For every scraped URL the store keeps the Last-Modified and ETag headers of the last response
+and a hash of the cleaned page text:
+
+    {"https://seas.harvard.edu/...": {"last_modified": "...", "etag": "...", "content_hash": "..."}}
+
+The next crawl sends them back as If-Modified-Since / If-None-Match, so unchanged pages come back
+as 304 Not Modified without a body. Servers that ignore conditional requests are caught by the
+content hash: a page whose cleaned text hashes to the stored value is not emitted again.
+
+Usage:
+    store = ValidatorStore.load("/app/data/crawl_validators.json")
+    headers = store.conditional_headers(url)
+    if store.update(url, last_modified, etag, content_hash(text)):
+        ...  # page changed, emit it
+    store.save()
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+
+def content_hash(text: str) -> str:
+    """Returns the SHA-256 hex digest of the cleaned page text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ValidatorStore:
+    """Last-Modified, ETag and content hash of every URL seen by earlier crawls."""
+
+    def __init__(self, path: str, validators: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.validators = validators or {}
+
+    @classmethod
+    def load(cls, path: str) -> "ValidatorStore":
+        """Loads the store, or returns an empty one if no earlier crawl saved it.
+
+        Args:
+            path (str): JSON file of the store.
+
+        Returns:
+            ValidatorStore: The loaded store.
+        """
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r") as file:
+            return cls(path, json.load(file))
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Returns the If-Modified-Since / If-None-Match headers for a URL, if any are known."""
+        entry = self.validators.get(url, {})
+        headers = {}
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        return headers
+
+    def update(
+        self,
+        url: str,
+        last_modified: Optional[str],
+        etag: Optional[str],
+        page_hash: str,
+    ) -> bool:
+        """Records the validators of a fetched page.
+
+        Args:
+            url (str): Page URL.
+            last_modified (Optional[str]): Raw Last-Modified header.
+            etag (Optional[str]): Raw ETag header.
+            page_hash (str): content_hash of the cleaned page text.
+
+        Returns:
+            bool: True if the page is new or its content changed since the last crawl.
+        """
+        previous = self.validators.get(url)
+        self.validators[url] = {
+            "last_modified": last_modified,
+            "etag": etag,
+            "content_hash": page_hash,
+        }
+        return previous is None or previous.get("content_hash") != page_hash
+
+    def save(self):
+        """Writes the store atomically, so an interrupted save keeps the previous state."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.validators, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.validators)
@@ -3,6 +3,29 @@ import re
 import scrapy
 import json
 from email.utils import parsedate_to_datetime
+import os
+import shutil
+
+from corpus_writer import (
+    ShardedCorpusPipeline,
+    list_shards,
+    merge_latest_records,
+    remove_shards,
+)
+from crawl_state import ValidatorStore, content_hash
+
+# Scraped pages are streamed by ShardedCorpusPipeline to JSON Lines shards (one record per URL)
+SHARD_DIR = "/app/data/scraped_shards"
+SHARD_PREFIX = "scraped_data_harvard"
+RECORDS_PER_SHARD = 5000
+# Current corpus, one record (the latest version) per URL; this is the prefix the vector
+# database loads
+GCP_SHARD_DIR = "/app/gcp_static_data/scraped_shards"
+# Changed pages of every crawl, one timestamped folder per crawl, kept outside the loaded prefix
+GCP_CHANGES_DIR = "/app/gcp_static_data/scraped_changes"
+MERGED_SHARD_DIR = "/app/data/merged_shards"
+# Last-Modified / ETag / content hash per URL, used to re-crawl only changed pages
+VALIDATORS_FILE = "/app/data/crawl_validators.json"
 
 
 with open("/app/data/harvard_cs_filtered_links.json", "r") as file:
@@ -15,18 +38,43 @@ class MySpider(scrapy.Spider):
 
     # List of URLs to scrape
     start_urls = urls
+    # Let parse() see 304 Not Modified responses to conditional requests
+    handle_httpstatus_list = [304]
+    custom_settings = {
+        "ITEM_PIPELINES": {ShardedCorpusPipeline: 300},
+        "CORPUS_SHARD_DIR": SHARD_DIR,
+        "CORPUS_SHARD_PREFIX": SHARD_PREFIX,
+        "CORPUS_RECORDS_PER_SHARD": RECORDS_PER_SHARD,
+        "CORPUS_FLUSH_SECONDS": 60,
+    }
 
     def __init__(self, *args, **kwargs):
         super(MySpider, self).__init__(*args, **kwargs)
-        self.scraped_data = {}  # Initialize an empty dictionary to store scraped data
-        self.scraped_text = ""
+        # Filled in by ShardedCorpusPipeline when resuming an interrupted crawl
+        self.completed_urls = set()
+        self.validators = ValidatorStore.load(VALIDATORS_FILE)
+
+    def start_requests(self):
+        for url in self.start_urls:
+            if url not in self.completed_urls:
+                headers = self.validators.conditional_headers(url)
+                # Validators are keyed by the requested URL, which the meta keeps across redirects
+                yield scrapy.Request(
+                    url, headers=headers, dont_filter=True, meta={"crawl_url": url}
+                )
 
     def parse(self, response):
 
-        url_dict = {}
+        if response.status == 304:
+            self.crawler.stats.inc_value("crawl_state/not_modified")
+            return
+
         metadata = {}
 
         last_modified = response.headers.get("Last-Modified")
+        raw_last_modified = last_modified.decode("utf-8") if last_modified else None
+        etag = response.headers.get("ETag")
+        etag = etag.decode("utf-8") if etag else None
         if last_modified:
             try:
                 # Ensure it's a string and pass it to the parser
@@ -97,19 +145,60 @@ class MySpider(scrapy.Spider):
 
         if len(cleaned_text) == 0:
             return
-        # Store the cleaned text content in the dictionary with the URL as the key
+        # Only pages that are new or whose text changed since the last crawl are emitted
+        if not self.validators.update(
+            response.meta.get("crawl_url", response.url),
+            raw_last_modified,
+            etag,
+            content_hash(cleaned_text),
+        ):
+            self.crawler.stats.inc_value("crawl_state/unchanged")
+            return
+
+        # Hand the page to the item pipeline, which writes it to disk right away
         metadata["url"] = response.url
-        url_dict["text_content"] = cleaned_text
-        url_dict["metadata"] = metadata
-        self.scraped_data[response.url] = url_dict
-        self.scraped_text += cleaned_text_content
+        yield {"url": response.url, "text_content": cleaned_text, "metadata": metadata}
 
     def closed(self, reason):
-        # Save the scraped data into a JSON file
-        if len(self.scraped_data) == 0:
-            print("no scraped!")
+        # The item pipeline has already written every emitted page, so the validators are in sync
+        self.validators.save()
+        if reason != "finished":
+            print(f"Crawl stopped ({reason}); run again to resume from the last checkpoint")
+            return
+        shards = list_shards(SHARD_DIR, prefix=SHARD_PREFIX + "-")
+        if not shards:
+            print("no changed pages")
             return
-        with open("/app/data/scraped_data_harvard_test.json", "w") as f:
-            json.dump(self.scraped_data, f)
-        with open("/app/gcp_static_data/scraped_data_harvard_test.json", "w") as f:
-            json.dump(self.scraped_data, f)
+        run_dir = os.path.join(
+            GCP_CHANGES_DIR, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        )
+        os.makedirs(run_dir, exist_ok=True)
+        for path in shards:
+            shutil.copy(path, run_dir)
+        print(f"{len(shards)} shards of changed pages copied to {run_dir}")
+        publish_current_corpus(shards)
+
+
+def publish_current_corpus(changed_shards):
+    """Folds the changed pages of a crawl into the current corpus in GCP_SHARD_DIR.
+
+    The current corpus keeps one record per URL, so loading it indexes every page exactly once,
+    in its latest version, whatever order the loader reads the shards in.
+    """
+    os.makedirs(GCP_SHARD_DIR, exist_ok=True)
+    remove_shards(MERGED_SHARD_DIR, prefix=SHARD_PREFIX)
+    pages = merge_latest_records(
+        list_shards(GCP_SHARD_DIR, prefix=SHARD_PREFIX + "-"),
+        [changed_shards],
+        MERGED_SHARD_DIR,
+        prefix=SHARD_PREFIX,
+        records_per_shard=RECORDS_PER_SHARD,
+    )
+    merged = list_shards(MERGED_SHARD_DIR, prefix=SHARD_PREFIX + "-")
+    merged_names = {os.path.basename(path) for path in merged}
+    for path in merged:
+        shutil.copy(path, GCP_SHARD_DIR)
+    for path in list_shards(GCP_SHARD_DIR, prefix=SHARD_PREFIX + "-"):
+        if os.path.basename(path) not in merged_names:
+            os.remove(path)
+    print(f"Current corpus in {GCP_SHARD_DIR}: {pages} pages in {len(merged)} shards")
@@ -0,0 +1,207 @@
+import gzip
+import os
+import json
+import pytest
+from data_pipeline.corpus_writer import (
+    ShardedCorpusPipeline,
+    ShardedJsonlWriter,
+    iter_records,
+    list_shards,
+    merge_latest_records,
+    remove_shards,
+)
+
+METADATA = {
+    "last_modified": None,
+    "scraped_at": "2024-10-10T00:00:00Z",
+    "word_count": 2,
+    "url": "https://seas.harvard.edu/0",
+}
+
+
+def test_writer_rotates_shards(tmp_path):
+    """Test that records are spread over shards of records_per_shard lines."""
+    with ShardedJsonlWriter(str(tmp_path), prefix="pages", records_per_shard=2) as writer:
+        for i in range(5):
+            writer.write(f"https://seas.harvard.edu/{i}", f"Page {i}", METADATA)
+
+    shards = list_shards(str(tmp_path), prefix="pages")
+    assert [p.rsplit("/", 1)[-1] for p in shards] == [
+        "pages-00000.jsonl.gz",
+        "pages-00001.jsonl.gz",
+        "pages-00002.jsonl.gz",
+    ]
+    assert writer.records_written == 5
+    records = [r for shard in shards for r in iter_records(shard)]
+    assert [r["url"] for r in records] == [f"https://seas.harvard.edu/{i}" for i in range(5)]
+    assert records[0] == {
+        "url": "https://seas.harvard.edu/0",
+        "text_content": "Page 0",
+        "metadata": METADATA,
+    }
+
+
+def test_writer_shards_are_line_delimited_gzip(tmp_path):
+    """Test that a gzip shard holds one JSON object per line."""
+    with ShardedJsonlWriter(str(tmp_path)) as writer:
+        writer.write("https://seas.harvard.edu/a", "A", METADATA)
+        writer.write("https://seas.harvard.edu/b", "B", METADATA)
+    with gzip.open(writer.shard_paths[0], "rt", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)["text_content"] for line in lines] == ["A", "B"]
+
+
+def test_writer_hides_incomplete_shard(tmp_path):
+    """Test that a shard being written is not listed until it is complete."""
+    writer = ShardedJsonlWriter(str(tmp_path), compression=None)
+    writer.write("https://seas.harvard.edu/a", "A", METADATA)
+    assert list_shards(str(tmp_path)) == []
+    writer.flush()
+    assert len(list_shards(str(tmp_path))) == 1
+    writer.close()
+
+
+def _write_pages(directory, pages):
+    with ShardedJsonlWriter(str(directory), prefix="pages", records_per_shard=2) as writer:
+        for url, text in pages:
+            writer.write(url, text, METADATA)
+    return writer.shard_paths
+
+
+def test_merge_latest_records_keeps_one_record_per_url(tmp_path):
+    """Test that the merged corpus holds every URL once, in its most recent version."""
+    base = _write_pages(tmp_path / "base", [("a", "a v1"), ("b", "b v1"), ("c", "c v1")])
+    first = _write_pages(tmp_path / "first", [("b", "b v2"), ("d", "d v1")])
+    second = _write_pages(tmp_path / "second", [("b", "b v3")])
+
+    pages = merge_latest_records(
+        base, [first, second], str(tmp_path / "merged"), prefix="pages", records_per_shard=2
+    )
+
+    records = [
+        r
+        for shard in list_shards(str(tmp_path / "merged"), prefix="pages")
+        for r in iter_records(shard)
+    ]
+    assert pages == 4
+    assert {r["url"]: r["text_content"] for r in records} == {
+        "a": "a v1",
+        "b": "b v3",
+        "c": "c v1",
+        "d": "d v1",
+    }
+    assert len(records) == 4
+
+
+def test_merge_latest_records_without_base(tmp_path):
+    """Test that a first crawl becomes the corpus, with duplicate URLs collapsed."""
+    crawl = _write_pages(tmp_path / "crawl", [("a", "a v1"), ("a", "a v2")])
+
+    merge_latest_records([], [crawl], str(tmp_path / "merged"), prefix="pages")
+
+    shards = list_shards(str(tmp_path / "merged"), prefix="pages")
+    assert [r["text_content"] for shard in shards for r in iter_records(shard)] == ["a v2"]
+
+
+def test_remove_shards(tmp_path):
+    """Test that shards of an earlier run are removed."""
+    with ShardedJsonlWriter(str(tmp_path), prefix="pages") as writer:
+        writer.write("https://seas.harvard.edu/a", "A", METADATA)
+    remove_shards(str(tmp_path), prefix="pages")
+    assert list_shards(str(tmp_path)) == []
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedJsonlWriter(str(tmp_path), compression="bz2")
+    with pytest.raises(ValueError):
+        ShardedJsonlWriter(str(tmp_path), compression="zstd")
+
+
+class _Spider:
+    class logger:
+        @staticmethod
+        def info(message):
+            pass
+
+
+def _item(i):
+    url = f"https://seas.harvard.edu/{i}"
+    return {"url": url, "text_content": f"Page {i}", "metadata": METADATA}
+
+
+def test_pipeline_checkpoints_and_resumes_after_crash(tmp_path):
+    """Test that a crawl interrupted mid-shard resumes after its last complete shard."""
+    pipeline = ShardedCorpusPipeline(str(tmp_path), prefix="pages", records_per_shard=2)
+    spider = _Spider()
+    pipeline.open_spider(spider)
+    for i in range(5):
+        pipeline.process_item(_item(i), spider)
+    # Crash: close_spider is never called, page 4 only exists in the partial shard
+
+    resumed = ShardedCorpusPipeline(str(tmp_path), prefix="pages", records_per_shard=2)
+    spider = _Spider()
+    resumed.open_spider(spider)
+    assert spider.completed_urls == {f"https://seas.harvard.edu/{i}" for i in range(4)}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".jsonl.gz.tmp")]
+    for i in range(4, 6):
+        resumed.process_item(_item(i), spider)
+    resumed.close_spider(spider)
+    resumed.spider_closed(spider, "finished")
+
+    shards = list_shards(str(tmp_path), prefix="pages-")
+    records = [r for path in shards for r in iter_records(path)]
+    assert [r["text_content"] for r in records] == [f"Page {i}" for i in range(6)]
+    assert not os.path.exists(resumed.checkpoint_path)
+
+
+def test_pipeline_resume_drops_shard_completed_after_checkpoint(tmp_path):
+    """Test a crash between renaming a shard into place and writing its checkpoint."""
+    pipeline = ShardedCorpusPipeline(str(tmp_path), prefix="pages", records_per_shard=2)
+    spider = _Spider()
+    pipeline.open_spider(spider)
+    for i in range(2):
+        pipeline.process_item(_item(i), spider)
+    # Shard 1 is completed, but the crash comes before the checkpoint records it
+    pipeline.writer.write(_item(2)["url"], "Page 2", METADATA)
+    pipeline.writer.write(_item(3)["url"], "Page 3", METADATA)
+    assert len(list_shards(str(tmp_path), prefix="pages-")) == 2
+
+    resumed = ShardedCorpusPipeline(str(tmp_path), prefix="pages", records_per_shard=2)
+    spider = _Spider()
+    resumed.open_spider(spider)
+    assert spider.completed_urls == {f"https://seas.harvard.edu/{i}" for i in range(2)}
+    assert len(list_shards(str(tmp_path), prefix="pages-")) == 1
+    for i in range(2, 4):
+        resumed.process_item(_item(i), spider)
+    resumed.close_spider(spider)
+
+    shards = list_shards(str(tmp_path), prefix="pages-")
+    records = [r for path in shards for r in iter_records(path)]
+    assert [r["text_content"] for r in records] == [f"Page {i}" for i in range(4)]
+
+
+def test_pipeline_flushes_partial_shard_after_interval(tmp_path):
+    """Test that a slow crawl still completes a shard every flush_seconds."""
+    pipeline = ShardedCorpusPipeline(str(tmp_path), records_per_shard=100, flush_seconds=0)
+    spider = _Spider()
+    pipeline.open_spider(spider)
+    pipeline.process_item(_item(0), spider)
+    assert len(list_shards(str(tmp_path))) == 1
+    assert os.path.exists(pipeline.checkpoint_path)
+
+
+def test_pipeline_keeps_checkpoint_of_interrupted_crawl(tmp_path):
+    """Test that a stopped crawl keeps its checkpoint, and a fresh crawl starts clean."""
+    pipeline = ShardedCorpusPipeline(str(tmp_path), records_per_shard=100)
+    spider = _Spider()
+    pipeline.open_spider(spider)
+    pipeline.process_item(_item(0), spider)
+    pipeline.close_spider(spider)
+    pipeline.spider_closed(spider, "shutdown")
+    assert os.path.exists(pipeline.checkpoint_path)
+
+    os.remove(pipeline.checkpoint_path)
+    fresh = ShardedCorpusPipeline(str(tmp_path), records_per_shard=100)
+    fresh.open_spider(_Spider())
+    assert list_shards(str(tmp_path)) == []
@@ -0,0 +1,51 @@
+import pytest
+from data_pipeline.crawl_profiles import PROFILES, get_profile, to_scrapy_args
+
+
+def test_profiles_set_crawl_tuning():
+    """Test that every profile sets concurrency, throttling, DNS cache and timeout."""
+    for settings in PROFILES.values():
+        for key in (
+            "CONCURRENT_REQUESTS_PER_DOMAIN",
+            "AUTOTHROTTLE_ENABLED",
+            "DNSCACHE_ENABLED",
+            "HTTPCACHE_ENABLED",
+            "DOWNLOAD_TIMEOUT",
+        ):
+            assert key in settings
+
+
+def test_dev_profile_uses_validating_http_cache():
+    settings = get_profile("dev")
+    assert settings["HTTPCACHE_ENABLED"] is True
+    assert settings["HTTPCACHE_POLICY"].endswith("RFC2616Policy")
+    assert settings["AUTOTHROTTLE_TARGET_CONCURRENCY"] == PROFILES["polite"][
+        "AUTOTHROTTLE_TARGET_CONCURRENCY"
+    ]
+
+
+def test_get_profile_applies_overrides_without_changing_profile():
+    settings = get_profile("fast", ["DOWNLOAD_TIMEOUT=60", "HTTPCACHE_DIR = /tmp/cache"])
+    assert settings["DOWNLOAD_TIMEOUT"] == "60"
+    assert settings["HTTPCACHE_DIR"] == "/tmp/cache"
+    assert PROFILES["fast"]["DOWNLOAD_TIMEOUT"] == 15
+
+
+@pytest.mark.parametrize("override", ["DOWNLOAD_TIMEOUT", "=60"])
+def test_get_profile_rejects_malformed_override(override):
+    with pytest.raises(ValueError):
+        get_profile("polite", [override])
+
+
+def test_get_profile_rejects_unknown_profile():
+    with pytest.raises(ValueError):
+        get_profile("reckless")
+
+
+def test_to_scrapy_args():
+    assert to_scrapy_args({"DOWNLOAD_TIMEOUT": 30, "DNSCACHE_ENABLED": True}) == [
+        "-s",
+        "DOWNLOAD_TIMEOUT=30",
+        "-s",
+        "DNSCACHE_ENABLED=True",
+    ]
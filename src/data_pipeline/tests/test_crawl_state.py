@@ -0,0 +1,43 @@
+from data_pipeline.crawl_state import ValidatorStore, content_hash
+
+URL = "https://seas.harvard.edu/about"
+LAST_MODIFIED = "Wed, 09 Oct 2024 10:00:00 GMT"
+
+
+def test_conditional_headers_from_previous_crawl(tmp_path):
+    """Test that saved validators are sent back as conditional request headers."""
+    path = str(tmp_path / "validators.json")
+    store = ValidatorStore.load(path)
+    assert store.conditional_headers(URL) == {}
+    store.update(URL, LAST_MODIFIED, '"abc"', content_hash("Text"))
+    store.save()
+
+    reloaded = ValidatorStore.load(path)
+    assert len(reloaded) == 1
+    assert reloaded.conditional_headers(URL) == {
+        "If-Modified-Since": LAST_MODIFIED,
+        "If-None-Match": '"abc"',
+    }
+
+
+def test_conditional_headers_skip_missing_validators(tmp_path):
+    """Test that only the validators the server sent are used."""
+    store = ValidatorStore(str(tmp_path / "validators.json"))
+    store.update(URL, None, '"abc"', content_hash("Text"))
+    assert store.conditional_headers(URL) == {"If-None-Match": '"abc"'}
+
+
+def test_update_reports_changed_content(tmp_path):
+    """Test that a page counts as changed only when it is new or its text hash differs."""
+    store = ValidatorStore(str(tmp_path / "validators.json"))
+    assert store.update(URL, LAST_MODIFIED, None, content_hash("Text"))
+    assert not store.update(URL, "Thu, 10 Oct 2024 10:00:00 GMT", None, content_hash("Text"))
+    assert store.update(URL, LAST_MODIFIED, None, content_hash("New text"))
+    assert store.conditional_headers(URL) == {"If-Modified-Since": LAST_MODIFIED}
+
+
+def test_save_leaves_no_temporary_file(tmp_path):
+    store = ValidatorStore(str(tmp_path / "state" / "validators.json"))
+    store.update(URL, None, None, content_hash("Text"))
+    store.save()
+    assert sorted(p.name for p in (tmp_path / "state").iterdir()) == ["validators.json"]
@@ -0,0 +1,131 @@
+"""Sharded JSON Lines writer for the dynamic pages.
+
+Writes pages in the shard format of the scraped corpus (see data_pipeline/corpus_writer.py), so
+the vector database loader reads both the same way. Each page is one line:
+    {"url": ..., "text_content": ..., "metadata": {...}}
+
+Shards are named `<prefix>-00000.jsonl[.gz]` and are written under a `.tmp` name that is renamed
+when the shard is complete, so readers only ever see whole shards.
+
+Usage:
+    remove_shards("data", prefix="processed_dynamic_events_1")
+    with ShardedJsonlWriter("data", prefix="processed_dynamic_events_1") as writer:
+        writer.write(url, text_content, metadata)
+"""
+
+import gzip
+import io
+import json
+import os
+from typing import List, Optional
+
+EXTENSIONS = {None: ".jsonl", "gzip": ".jsonl.gz"}
+
+
+def open_shard_for_write(path: str, compression: Optional[str]) -> io.TextIOBase:
+    """Opens a shard file for writing text with the given compression.
+
+    Args:
+        path (str): File to create.
+        compression (Optional[str]): None or "gzip".
+
+    Returns:
+        io.TextIOBase: A text stream; closing it closes the file.
+    """
+    if compression is None:
+        return open(path, "w", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def remove_shards(directory: str, prefix: str = ""):
+    """Deletes the shards (and leftover .tmp files) of an earlier run.
+
+    Args:
+        directory (str): Directory holding the shards.
+        prefix (str): Only shards whose name starts with this prefix.
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and ".jsonl" in name:
+            os.remove(os.path.join(directory, name))
+
+
+class ShardedJsonlWriter:
+    """Writes one JSON line per page, rotating to a new shard every N records."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        prefix: str = "scraped",
+        records_per_shard: int = 5000,
+        compression: Optional[str] = "gzip",
+    ):
+        """Creates the writer; the first shard is opened on the first write.
+
+        Args:
+            output_dir (str): Directory for the shards (created if missing).
+            prefix (str): Shard file name prefix.
+            records_per_shard (int): Records per shard before rotating.
+            compression (Optional[str]): None or "gzip".
+        """
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.records_per_shard = records_per_shard
+        self.compression = compression
+        self.shard_index = 0
+        self.records_written = 0
+        self.shard_paths: List[str] = []
+        self._file = None
+        self._records_in_shard = 0
+        self._tmp_path = None
+
+    def _shard_path(self, index: int) -> str:
+        name = f"{self.prefix}-{index:05d}{EXTENSIONS[self.compression]}"
+        return os.path.join(self.output_dir, name)
+
+    def _open_shard(self):
+        self._tmp_path = self._shard_path(self.shard_index) + ".tmp"
+        self._file = open_shard_for_write(self._tmp_path, self.compression)
+        self._records_in_shard = 0
+
+    def _close_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        final_path = self._shard_path(self.shard_index)
+        os.replace(self._tmp_path, final_path)
+        self.shard_paths.append(final_path)
+        self._file = None
+        self.shard_index += 1
+
+    def write(self, url: str, text_content: str, metadata: dict):
+        """Appends one page record, rotating the shard when it is full.
+
+        Args:
+            url (str): Page URL.
+            text_content (str): Cleaned page text.
+            metadata (dict): Page metadata (last_modified, scraped_at, word_count, ...).
+        """
+        if self._file is None:
+            self._open_shard()
+        record = {"url": url, "text_content": text_content, "metadata": metadata}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._records_in_shard += 1
+        self.records_written += 1
+        if self._records_in_shard >= self.records_per_shard:
+            self._close_shard()
+
+    def close(self):
+        self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -5,9 +5,11 @@ import requests
 from bs4 import BeautifulSoup
 import json
 # import os
+from corpus_writer import ShardedJsonlWriter, remove_shards
 
 # URL to scrape
 URL = "https://events.seas.harvard.edu/calendar"
+SHARD_PREFIX = "processed_dynamic_events_1"
 
 
 def fetch_webpage(url):
@@ -101,6 +103,22 @@ def save_json_data(file_path, data):
     print(f"Processed content saved to {file_path}")
 
 
+def save_jsonl_shard(output_dir, url, text_content, metadata):
+    """
+    Saves one page record in the sharded JSON Lines format read by the vector database loader.
+
+    Args:
+        output_dir (str): Directory for the shard.
+        url (str): Page URL.
+        text_content (str): The formatted string for database ingestion.
+        metadata (dict): Metadata of the page.
+    """
+    remove_shards(output_dir, prefix=SHARD_PREFIX)
+    with ShardedJsonlWriter(output_dir, prefix=SHARD_PREFIX) as writer:
+        writer.write(url, text_content, metadata)
+    print(f"Processed content saved to {writer.shard_paths[0]}")
+
+
 def format_for_database(processed_data):
     """
     Formats processed data for database ingestion.
@@ -165,16 +183,10 @@ def main():
 
     # Create metadata
     metadata = create_metadata(last_modified_iso, big_string)
-    output_json = {
-        URL: {
-            "text_content": big_string,
-            "metadata": metadata,
-        }
-    }
 
-    # Save formatted data with metadata
-    save_json_data("/app/data/processed_dynamic_events_1.json", output_json)
-    save_json_data("/app/gcp_dynamic_data/processed_dynamic_events_1.json", output_json)
+    # Save formatted data with metadata as a JSON Lines shard (one record per URL)
+    save_jsonl_shard("/app/data/processed_shards", URL, big_string, metadata)
+    save_jsonl_shard("/app/gcp_dynamic_data/processed_shards", URL, big_string, metadata)
 
 
 if __name__ == "__main__":
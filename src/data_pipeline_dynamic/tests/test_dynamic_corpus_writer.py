@@ -0,0 +1,29 @@
+import gzip
+import json
+
+from data_pipeline_dynamic.corpus_writer import ShardedJsonlWriter, remove_shards
+
+METADATA = {
+    "last_modified": None,
+    "scraped_at": "2024-10-10T00:00:00Z",
+    "word_count": 2,
+    "url": "https://seas.harvard.edu/events",
+}
+
+
+def test_save_single_page_shard(tmp_path):
+    """Test the way dynamic_1.py writes its page: old shards removed, one gzip shard written."""
+    (tmp_path / "processed_dynamic_events_1-00000.jsonl.gz").write_bytes(b"stale")
+    (tmp_path / "processed_dynamic_events_1-00001.jsonl.gz.tmp").write_bytes(b"partial")
+    remove_shards(str(tmp_path), prefix="processed_dynamic_events_1")
+    with ShardedJsonlWriter(str(tmp_path), prefix="processed_dynamic_events_1") as writer:
+        writer.write(METADATA["url"], "Events this week", METADATA)
+
+    shard_name = "processed_dynamic_events_1-00000.jsonl.gz"
+    assert sorted(p.name for p in tmp_path.iterdir()) == [shard_name]
+    assert writer.shard_paths == [str(tmp_path / shard_name)]
+    with gzip.open(writer.shard_paths[0], "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [
+        {"url": METADATA["url"], "text_content": "Events this week", "metadata": METADATA}
+    ]
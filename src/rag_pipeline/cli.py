@@ -4,6 +4,7 @@ import os
 from utils.qdrant_utils import get_documents_from_qdrant, initialize_qdrant_client
 from utils.llm_utils import get_prompts, generate_llm_response, create_final_prompt
 from utils.config_utils import get_configuration
+from utils.rate_limiter import configure_shared_rate_limiter
 from utils.chat_utils import manage_chat_session, preprocess_user_query
 from dotenv import load_dotenv
 import sys
@@ -30,7 +31,9 @@ def get_rag_config():
         "max_output_tokens": 2000,  # vertexai
         "top_p": 0.95,  # vertexai
         "num_documents": 20,  # Number of documents to retrieve
-        "max_history_tokens": 8000  # Maximum number of tokens for chat history
+        "max_history_tokens": 8000,  # Maximum number of tokens for chat history
+        "requests_per_second": 5,  # Vertex AI request quota for the rate limiter
+        "tokens_per_minute": 1_000_000  # Vertex AI token quota for the rate limiter
     }
 
 
@@ -62,6 +65,7 @@ def main():
     # Get the configuration, combining defaults, config file (if specified), and command-line arguments
     config = get_configuration()
     rag_config = get_rag_config()
+    configure_shared_rate_limiter(rag_config["requests_per_second"], rag_config["tokens_per_minute"])
     # Initialize the Vertex AI model and Qdrant client once
     generative_model = initialize_llm()
     qdrant_client = initialize_qdrant()
@@ -1,8 +1,10 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 from rag_pipeline.utils.embedding_utils import (
     initialize_vertex_ai,
     get_dense_embedding,
+    get_embedding_model,
+    clear_embedding_models,
 )
 
 # Define base patch path for mocking
@@ -55,3 +57,48 @@ def test_get_dense_embedding_invalid_model(mock_from_pretrained):
 
     # Ensure the mock was called
     mock_from_pretrained.assert_called_once_with("invalid_model")
+
+
+# --- Tests for get_embedding_model ---
+
+
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel.from_pretrained")
+def test_get_embedding_model_cached(mock_from_pretrained):
+    """
+    Test case: The same model name and dimension are requested twice.
+    Expected Behavior: from_pretrained is called only once and the same handle is returned.
+    Why: Query embedding latency should not include model handle construction.
+    """
+    clear_embedding_models()
+    first = get_embedding_model("text-embedding-004", 256)
+    second = get_embedding_model("text-embedding-004", 256)
+    assert first is second
+    mock_from_pretrained.assert_called_once_with("text-embedding-004")
+    clear_embedding_models()
+
+
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel.from_pretrained")
+def test_get_embedding_model_keyed_by_dimension(mock_from_pretrained):
+    """
+    Test case: Same model name with different output dimensions.
+    Expected Behavior: Each (name, dimension) pair gets its own registry entry.
+    """
+    clear_embedding_models()
+    mock_from_pretrained.side_effect = lambda name: MagicMock()
+    assert get_embedding_model("text-embedding-004", 256) is not get_embedding_model("text-embedding-004", 768)
+    assert mock_from_pretrained.call_count == 2
+    clear_embedding_models()
+
+
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel.from_pretrained")
+def test_get_dense_embedding_reuses_registry(mock_from_pretrained):
+    """
+    Test case: get_dense_embedding is called repeatedly with a model name string.
+    Expected Behavior: The model handle is constructed once across calls.
+    """
+    clear_embedding_models()
+    mock_from_pretrained.return_value.get_embeddings.return_value = [MagicMock(values=[0.1, 0.2])]
+    for _ in range(3):
+        assert get_dense_embedding("sample text", "text-embedding-004", 2) == [0.1, 0.2]
+    mock_from_pretrained.assert_called_once_with("text-embedding-004")
+    clear_embedding_models()
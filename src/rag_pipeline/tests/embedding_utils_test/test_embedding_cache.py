@@ -0,0 +1,131 @@
+"""
+test_embedding_cache.py
+
+Unit tests for the LRU + TTL EmbeddingCache in embedding_cache.py and its use in get_dense_embedding.
+"""
+
+import pytest
+from unittest.mock import patch, MagicMock
+from rag_pipeline.utils.embedding_cache import EmbeddingCache, normalize_text, configure_shared_embedding_cache
+from rag_pipeline.utils.embedding_utils import get_dense_embedding
+
+BASE_PATCH_PATH = "rag_pipeline.utils.embedding_utils"
+MODEL = "text-embedding-004"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_text():
+    assert normalize_text("  CS  Degree\nRequirements ") == "cs degree requirements"
+
+
+def test_cache_hit_after_put():
+    """
+    Test case: An embedding is stored and looked up with differently formatted text.
+    Expected Output: The stored vector; hit and miss counters updated.
+    """
+    cache = EmbeddingCache()
+    assert cache.get("CS degree requirements", MODEL, 256) is None
+    cache.put("CS degree requirements", MODEL, 256, [0.5, 0.25])
+    assert cache.get("cs degree  requirements", MODEL, 256) == [0.5, 0.25]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_key_includes_model_and_dimension():
+    cache = EmbeddingCache()
+    cache.put("query", MODEL, 256, [1.0])
+    assert cache.get("query", MODEL, 768) is None
+    assert cache.get("query", "other-model", 256) is None
+
+
+def test_cache_lru_eviction():
+    """
+    Test case: More entries than max_entries.
+    Expected Output: The least recently used entry is evicted.
+    """
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", MODEL, None, [1.0])
+    cache.put("b", MODEL, None, [2.0])
+    cache.get("a", MODEL, None)  # "b" becomes least recently used
+    cache.put("c", MODEL, None, [3.0])
+    assert cache.get("b", MODEL, None) is None
+    assert cache.get("a", MODEL, None) == [1.0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_ttl_expiry():
+    clock = FakeClock()
+    cache = EmbeddingCache(ttl_seconds=60, clock=clock)
+    cache.put("query", MODEL, None, [1.0])
+    clock.now += 61
+    assert cache.get("query", MODEL, None) is None
+
+
+def test_cache_skips_empty_vectors():
+    cache = EmbeddingCache()
+    cache.put("query", MODEL, None, [])
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_persists_to_sqlite(tmp_path):
+    """
+    Test case: A new cache instance opens the same SQLite file.
+    Expected Output: Entries written by the first instance are served by the second.
+    """
+    path = str(tmp_path / "embeddings.db")
+    EmbeddingCache(persist_path=path).put("query", MODEL, 256, [0.5, 0.25])
+    assert EmbeddingCache(persist_path=path).get("query", MODEL, 256) == [0.5, 0.25]
+
+
+@pytest.fixture
+def fresh_shared_cache():
+    cache = configure_shared_embedding_cache()
+    yield cache
+    configure_shared_embedding_cache()
+
+
+@patch(f"{BASE_PATCH_PATH}.get_embedding_model")
+def test_get_dense_embedding_served_from_cache(mock_get_model, fresh_shared_cache):
+    """
+    Test case: The same query is embedded twice.
+    Expected Behavior: Vertex AI is called once; the second call is a cache hit.
+    """
+    model = MagicMock()
+    model.get_embeddings.return_value = [MagicMock(values=[0.5, 0.25])]
+    mock_get_model.return_value = model
+
+    assert get_dense_embedding("CS degree requirements", MODEL, 2) == [0.5, 0.25]
+    assert get_dense_embedding("cs degree requirements", MODEL, 2) == [0.5, 0.25]
+    model.get_embeddings.assert_called_once()
+    assert fresh_shared_cache.stats()["hits"] == 1
+
+
+@patch(f"{BASE_PATCH_PATH}.get_embedding_model")
+def test_get_dense_embedding_hit_equals_miss(mock_get_model, fresh_shared_cache, tmp_path):
+    """
+    Test case: A query whose vector is not exactly representable in float32 is embedded on a miss,
+    then served from memory and from the persisted cache.
+    Expected Behavior: All three calls return exactly the model's values.
+    Why: The same query must get the same vector whatever the cache state.
+    """
+    values = [0.1, 0.2, 1 / 3]
+    model = MagicMock()
+    model.get_embeddings.return_value = [MagicMock(values=values)]
+    mock_get_model.return_value = model
+
+    miss = get_dense_embedding("CS degree requirements", MODEL, 3)
+    hit = get_dense_embedding("CS degree requirements", MODEL, 3)
+    assert miss == hit == values
+
+    path = str(tmp_path / "embeddings.db")
+    EmbeddingCache(persist_path=path).put("query", MODEL, 3, values)
+    assert EmbeddingCache(persist_path=path).get("query", MODEL, 3) == values
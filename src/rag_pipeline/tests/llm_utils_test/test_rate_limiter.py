@@ -0,0 +1,101 @@
+"""
+test_rate_limiter.py
+
+Unit tests for the token-bucket RateLimiter in rate_limiter.py.
+
+A fake clock is injected so the tests check reservation delays without sleeping.
+"""
+
+import asyncio
+from unittest.mock import patch, MagicMock
+from rag_pipeline.utils.rate_limiter import RateLimiter, estimate_tokens, configure_shared_rate_limiter
+from rag_pipeline.utils.llm_utils import get_llm_response
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_no_delay_while_under_quota():
+    """
+    Test case: Requests within the burst capacity are not delayed.
+    """
+    limiter = RateLimiter(requests_per_second=5, tokens_per_minute=None, clock=FakeClock())
+    delays = [limiter.reserve() for _ in range(5)]
+    assert delays == [0.0] * 5
+    assert limiter.metrics()["delayed_requests"] == 0
+
+
+def test_delay_when_request_bucket_empty():
+    """
+    Test case: Requests beyond the burst queue behind each other at the configured rate.
+    """
+    limiter = RateLimiter(requests_per_second=2, tokens_per_minute=None, clock=FakeClock())
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.5
+    assert limiter.reserve() == 1.0
+
+
+def test_bucket_refills_over_time():
+    """
+    Test case: Capacity is restored as time passes.
+    """
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_second=1, tokens_per_minute=None, clock=clock)
+    assert limiter.reserve() == 0.0
+    clock.now = 1.0
+    assert limiter.reserve() == 0.0
+
+
+def test_delay_when_token_quota_exhausted():
+    """
+    Test case: A prompt larger than the remaining token budget waits for the refill.
+    """
+    limiter = RateLimiter(requests_per_second=None, tokens_per_minute=600, clock=FakeClock())
+    assert limiter.reserve(tokens=600) == 0.0
+    # 10 tokens per second refill
+    assert limiter.reserve(tokens=50) == 5.0
+
+
+def test_metrics_track_queueing_delay():
+    """
+    Test case: Metrics report delayed requests and total/max delay.
+    """
+    limiter = RateLimiter(requests_per_second=1, tokens_per_minute=None, clock=FakeClock())
+    for _ in range(3):
+        limiter.reserve()
+    metrics = limiter.metrics()
+    assert metrics["requests"] == 3
+    assert metrics["delayed_requests"] == 2
+    assert metrics["total_queue_delay_seconds"] == 3.0
+    assert metrics["max_queue_delay_seconds"] == 2.0
+
+
+def test_acquire_async_does_not_sleep_under_quota():
+    """
+    Test case: The async path returns immediately when the quota has headroom.
+    """
+    limiter = RateLimiter(requests_per_second=10, tokens_per_minute=None)
+    assert asyncio.run(limiter.acquire_async(tokens=10)) == 0.0
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("one two three four five six seven eight nine ten") == 13
+
+
+def test_get_llm_response_uses_shared_limiter():
+    """
+    Test case: get_llm_response reserves capacity instead of sleeping a fixed second.
+    """
+    limiter = configure_shared_rate_limiter(requests_per_second=100, tokens_per_minute=None)
+    model = MagicMock()
+    model.generate_content.return_value.text = "answer"
+    with patch("time.sleep") as mock_sleep:
+        assert get_llm_response("prompt", model, {}) == "answer"
+    mock_sleep.assert_not_called()
+    assert limiter.metrics()["requests"] == 1
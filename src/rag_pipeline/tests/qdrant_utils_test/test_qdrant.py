@@ -4,7 +4,7 @@ test_qdrant_utils.py
 Unit tests for Qdrant functionality using the `qdrant-client` library.
 """
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 import pytest
 
 # Patch paths
@@ -89,5 +89,25 @@ def test_qdrant_search(mocked_qdrant_client):
     mocked_qdrant_client.search.assert_called_once_with(
         collection_name=QDRANT_COLLECTION,
         query_vector=query_vector,
-        limit=limit
+        limit=limit,
+        query_filter=ANY
     )
+    # The reserved collection version point is never a search result
+    from rag_pipeline.utils.qdrant_utils import COLLECTION_VERSION_POINT_ID
+    query_filter = mocked_qdrant_client.search.call_args.kwargs["query_filter"]
+    assert query_filter.must_not[0].has_id == [COLLECTION_VERSION_POINT_ID]
+
+
+def test_database_client_query_skips_collection_version_point():
+    """
+    Test that the UI's database client never returns the reserved collection version point.
+    """
+    from rag_pipeline.utils.db_clients import QdrantDatabaseClient
+    from rag_pipeline.utils.qdrant_utils import COLLECTION_VERSION_POINT_ID
+
+    with patch("rag_pipeline.utils.db_clients.QdrantClient") as mock_client_class:
+        db_client = QdrantDatabaseClient(MOCK_QDRANT_URL, MOCK_QDRANT_API_KEY)
+        db_client.query({"collection_name": QDRANT_COLLECTION, "question_embedding": [0.1] * VECTOR_DIM, "limit": 2})
+
+    query_filter = mock_client_class.return_value.search.call_args.kwargs["query_filter"]
+    assert query_filter.must_not[0].has_id == [COLLECTION_VERSION_POINT_ID]
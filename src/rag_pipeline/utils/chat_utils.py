@@ -1,5 +1,6 @@
 import json
-from rag_pipeline.utils.llm_utils import get_llm_response
+from .llm_utils import get_llm_response
+from .rate_limiter import estimate_tokens
 
 
 def manage_chat_session(query, chat_history, rag_config):
@@ -30,8 +31,7 @@ def history_estimate_tokens_from_words(text):
     # Estimate the number of tokens in a string or list of strings
     if isinstance(text, list):  # Join list elements if input is a list of strings
         text = " ".join(text)
-    words = text.split()  # Split text into words to estimate token count
-    return int(len(words) * 1.3)  # Estimate: 1 word ~ 1.3 tokens
+    return estimate_tokens(text)
 
 
 def preprocess_user_query(query, generative_model, config, chat_history, last_instruction_dict, prompts):
@@ -1,6 +1,8 @@
 import abc
 from qdrant_client import QdrantClient
+from qdrant_client.models import Filter, HasIdCondition
 from datetime import datetime, timezone
+from .qdrant_utils import COLLECTION_VERSION_POINT_ID
 
 
 class DatabaseClient(abc.ABC):
@@ -27,6 +29,7 @@ class QdrantDatabaseClient(DatabaseClient):
         return self.client.search(
             collection_name=query["collection_name"],
             query_vector=query["question_embedding"],
+            query_filter=Filter(must_not=[HasIdCondition(has_id=[COLLECTION_VERSION_POINT_ID])]),
             with_payload=True,
             limit=query["limit"] * 3,
         )
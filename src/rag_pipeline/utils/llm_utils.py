@@ -1,5 +1,5 @@
 import os  # To check file existence and read files
-import time
+from .rate_limiter import get_shared_rate_limiter, estimate_tokens
 
 
 def get_prompts():
@@ -81,7 +81,8 @@ def get_llm_response(prompt, generative_model, rag_config):
         "max_output_tokens": rag_config.get("max_output_tokens", 2000),
         "top_p": rag_config.get("top_p", 0.95)
     }
-    time.sleep(1)
+    # Only waits when the shared Vertex AI quota is close to its limit
+    get_shared_rate_limiter().acquire(tokens=estimate_tokens(input_prompt))
     # Generate response
     try:
         response = generative_model.generate_content(
@@ -105,12 +106,8 @@ def generate_llm_response(final_prompt, generative_model, rag_config):
     Returns:
         str: Formatted LLM response
     """
-    # Get LLM response
-
-    response = get_llm_response(
+    return get_llm_response(
         prompt=final_prompt,
         generative_model=generative_model,
         rag_config=rag_config
     )
-    time.sleep(1)
-    return response
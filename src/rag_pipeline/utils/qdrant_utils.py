@@ -24,8 +24,11 @@ Date: 10/10/2024
 
 from typing import List, Optional, Dict, Any
 from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-from rag_pipeline.utils.embedding_utils import get_dense_embedding
+from qdrant_client.models import Filter, FieldCondition, HasIdCondition, MatchValue
+from .embedding_utils import get_dense_embedding
+
+# Reserved point holding the collection version (see vector_database's qdrant_upsert_utils); never a search result
+COLLECTION_VERSION_POINT_ID = "b2acfac5-15b3-509d-8364-b5113d6447aa"
 
 
 def initialize_qdrant_client(qdrant_url: str, qdrant_api_key: str) -> QdrantClient:
@@ -66,15 +69,18 @@ def qdrant_search(
         "limit": limit
     }
 
+    must = []
     if filter_field and filter_value is not None:
-        search_params["query_filter"] = Filter(
-            must=[
-                FieldCondition(
-                    key=filter_field,
-                    match=MatchValue(value=filter_value)
-                )
-            ]
+        must.append(
+            FieldCondition(
+                key=filter_field,
+                match=MatchValue(value=filter_value)
+            )
         )
+    search_params["query_filter"] = Filter(
+        must=must or None,
+        must_not=[HasIdCondition(has_id=[COLLECTION_VERSION_POINT_ID])],
+    )
 
     search_results = client.search(**search_params)
 
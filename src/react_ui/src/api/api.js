@@ -6,18 +6,16 @@ const API_BASE_URL = "/api";
 /**
  * Sends a user message and chat history to the AI backend for processing and retrieves a response.
  *
+ * The chat history is kept by the server under `chatId`, so only the new message is sent.
+ *
  * @param {string} userMessage - The message entered by the user.
- * @param {string[]} chatHistory - The current chat history to include in the request.
- * @returns {Promise<{response: string, updated_history: string[]}>} A promise that resolves to the AI response and updated chat history.
+ * @param {string} chatId - Identifier of the chat session.
+ * @returns {Promise<{response: string, chat_id: string}>} A promise that resolves to the AI response and the chat id.
  * @throws {Error} If the API request fails.
  */
-export const sendMessageToAI = async (userMessage, chatHistory) => {
+export const sendMessageToAI = async (userMessage, chatId) => {
   try {
-    console.log(
-      "Sending user message and chat history to AI:",
-      userMessage,
-      chatHistory
-    );
+    console.log("Sending user message to AI:", userMessage, chatId);
 
     const response = await fetch(`${API_BASE_URL}/llm/query`, {
       method: "POST",
@@ -27,7 +25,7 @@ export const sendMessageToAI = async (userMessage, chatHistory) => {
       },
       body: JSON.stringify({
         query: userMessage,
-        chat_history: chatHistory.map((message) => message.text),
+        chat_id: chatId,
       }),
     });
 
@@ -41,7 +39,7 @@ export const sendMessageToAI = async (userMessage, chatHistory) => {
     console.log("AI response received:", data);
     return {
       response: data.response,
-      updated_history: data.updated_history,
+      chat_id: data.chat_id,
     };
   } catch (error) {
     console.error("Error communicating with AI backend:", error);
@@ -140,31 +138,42 @@ export const validatePassword = async (password) => {
 };
 
 /**
- * Fetch all notes.
+ * Fetch all notes, one page at a time.
  *
  * @returns {Promise<Array>} A promise that resolves to an array of notes.
  */
 export const fetchCards = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/get-notes`, {
-      method: "GET",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${localStorage.getItem("authKey")}`,
-      },
-    });
-
-    if (!response.ok) {
-      const errorMessage = await response.text();
-      toast.error(`Failed to fetch notes: ${errorMessage}`);
-      return [];
-    }
+    const notes = [];
+    let cursor = null;
+    do {
+      const params = new URLSearchParams({ limit: "1000" });
+      if (cursor) params.set("cursor", cursor);
+      const response = await fetch(
+        `${API_BASE_URL}/get-notes?${params}`,
+        {
+          method: "GET",
+          headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("authKey")}`,
+          },
+        }
+      );
+
+      if (!response.ok) {
+        const errorMessage = await response.text();
+        toast.error(`Failed to fetch notes: ${errorMessage}`);
+        return [];
+      }
 
-    const data = await response.json();
-    console.log("Notes fetched successfully:", data.notes);
+      const data = await response.json();
+      notes.push(...data.notes);
+      cursor = data.next_cursor;
+    } while (cursor);
+    console.log("Notes fetched successfully:", notes);
 
     // Normalize notes to handle type 'link'
-    const normalizedNotes = data.notes.map((note) => {
+    const normalizedNotes = notes.map((note) => {
       if (note.type === "link") {
         return {
           type: note.type,
@@ -1,10 +1,23 @@
 // ChatInterface.js
 
-import React, { useEffect, useRef, useCallback } from "react";
+import React, { useEffect, useRef, useCallback, useState } from "react";
 import TypeBar from "./../TypeBar/TypeBar";
 import "./ChatModal.css";
 import useStore from "../../store";
 
+// crypto.randomUUID only exists in secure contexts (HTTPS or localhost); the app is also served
+// over plain HTTP, so fall back to a random v4 UUID built from crypto.getRandomValues
+const createChatId = () => {
+  if (typeof crypto.randomUUID === "function") {
+    return crypto.randomUUID();
+  }
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  bytes[6] = (bytes[6] & 0x0f) | 0x40;
+  bytes[8] = (bytes[8] & 0x3f) | 0x80;
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+};
+
 const ChatInterface = ({ sendMessageToAI, initialQuery }) => {
   // Select state and setters from the store
   const messages = useStore((state) => state.messages);
@@ -17,6 +30,9 @@ const ChatInterface = ({ sendMessageToAI, initialQuery }) => {
 
   const chatEndRef = useRef(null);
   const hasProcessedInitialQuery = useRef(false);
+  // The server keeps the chat history for this id, so only new messages are sent
+  // Created once, on the first render
+  const [chatId] = useState(createChatId);
 
   const urlRegex = /https?:\/\/[^\s/$.?#].[^\s]*/g;
 
@@ -73,7 +89,7 @@ const ChatInterface = ({ sendMessageToAI, initialQuery }) => {
         }, 500);
 
         try {
-            const { response, _ } = await sendMessageToAI(text, messages); // messages = history array
+            const { response } = await sendMessageToAI(text, chatId);
             clearInterval(loadingDotsInterval); // Stop the dots animation
             setDisplayedResponse("");
 
@@ -100,7 +116,7 @@ const ChatInterface = ({ sendMessageToAI, initialQuery }) => {
         setDisplayedResponse,
         updateDisplayedResponse,
         sendMessageToAI,
-        messages,
+        chatId,
     ]
 );
 
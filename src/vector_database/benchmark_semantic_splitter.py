@@ -0,0 +1,180 @@
+"""
+benchmark_semantic_splitter.py
+
+Benchmarks for the semantic splitter. Random embeddings are used, so no Vertex AI
+credentials are needed.
+
+distances: the distance step on its own. Compares the previous per-pair implementation
+(one langchain cosine_similarity call on 1xD lists for every pair of adjacent sentences)
+against the vectorized adjacent_cosine_distances (one stacked float32 matrix, normalized
+once, adjacent dot products in a single operation).
+
+split: SemanticChunker.split_text, the path the ingestion pipeline runs. Compares the
+previous implementation (one dict per sentence, combine_sentences building every window by
+string concatenation, per-pair cosine_similarity distances) against the SentenceArray
+implementation (one joined string with int64 offsets, windows and chunks as
+slices of it, float32 embeddings and distances). Both get the same embedding matrix from a
+random embedding function, and the benchmark checks that they return the same chunks
+(float32 vs float64 distances can move a breakpoint that sits exactly on the threshold).
+Reported are the best wall time and the peak memory traced by tracemalloc, next to the size
+of the N x D float32 embedding matrix.
+
+Usage (from src/vector_database):
+    python benchmark_semantic_splitter.py distances --sentences 1000 5000 20000 50000 --dim 256
+    python benchmark_semantic_splitter.py split --sentences 1000 5000 20000 --dim 768
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_community.utils.math import cosine_similarity
+
+from utils.semantic_splitter import SemanticChunker, adjacent_cosine_distances
+
+
+def pairwise_cosine_distances(embeddings):
+    """The previous implementation: one cosine_similarity call per adjacent pair."""
+    distances = []
+    for i in range(len(embeddings) - 1):
+        similarity = cosine_similarity([embeddings[i]], [embeddings[i + 1]])[0][0]
+        distances.append(1 - similarity)
+    return distances
+
+
+def combine_sentences(sentences, buffer_size=1):
+    """The previous combine_sentences: one dict per sentence, windows built by string concatenation."""
+    for i in range(len(sentences)):
+        combined_sentence = ""
+        for j in range(i - buffer_size, i):
+            if j >= 0:
+                combined_sentence += sentences[j]["sentence"] + " "
+        combined_sentence += sentences[i]["sentence"]
+        for j in range(i + 1, i + 1 + buffer_size):
+            if j < len(sentences):
+                combined_sentence += " " + sentences[j]["sentence"]
+        sentences[i]["combined_sentence"] = combined_sentence
+    return sentences
+
+
+def calculate_cosine_distances(sentences):
+    """The previous calculate_cosine_distances: per-pair distances stored back into the dicts."""
+    distances = pairwise_cosine_distances([x["combined_sentence_embedding"] for x in sentences])
+    for sentence, distance in zip(sentences, distances):
+        sentence["distance_to_next"] = distance
+    return distances, sentences
+
+
+class BaselineSemanticChunker(SemanticChunker):
+    """The previous implementation of split_text: list-of-dicts sentences and per-pair distances."""
+
+    def split_text(self, text):
+        single_sentences_list, needs_split = self._split_sentences(text)
+        if not needs_split:
+            return single_sentences_list
+        sentences = combine_sentences(
+            [{"sentence": x, "index": i} for i, x in enumerate(single_sentences_list)], self.buffer_size
+        )
+        embeddings = self.embedding_function([x["combined_sentence"] for x in sentences], batch_size=self.embedding_batch_size)
+        for i, sentence in enumerate(sentences):
+            sentence["combined_sentence_embedding"] = embeddings[i]
+        distances, sentences = calculate_cosine_distances(sentences)
+        threshold, breakpoint_array = self._calculate_breakpoint_threshold(distances)
+        indices_above_thresh = [i for i, x in enumerate(breakpoint_array) if x > threshold]
+
+        chunks = []
+        start_index = 0
+        for index in indices_above_thresh:
+            chunks.append(" ".join([d["sentence"] for d in sentences[start_index:index + 1]]))
+            start_index = index + 1
+        if start_index < len(sentences):
+            chunks.append(" ".join([d["sentence"] for d in sentences[start_index:]]))
+        return chunks
+
+
+def make_embedding_function(num_sentences, dim, rng):
+    # Both implementations embed the same windows in one call, so they get the same rows;
+    # a fresh copy is returned, as make_batch_embedding_function allocates its result
+    matrix = rng.standard_normal((num_sentences, dim), dtype=np.float32)
+
+    def embed(texts, batch_size=250):
+        return matrix[:len(texts)].copy()
+
+    return embed
+
+
+def make_text(num_sentences):
+    return " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(num_sentences))
+
+
+def time_call(fn, arg, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure(chunker, text, repeats):
+    best, chunks = time_call(chunker.split_text, text, repeats)
+    tracemalloc.start()
+    chunker.split_text(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, chunks
+
+
+def run_distances(args, rng):
+    print(f"{'sentences':>10}{'per-pair s':>14}{'vectorized s':>14}{'speedup':>10}{'max abs diff':>14}")
+    for num_sentences in args.sentences:
+        # Vertex AI returns embeddings as Python lists of floats
+        embeddings = rng.standard_normal((num_sentences, args.dim)).tolist()
+        old_time, old = time_call(pairwise_cosine_distances, embeddings, args.repeats)
+        new_time, new = time_call(adjacent_cosine_distances, embeddings, args.repeats)
+        max_diff = float(np.max(np.abs(np.asarray(old) - new)))
+        print(f"{num_sentences:>10}{old_time:>14.4f}{new_time:>14.4f}{old_time / new_time:>9.1f}x{max_diff:>14.2e}")
+
+
+def run_split(args, rng):
+    print(f"{'sentences':>10}{'dicts s':>10}{'array s':>10}{'speedup':>10}{'dicts MB':>10}{'array MB':>10}{'N x D MB':>10}{'same chunks':>13}")
+    for num_sentences in args.sentences:
+        text = make_text(num_sentences)
+        embed = make_embedding_function(num_sentences, args.dim, rng)
+        old_time, old_peak, old = measure(BaselineSemanticChunker(embedding_function=embed, buffer_size=args.buffer_size), text, args.repeats)
+        new_time, new_peak, new = measure(SemanticChunker(embedding_function=embed, buffer_size=args.buffer_size), text, args.repeats)
+        matrix_mb = num_sentences * args.dim * 4 / 1e6
+        print(
+            f"{num_sentences:>10}{old_time:>10.4f}{new_time:>10.4f}{old_time / new_time:>9.1f}x"
+            f"{old_peak / 1e6:>10.1f}{new_peak / 1e6:>10.1f}{matrix_mb:>10.1f}{str(old == new):>13}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the semantic splitter")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    distances = subparsers.add_parser("distances", help="Per-pair vs vectorized cosine distances")
+    distances.add_argument("--sentences", type=int, nargs="+", default=[1000, 5000, 20000, 50000], help="Document sizes in sentences")
+    distances.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+    distances.set_defaults(run=run_distances)
+
+    split = subparsers.add_parser("split", help="List-of-dicts vs SentenceArray split_text")
+    split.add_argument("--sentences", type=int, nargs="+", default=[1000, 5000, 20000], help="Document sizes in sentences")
+    split.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    split.add_argument("--buffer_size", type=int, default=1, help="Neighbouring sentences in each combined window")
+    split.set_defaults(run=run_split)
+
+    for subparser in (distances, split):
+        subparser.add_argument("--repeats", type=int, default=3, help="Runs per measurement (best is reported)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.run(args, np.random.default_rng(0))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,22 @@
 """ TODO
 - Implement RAG experiment and logging
-- VerttexAi implement batch embedding
 """
 
 import os
-from utils.qdrant_upsert_utils import qdrant_transform_and_upsert
-from utils.embedding_utils import process_and_embed_documents, get_dense_embedding
+from utils.qdrant_upsert_utils import qdrant_transform_and_upsert, initialize_qdrant_client, select_chunks_to_index, prune_stale_points, write_collection_version
+from utils.embedding_utils import process_and_embed_documents, make_batch_embedding_function, initialize_vertex_ai
 from utils.chunker_utils import run_chunking
-from utils.json_utils import load_all_documents_in_json
+from utils.json_utils import stream_all_documents_in_json
 from utils.config_utils import get_configuration, print_config
+from utils.pipeline_utils import run_pipeline, format_stage_stats
 from dotenv import load_dotenv
 import sys
 import math
-from typing import List, Dict, Any
+import threading
+from dataclasses import replace
+from itertools import islice
+from typing import Iterable, List, Dict, Any
+from vertexai.language_models import TextEmbeddingModel
 
 # Arguments explanation (see config.txt or config_utils.py for more details):
 # --query: Query string to search for (default: None)
@@ -21,7 +25,13 @@ from typing import List, Dict, Any
 # --chunking_method: Chunking method, either "simple" or "semantic" (default: none)
 # --qdrant_collection: Name of the Qdrant collection (default: default_collection)
 # --vector_dim: size of vector embedding (dimenstions) (default: 768)
-# --bucket_file_path: Path for json file in bucket (default: None)
+# --bucket_file_path: Path for json file in bucket, or prefix of JSONL shards (default: None)
+# --workers: Number of concurrent embedding requests (default: 1)
+# --max_in_flight: Maximum number of unfinished embedding requests, shared by the chunk and embed stages (default: workers)
+# --incremental: Skip chunks already in the collection; after the upsert, delete stale chunks of changed pages (default: off)
+# --upsert_batch_size: Number of points per Qdrant write request (default: 256)
+# --bulk_upload: Write points with upload_points and --upsert_parallel workers (default: off)
+# --no_wait: Do not wait for Qdrant to apply writes, for large backfills (default: wait)
 # For semantic chunking:
 # --breakpoint_threshold_type: Type of threshold for semantic chunking
 # --buffer_size: Buffer size for semantic chunking
@@ -42,29 +52,98 @@ QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
 GOOGLE_APPLICATION_CREDENTIALS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")  # not really used, Vertex AI library looks for global env automatically
 
 
-def process_batch(batch: List[Dict[str, Any]], config: Dict[str, Any], gcp_project: str, location: str, qdrant_url: str, qdrant_api_key: str):
-    # Chunk the documents
-    chunked_batch = run_chunking(batch, config, get_dense_embedding)
+def chunk_stage(batch: List[Dict[str, Any]], config: Dict[str, Any], embedding_function=None):
+    # Semantic chunking embeds sentences through the batched embedding function
+    if embedding_function is None:
+        embedding_function = make_batch_embedding_function(config['embedding_model'], config['vector_dim'], workers=config.get('workers', 1), max_in_flight=config.get('max_in_flight'))
+    chunked_batch = run_chunking(batch, config, embedding_function)
     print(f"Batch chunked: {len(chunked_batch)} chunks")
-    # Embed chunks
-    embedded_batch = process_and_embed_documents(gcp_project, location, chunked_batch, config['embedding_model'], config['vector_dim'])
+    return chunked_batch
+
+
+def select_stage(chunked_batch, config: Dict[str, Any], qdrant_client):
+    # Incremental mode: only chunks that are new or changed are embedded
+    selection = select_chunks_to_index(qdrant_client, chunked_batch, config['qdrant_collection'])
+    print(f"Batch selected: {len(selection)}/{len(chunked_batch)} chunks new or changed")
+    return selection
+
+
+def embed_stage(chunked_batch, config: Dict[str, Any], gcp_project: str, location: str, model=None, in_flight=None):
+    # Pass one model handle so that it is not reloaded for every batch
+    embedded_batch = process_and_embed_documents(gcp_project, location, chunked_batch, config['embedding_model'], config['vector_dim'],
+                                                 workers=config.get('workers', 1), max_in_flight=config.get('max_in_flight'), model=model,
+                                                 in_flight=in_flight)
     print(f"Batch embedded: {len(embedded_batch)} embeddings")
-    # Upsert the data to Qdrant Cloud
-    qdrant_transform_and_upsert(qdrant_url, qdrant_api_key, embedded_batch, config['qdrant_collection'])
+    return embedded_batch
+
+
+def upsert_stage(embedded_batch, config: Dict[str, Any], qdrant_client, selection=None):
+    # Upsert the data to Qdrant Cloud, reusing the client (and its connection pool) across batches
+    written_ids = qdrant_transform_and_upsert(
+        None, None, embedded_batch, config['qdrant_collection'],
+        qdrant_client=qdrant_client,
+        batch_size=config.get('upsert_batch_size', 256),
+        parallel=config.get('upsert_parallel', 1),
+        wait=config.get('upsert_wait', True),
+        bulk=config.get('bulk_upload', False),
+    )
     print("Batch upserted to Qdrant")
+    if selection is not None:
+        # Incremental mode: old points of changed pages go only once their new chunks are written
+        prune_stale_points(qdrant_client, config['qdrant_collection'], selection, written_ids)
+    if written_ids:
+        # Tell readers (the API's answer cache) that the collection changed
+        write_collection_version(qdrant_client, config['qdrant_collection'], config['vector_dim'])
+    return embedded_batch
+
 
+def batch_process_documents(documents: Iterable[Dict[str, Any]], config: Dict[str, Any], gcp_project: str, location: str, qdrant_url: str, qdrant_api_key: str,
+                            batch_size: int = 10, queue_size: int = 2):
+    # process documents in batches through pipelined stages: chunk -> embed -> upsert
+    # Bounded queues between the stages let the upsert of batch N overlap the embedding of batch N+1
+    # and the chunking of batch N+2
+    # documents may be a lazy iterator (streamed from the bucket), so batches are taken as they arrive
+    if hasattr(documents, '__len__'):
+        num_batches = math.ceil(len(documents) / batch_size)
+        print(f"===Total documents: {len(documents)}===")
+        print(f"Processing in {num_batches} batches of {batch_size} documents each")
+    else:
+        num_batches = "?"
+        print(f"===Streaming documents in batches of {batch_size}===")
 
-def batch_process_documents(documents: List[Dict[str, Any]], config: Dict[str, Any], gcp_project: str, location: str, qdrant_url: str, qdrant_api_key: str, batch_size: int = 10):
-    # process documents in batches: chunk, embed, upsert
-    total_documents = len(documents)
-    num_batches = math.ceil(total_documents / batch_size)
-    print(f"===Total documents: {total_documents}===")
-    print(f"Processing in {num_batches} batches of {batch_size} documents each")
+    def batches():
+        document_iter = iter(documents)
+        batch_number = 0
+        while True:
+            batch = list(islice(document_iter, batch_size))
+            if not batch:
+                return
+            batch_number += 1
+            print(f"\nQueueing batch {batch_number}/{num_batches}")
+            yield batch
 
-    for i in range(0, total_documents, batch_size):
-        batch = documents[i:i + batch_size]
-        print(f"\nProcessing batch {i//batch_size + 1}/{num_batches}")
-        process_batch(batch, config, gcp_project, location, qdrant_url, qdrant_api_key)
+    qdrant_client = initialize_qdrant_client(qdrant_url, qdrant_api_key)
+    # Vertex AI is initialized in main(), before any model is loaded
+    embedding_model = TextEmbeddingModel.from_pretrained(config['embedding_model'])
+    # The chunk and embed stages run concurrently and share one limit on in-flight embedding requests
+    in_flight = threading.BoundedSemaphore(config.get('max_in_flight') or config.get('workers', 1))
+    embedding_function = make_batch_embedding_function(config['embedding_model'], config['vector_dim'], workers=config.get('workers', 1), in_flight=in_flight)
+    stages = [
+        ("chunk", lambda batch: chunk_stage(batch, config, embedding_function)),
+        ("embed", lambda chunked: embed_stage(chunked, config, gcp_project, location, embedding_model, in_flight)),
+        ("upsert", lambda embedded: upsert_stage(embedded, config, qdrant_client)),
+    ]
+    if config.get('incremental'):
+        # The selection travels with the batch so that the upsert stage can prune the stale points
+        stages = [
+            stages[0],
+            ("select", lambda chunked: select_stage(chunked, config, qdrant_client)),
+            ("embed", lambda selection: replace(selection, documents=embed_stage(selection.documents, config, gcp_project, location, embedding_model, in_flight))),
+            ("upsert", lambda selection: upsert_stage(selection.documents, config, qdrant_client, selection)),
+        ]
+    stats = run_pipeline(batches(), stages, queue_size=queue_size)
+    print("\nPipeline stage statistics (units: chunks for chunk, embedded chunks for embed/upsert):")
+    print(format_stage_stats(stats))
     print("RAG TESTING COMPLETED, V2, 10/16/2024")
 
 
@@ -74,9 +153,10 @@ def main():
     print_config(config)
     # add bucket info to config
     config['bucket_name'] = BUCKET_NAME
-    # Load the documents from the GCP Bucket
-    documents = load_all_documents_in_json(config)
-    print(f"Documents loaded: {len(documents)}")
+    # Initialize Vertex AI once, before the chunk stage loads the embedding model for semantic chunking
+    initialize_vertex_ai(GCP_PROJECT, LOCATION)
+    # Stream the documents from the GCP Bucket; they are chunked and embedded while the file is still being read
+    documents = stream_all_documents_in_json(config)
 
     batch_process_documents(documents, config, GCP_PROJECT, LOCATION, QDRANT_URL, QDRANT_API_KEY)
 
@@ -113,6 +113,13 @@ def test_get_configuration_with_file_and_args(mock_load_config, mock_parse_argum
         'chunk_overlap': 200,
         'vector_dim': 768,
         'bucket_file_path': None,
+        'workers': 1,
+        'max_in_flight': None,
+        'incremental': False,
+        'upsert_batch_size': 256,
+        'upsert_parallel': 1,
+        'bulk_upload': False,
+        'upsert_wait': True,
         'config': 'dummy_config',
     }
     assert result == expected
@@ -151,5 +158,12 @@ def test_get_configuration_defaults_only(mock_parse_arguments):
         'chunk_overlap': None,
         'vector_dim': 768,
         'bucket_file_path': None,
+        'workers': 1,
+        'max_in_flight': None,
+        'incremental': False,
+        'upsert_batch_size': 256,
+        'upsert_parallel': 1,
+        'bulk_upload': False,
+        'upsert_wait': True,
     }
     assert result == expected
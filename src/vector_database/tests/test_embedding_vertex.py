@@ -1,9 +1,15 @@
+import threading
+import time
+import numpy as np
 import pytest
 from unittest.mock import patch, MagicMock
 from vector_database.utils.embedding_utils import (
     initialize_vertex_ai,
     get_dense_embedding,
     process_and_embed_documents,
+    pack_batches,
+    get_batch_embeddings,
+    make_batch_embedding_function,
 )
 from langchain.docstore.document import Document
 
@@ -61,7 +67,7 @@ def test_get_dense_embedding_invalid_model(mock_from_pretrained):
 # --- Tests for process_and_embed_documents ---
 
 
-@patch(f"{BASE_PATCH_PATH}.get_dense_embedding", return_value=[0.1, 0.2, 0.3])
+@patch(f"{BASE_PATCH_PATH}.get_dense_embedding")
 @patch(f"{BASE_PATCH_PATH}.initialize_vertex_ai")
 @patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel")
 def test_process_and_embed_documents_valid(mock_model, mock_init, mock_embed):
@@ -71,9 +77,10 @@ def test_process_and_embed_documents_valid(mock_model, mock_init, mock_embed):
         project_id="my-project", location="us-central1",
         documents=[Document(page_content="sample", metadata={"id": "1"})]
     Expected Output: List of documents with embeddings added to metadata.
-    Why: Ensures documents are processed and embeddings are correctly added.
+    Why: Ensures documents are embedded through one batched get_embeddings call.
     """
     mock_instance = MagicMock()
+    mock_instance.get_embeddings.return_value = [MagicMock(values=[0.1, 0.2, 0.3])]
     mock_model.from_pretrained.return_value = mock_instance
     documents = [Document(page_content="sample", metadata={"id": "1"})]
 
@@ -81,7 +88,8 @@ def test_process_and_embed_documents_valid(mock_model, mock_init, mock_embed):
     assert len(result) == 1
     assert result[0].metadata["embedding"] == [0.1, 0.2, 0.3]
     mock_init.assert_called_once_with("my-project", "us-central1")
-    mock_embed.assert_called_once_with("sample", mock_instance, None)
+    mock_instance.get_embeddings.assert_called_once_with(["sample"])
+    mock_embed.assert_not_called()
 
 
 @patch(f"{BASE_PATCH_PATH}.get_dense_embedding", return_value=[])
@@ -94,12 +102,203 @@ def test_process_and_embed_documents_empty_embedding(mock_model, mock_init, mock
         project_id="my-project", location="us-central1",
         documents=[Document(page_content="sample", metadata={"id": "1"})]
     Expected Output: Empty list (embedding failure logged).
-    Why: Verifies behavior when embedding generation fails.
+    Why: Verifies behavior when embedding generation fails, after the per-item retry.
     """
     mock_instance = MagicMock()
+    mock_instance.get_embeddings.side_effect = Exception("Quota exceeded")
     mock_model.from_pretrained.return_value = mock_instance
     documents = [Document(page_content="sample", metadata={"id": "1"})]
 
     result = process_and_embed_documents("my-project", "us-central1", documents, "model-001")
     assert len(result) == 0
     mock_embed.assert_called_once_with("sample", mock_instance, None)
+
+
+@patch(f"{BASE_PATCH_PATH}.initialize_vertex_ai")
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel")
+def test_process_and_embed_documents_reuses_model(mock_model, mock_init):
+    """
+    Test case: Two batches embedded with a model handle loaded once by the caller.
+    Expected Output: Both batches use that handle; Vertex AI is not re-initialized and no model is loaded.
+    Why: The ingestion pipeline calls this once per batch.
+    """
+    model = MagicMock()
+    model.get_embeddings.side_effect = lambda texts, **kwargs: [MagicMock(values=[0.1, 0.2]) for _ in texts]
+    for i in range(2):
+        documents = [Document(page_content=f"sample {i}", metadata={"id": str(i)})]
+        result = process_and_embed_documents("my-project", "us-central1", documents, "model-001", model=model)
+        assert result[0].metadata["embedding"] == [0.1, 0.2]
+    assert model.get_embeddings.call_count == 2
+    mock_model.from_pretrained.assert_not_called()
+    mock_init.assert_not_called()
+
+
+# --- Tests for batched embedding ---
+
+
+def test_pack_batches_respects_instance_limit():
+    """
+    Test case: More texts than the per-request instance limit.
+    Expected Output: Consecutive index batches of at most max_instances.
+    """
+    assert pack_batches(["a"] * 5, max_instances=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_pack_batches_respects_token_limit():
+    """
+    Test case: Texts whose combined token estimate exceeds max_tokens.
+    Expected Output: A new batch is started before the limit is crossed; an oversized text gets its own batch.
+    """
+    texts = ["word " * 10, "word " * 10, "word " * 100, "word"]
+    assert pack_batches(texts, max_tokens=30) == [[0, 1], [2], [3]]
+
+
+def test_get_batch_embeddings_preserves_order_and_retries_failed_batch():
+    """
+    Test case: The second batch fails as a whole; one of its items also fails on its own.
+    Expected Output: Embeddings in input order, an empty list only for the failing item.
+    """
+    model = MagicMock()
+    model.get_embeddings.side_effect = [
+        [MagicMock(values=[1.0]), MagicMock(values=[2.0])],
+        Exception("Batch rejected"),
+    ]
+    with patch(f"{BASE_PATCH_PATH}.get_dense_embedding", side_effect=[[3.0], []]) as mock_embed:
+        result = get_batch_embeddings(["a", "b", "c", "d"], model, max_instances=2)
+    assert result == [[1.0], [2.0], [3.0], []]
+    assert mock_embed.call_count == 2
+
+
+def test_get_batch_embeddings_concurrent_keeps_order():
+    """
+    Test case: Batches are embedded by several workers and complete out of order.
+    Expected Output: Embeddings in input order, one request per batch, never more than max_in_flight at once.
+    """
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0}
+
+    def fake_get_embeddings(texts, **kwargs):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        # Later batches finish first
+        time.sleep(0.01 * (10 - int(texts[0])))
+        with lock:
+            state["in_flight"] -= 1
+        return [MagicMock(values=[float(t)]) for t in texts]
+
+    model = MagicMock()
+    model.get_embeddings.side_effect = fake_get_embeddings
+    texts = [str(i) for i in range(8)]
+    result = get_batch_embeddings(texts, model, workers=4, max_in_flight=2)
+    assert result == [[float(i)] for i in range(8)]
+    assert model.get_embeddings.call_count == 4
+    assert state["peak"] <= 2
+
+
+def test_get_batch_embeddings_shared_limiter_bounds_concurrent_callers():
+    """
+    Test case: Two callers (the chunk and embed stages) embed at the same time with one shared limiter of 2.
+    Expected Output: Never more than 2 requests in flight across both callers, sequential calls included.
+    """
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0}
+
+    def fake_get_embeddings(texts, **kwargs):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.005)
+        with lock:
+            state["in_flight"] -= 1
+        return [MagicMock(values=[1.0]) for _ in texts]
+
+    model = MagicMock()
+    model.get_embeddings.side_effect = fake_get_embeddings
+    in_flight = threading.BoundedSemaphore(2)
+    texts = [str(i) for i in range(8)]
+    callers = [
+        threading.Thread(target=get_batch_embeddings, args=(texts, model), kwargs={"workers": 4, "in_flight": in_flight}),
+        threading.Thread(target=get_batch_embeddings, args=(texts, model), kwargs={"workers": 4, "in_flight": in_flight}),
+        threading.Thread(target=get_batch_embeddings, args=(texts, model), kwargs={"max_instances": 1, "in_flight": in_flight}),
+    ]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert model.get_embeddings.call_count == 16
+    assert state["peak"] <= 2
+
+
+@patch(f"{BASE_PATCH_PATH}.get_batch_embeddings", return_value=[[0.1, 0.2]])
+@patch(f"{BASE_PATCH_PATH}.initialize_vertex_ai")
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel")
+def test_process_and_embed_documents_passes_max_in_flight(mock_model, mock_init, mock_batch):
+    """
+    Test case: process_and_embed_documents called with workers=4 and max_in_flight=2 (--workers / --max_in_flight).
+    Expected Output: Both limits reach get_batch_embeddings.
+    """
+    documents = [Document(page_content="sample", metadata={"id": "1"})]
+    process_and_embed_documents("my-project", "us-central1", documents, "model-001", workers=4, max_in_flight=2)
+    assert mock_batch.call_args.kwargs["workers"] == 4
+    assert mock_batch.call_args.kwargs["max_in_flight"] == 2
+
+
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel.from_pretrained")
+def test_make_batch_embedding_function_honors_batch_size(mock_from_pretrained):
+    """
+    Test case: Semantic chunking embeds 5 sentences with batch_size=2.
+    Expected Output: A (5, D) float32 matrix in input order from 3 requests; the model is loaded once.
+    Why: SemanticChunker calls embedding_function(texts, batch_size=...) and needs one row per text.
+    """
+    model = MagicMock()
+    model.get_embeddings.side_effect = lambda texts, **kwargs: [MagicMock(values=[float(t), 1.0]) for t in texts]
+    mock_from_pretrained.return_value = model
+    embed = make_batch_embedding_function("model-001", workers=2)
+
+    matrix = embed([str(i) for i in range(5)], batch_size=2)
+    embed(["5"], batch_size=2)
+
+    assert matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix[:, 0], [0, 1, 2, 3, 4])
+    assert model.get_embeddings.call_count == 4
+    mock_from_pretrained.assert_called_once_with("model-001")
+
+
+@patch(f"{BASE_PATCH_PATH}.get_dense_embedding", return_value=[])
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel.from_pretrained")
+def test_make_batch_embedding_function_zero_rows_for_failures(mock_from_pretrained, mock_embed):
+    """
+    Test case: One of two batches fails, including its per-item retry, with max_failed_fraction=0.5.
+    Expected Output: Zero rows for the failed texts; ValueError when nothing could be embedded.
+    """
+    model = MagicMock()
+    model.get_embeddings.side_effect = [[MagicMock(values=[0.5, 0.5])], Exception("Quota exceeded"), Exception("Quota exceeded")]
+    mock_from_pretrained.return_value = model
+    embed = make_batch_embedding_function("model-001", max_failed_fraction=0.5)
+
+    matrix = embed(["a", "b"], batch_size=1)
+    np.testing.assert_array_equal(matrix, [[0.5, 0.5], [0.0, 0.0]])
+    with pytest.raises(ValueError):
+        embed(["c"], batch_size=1)
+
+
+@patch(f"{BASE_PATCH_PATH}.get_dense_embedding", return_value=[])
+@patch(f"{BASE_PATCH_PATH}.TextEmbeddingModel.from_pretrained")
+def test_make_batch_embedding_function_raises_when_too_many_fail(mock_from_pretrained, mock_embed):
+    """
+    Test case: Every request fails (e.g. quota exhausted) although vector_dim is set,
+    and separately 1 of 4 texts fails with the default threshold.
+    Expected Output: ValueError instead of a zero-filled matrix in both cases.
+    Why: An all-zero matrix makes every sentence boundary a breakpoint and indexes one-sentence chunks.
+    """
+    model = MagicMock()
+    model.get_embeddings.side_effect = Exception("Quota exceeded")
+    mock_from_pretrained.return_value = model
+    embed = make_batch_embedding_function("model-001", vector_dim=2)
+    with pytest.raises(ValueError, match="3/3"):
+        embed(["a", "b", "c"], batch_size=3)
+
+    model.get_embeddings.side_effect = [[MagicMock(values=[0.5, 0.5])] * 3, Exception("Quota exceeded")]
+    with pytest.raises(ValueError, match="1/4"):
+        embed(["a", "b", "c", "d"], batch_size=3)
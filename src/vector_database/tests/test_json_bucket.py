@@ -3,10 +3,14 @@ from unittest.mock import patch, MagicMock
 # from datetime import datetime
 import json
 from langchain.schema import Document
+import io
 from vector_database.utils.json_utils import (
     load_and_validate_json_from_bucket,
-    load_all_documents_in_json
+    load_all_documents_in_json,
+    stream_documents_from_bucket,
+    stream_documents_from_shards,
 )
+import gzip
 
 BASE_PATCH_PATH = "google.cloud.storage.Client"
 
@@ -190,3 +194,137 @@ def test_load_all_documents_in_json_custom_path(mock_gcs_blob):
         documents = load_all_documents_in_json(config)
         assert len(documents) == 1
         assert documents[0].metadata['url'] == "test-url"
+
+
+# Tests for stream_documents_from_bucket
+def _streaming_bucket(payload: bytes):
+    blob = MagicMock()
+    blob.open.return_value = io.BytesIO(payload)
+    bucket_mock = MagicMock()
+    bucket_mock.get_blob.return_value = blob
+    return bucket_mock, blob
+
+
+def _entry(text, word_count=100, scraped_at="2023-01-02T00:00:00Z"):
+    return {
+        "text_content": text,
+        "metadata": {"last_modified": "2023-01-01T00:00:00Z", "scraped_at": scraped_at, "word_count": word_count},
+    }
+
+
+def test_stream_documents_from_bucket_yields_lazily():
+    """
+    Test case: Streaming a knowledge file with three URL entries.
+    Input: Mock GCS blob opened as a byte stream.
+    Expected Output: A lazy iterator of Documents in file order; the whole blob is never downloaded as text.
+    Why: Memory must stay flat as the scraped corpus grows.
+    """
+    payload = json.dumps({f"https://example.com/{i}": _entry(f"Page {i}") for i in range(3)}).encode()
+    bucket_mock, blob = _streaming_bucket(payload)
+
+    with patch(BASE_PATCH_PATH) as mock_client:
+        mock_client.return_value.bucket.return_value = bucket_mock
+        documents = stream_documents_from_bucket("test-bucket", "test-blob")
+        blob.open.assert_not_called()  # nothing is read until the first document is requested
+        first = next(documents)
+        rest = list(documents)
+
+    assert first.page_content == "Page 0"
+    assert [d.metadata["url"] for d in rest] == ["https://example.com/1", "https://example.com/2"]
+    assert rest[0].metadata["word_count"] == 100
+    blob.download_as_text.assert_not_called()
+
+
+def test_stream_documents_from_bucket_skips_invalid_entries():
+    """
+    Test case: One entry has an invalid date and one is missing its metadata.
+    Expected Output: The valid entries are still yielded; invalid ones are skipped.
+    """
+    payload = json.dumps({
+        "https://example.com/ok": _entry("Valid"),
+        "https://example.com/bad-date": _entry("Bad", scraped_at="not-a-date"),
+        "https://example.com/no-metadata": {"text_content": "Missing"},
+        "https://example.com/ok2": _entry(None, word_count=None),
+    }).encode()
+    bucket_mock, _ = _streaming_bucket(payload)
+
+    with patch(BASE_PATCH_PATH) as mock_client:
+        mock_client.return_value.bucket.return_value = bucket_mock
+        documents = list(stream_documents_from_bucket("test-bucket", "test-blob"))
+
+    assert [d.metadata["url"] for d in documents] == ["https://example.com/ok", "https://example.com/ok2"]
+    assert documents[1].page_content == ""
+
+
+def test_stream_documents_from_bucket_truncated_json():
+    """
+    Test case: The file is cut off in the middle of the second entry.
+    Expected Output: The complete first entry is yielded and the parse error does not propagate.
+    """
+    payload = json.dumps({"https://example.com/1": _entry("One"), "https://example.com/2": _entry("Two")}).encode()[:-40]
+    bucket_mock, _ = _streaming_bucket(payload)
+
+    with patch(BASE_PATCH_PATH) as mock_client:
+        mock_client.return_value.bucket.return_value = bucket_mock
+        documents = list(stream_documents_from_bucket("test-bucket", "test-blob"))
+
+    assert [d.page_content for d in documents] == ["One"]
+
+
+def test_stream_documents_from_bucket_blob_not_found():
+    bucket_mock = MagicMock()
+    bucket_mock.get_blob.return_value = None
+    with patch(BASE_PATCH_PATH) as mock_client:
+        mock_client.return_value.bucket.return_value = bucket_mock
+        assert list(stream_documents_from_bucket("test-bucket", "test-blob")) == []
+
+
+# Tests for stream_documents_from_shards
+def _shard_blob(name, records):
+    payload = "".join(json.dumps(r) + "\n" for r in records).encode()
+    if name.endswith(".gz"):
+        payload = gzip.compress(payload)
+    blob = MagicMock()
+    blob.name = name
+    blob.open.side_effect = lambda *args, **kwargs: io.BytesIO(payload)
+    return blob
+
+
+def test_stream_documents_from_shards_reads_all_shards():
+    """
+    Test case: A corpus split into a plain and a gzip-compressed shard, plus an unrelated file.
+    Input: Mock GCS blobs listed under the shard prefix.
+    Expected Output: One Document per valid record of every shard; invalid records and non-shard files are skipped.
+    Why: Large crawls are read shard by shard in parallel instead of as one JSON file.
+    """
+    shard_a = _shard_blob("shards/pages-00000.jsonl", [
+        {"url": f"https://example.com/a{i}", **_entry(f"A{i}")} for i in range(3)
+    ] + [{"url": "https://example.com/bad", "text_content": "Missing metadata"}])
+    shard_b = _shard_blob("shards/pages-00001.jsonl.gz", [{"url": f"https://example.com/b{i}", **_entry(f"B{i}")} for i in range(2)])
+    other = _shard_blob("shards/README.txt", [])
+    bucket_mock = MagicMock()
+    bucket_mock.list_blobs.return_value = [shard_b, other, shard_a]
+
+    with patch(BASE_PATCH_PATH) as mock_client:
+        mock_client.return_value.bucket.return_value = bucket_mock
+        documents = list(stream_documents_from_shards("test-bucket", "shards/", workers=2, queue_size=2))
+
+    assert sorted(d.page_content for d in documents) == ["A0", "A1", "A2", "B0", "B1"]
+    assert {d.metadata["url"] for d in documents} >= {"https://example.com/a0", "https://example.com/b1"}
+    other.open.assert_not_called()
+
+
+def test_stream_documents_from_shards_consumer_stops_early():
+    """
+    Test case: The consumer only takes the first document of a large shard.
+    Expected Output: The generator closes without hanging on the bounded queue.
+    """
+    shard = _shard_blob("shards/pages-00000.jsonl", [{"url": f"https://example.com/{i}", **_entry(str(i))} for i in range(100)])
+    bucket_mock = MagicMock()
+    bucket_mock.list_blobs.return_value = [shard]
+
+    with patch(BASE_PATCH_PATH) as mock_client:
+        mock_client.return_value.bucket.return_value = bucket_mock
+        documents = stream_documents_from_shards("test-bucket", "shards/", queue_size=1)
+        assert next(documents).page_content == "0"
+        documents.close()
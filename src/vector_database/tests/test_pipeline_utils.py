@@ -0,0 +1,109 @@
+import threading
+import time
+import pytest
+from vector_database.utils.pipeline_utils import run_pipeline, format_stage_stats
+
+# Master docstring
+"""
+Unit tests for pipeline_utils.py.
+
+Function Overview:
+- Purpose: Runs items through threaded stages connected by bounded queues.
+- Input: An iterable of items and a list of (name, function) stages.
+- Output: Per-stage statistics (items, units, busy time, queue depth).
+- Errors: The first exception raised by a stage is re-raised after the pipeline stops.
+"""
+
+
+def test_run_pipeline_applies_stages_in_order():
+    """
+    Test case: Three stages transform every item.
+    Expected Output: Each item passes through all stages in input order; stats count items and units.
+    """
+    out = []
+    stages = [
+        ("chunk", lambda x: [x] * 2),
+        ("embed", lambda chunks: [c * 10 for c in chunks]),
+        ("upsert", lambda vectors: out.append(vectors) or vectors),
+    ]
+    stats = run_pipeline(range(5), stages)
+    assert out == [[0, 0], [10, 10], [20, 20], [30, 30], [40, 40]]
+    assert [s.name for s in stats] == ["chunk", "embed", "upsert"]
+    assert all(s.items == 5 for s in stats)
+    assert stats[0].units == 10
+    assert "items/s" in format_stage_stats(stats)
+
+
+def test_run_pipeline_overlaps_stages():
+    """
+    Test case: Two stages that each take 50ms per item.
+    Expected Output: Both stages are busy at the same time, so the run takes well under the serial time.
+    """
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def slow(x):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        return [x]
+
+    started = time.perf_counter()
+    run_pipeline(range(6), [("a", slow), ("b", slow)])
+    elapsed = time.perf_counter() - started
+    assert active["peak"] == 2
+    assert elapsed < 0.6  # serial execution would take 12 * 50ms
+
+
+def test_run_pipeline_bounded_queue_applies_backpressure():
+    """
+    Test case: A fast producer feeds a slow stage through a queue of size 1.
+    Expected Output: The producer never runs more than a few items ahead of the consumer.
+    """
+    produced = []
+    consumed = []
+
+    def items():
+        for i in range(10):
+            produced.append(i)
+            assert len(produced) - len(consumed) <= 4
+            yield i
+
+    def slow(x):
+        time.sleep(0.01)
+        consumed.append(x)
+        return [x]
+
+    stats = run_pipeline(items(), [("slow", slow)], queue_size=1)
+    assert consumed == list(range(10))
+    assert stats[0].max_queue_depth <= 1
+
+
+def test_run_pipeline_reraises_stage_error():
+    """
+    Test case: The middle stage fails on the third item.
+    Expected Output: The error is re-raised; exactly items 0 and 1 are upserted, later items are not processed.
+    The failing call first waits until item 1 has been upserted, so the prefix does not depend on thread timing.
+    """
+    seen = []
+    upserted_one = threading.Event()
+
+    def fail_on_two(x):
+        if x == 2:
+            assert upserted_one.wait(timeout=5)
+            raise ValueError("embedding failed")
+        return [x]
+
+    def upsert(v):
+        seen.append(v[0])
+        if v[0] == 1:
+            upserted_one.set()
+        return v
+
+    stages = [("chunk", lambda x: [x]), ("embed", lambda c: fail_on_two(c[0])), ("upsert", upsert)]
+    with pytest.raises(ValueError, match="embedding failed"):
+        run_pipeline(range(100), stages, queue_size=1)
+    assert seen == [0, 1]
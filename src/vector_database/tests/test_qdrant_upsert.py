@@ -1,8 +1,18 @@
-# import pytest
+import pytest
 from unittest.mock import MagicMock, patch
 from qdrant_client import models
 from langchain.schema import Document
-from vector_database.utils.qdrant_upsert_utils import ensure_collection_exists, qdrant_transform_and_upsert
+from vector_database.utils.qdrant_upsert_utils import (
+    ensure_collection_exists,
+    qdrant_transform_and_upsert,
+    make_point_id,
+    content_hash,
+    select_chunks_to_index,
+    prune_stale_points,
+    backoff_delay,
+    write_collection_version,
+    COLLECTION_VERSION_POINT_ID,
+)
 
 # Define base path for patching
 BASE_PATCH_PATH = 'vector_database.utils.qdrant_upsert_utils'
@@ -135,3 +145,219 @@ def test_qdrant_transform_and_upsert_no_embeddings(mock_ensure, mock_initialize)
     mock_initialize.assert_called_once_with("http://test-url", "test-key")
     mock_ensure.assert_not_called()
     mock_client.upsert.assert_not_called()
+
+
+def test_make_point_id_is_deterministic():
+    """
+    Test case: Point IDs for the same and for modified chunks.
+    Expected Output: Same url, chunk_id and text give the same ID; any change gives a new one.
+    Why: Re-running ingestion must overwrite points instead of duplicating them.
+    """
+    doc = Document(page_content="Test content", metadata={"url": "https://a.edu", "chunk_id": 0})
+    same = Document(page_content="Test content", metadata={"url": "https://a.edu", "chunk_id": 0, "timestamp": "later"})
+    edited = Document(page_content="Edited content", metadata={"url": "https://a.edu", "chunk_id": 0})
+    other_chunk = Document(page_content="Test content", metadata={"url": "https://a.edu", "chunk_id": 1})
+    assert make_point_id(doc) == make_point_id(same)
+    assert make_point_id(doc) != make_point_id(edited)
+    assert make_point_id(doc) != make_point_id(other_chunk)
+
+
+@patch(f'{BASE_PATCH_PATH}.initialize_qdrant_client')
+@patch(f'{BASE_PATCH_PATH}.ensure_collection_exists')
+def test_qdrant_transform_and_upsert_uses_deterministic_ids(mock_ensure, mock_initialize):
+    """
+    Test case: The same document is upserted twice.
+    Expected Output: Identical point IDs, and the content hash is stored in the payload.
+    """
+    mock_client = MagicMock()
+    mock_initialize.return_value = mock_client
+    documents = [Document(page_content="Test content", metadata={"url": "https://a.edu", "chunk_id": 0, "embedding": [0.1, 0.2]})]
+
+    qdrant_transform_and_upsert("http://test-url", "test-key", documents, "test_collection")
+    qdrant_transform_and_upsert("http://test-url", "test-key", documents, "test_collection")
+
+    first, second = [c.kwargs["points"][0] for c in mock_client.upsert.call_args_list]
+    assert first.id == second.id == make_point_id(documents[0])
+    assert first.payload["content_hash"] == content_hash("Test content")
+
+
+def _changed_page_selection():
+    unchanged = Document(page_content="Same", metadata={"url": "https://a.edu", "chunk_id": 0})
+    kept = Document(page_content="Kept", metadata={"url": "https://b.edu", "chunk_id": 0})
+    edited = Document(page_content="Edited", metadata={"url": "https://b.edu", "chunk_id": 1})
+    mock_client = MagicMock()
+    mock_client.collection_exists.return_value = True
+    mock_client.retrieve.return_value = [MagicMock(id=make_point_id(unchanged)), MagicMock(id=make_point_id(kept))]
+    selection = select_chunks_to_index(mock_client, [unchanged, kept, edited], "test_collection")
+    return mock_client, selection, kept, edited
+
+
+def test_select_chunks_to_index_skips_existing_without_deleting():
+    """
+    Test case: One page is unchanged, another has an edited chunk.
+    Expected Output: Only the edited chunk is selected, the changed page's current point IDs are recorded,
+    and nothing is deleted yet.
+    Why: Deleting before the new chunks are written would leave the page without points if embedding or upsert fails.
+    """
+    mock_client, selection, kept, edited = _changed_page_selection()
+
+    assert selection.documents == [edited]
+    assert len(selection) == 1
+    assert set(selection.keep_ids_by_url) == {"https://b.edu"}
+    assert set(selection.keep_ids_by_url["https://b.edu"]) == {make_point_id(kept), make_point_id(edited)}
+    assert selection.new_ids_by_url["https://b.edu"] == [make_point_id(edited)]
+    mock_client.delete.assert_not_called()
+
+
+def test_prune_stale_points_after_upsert():
+    """
+    Test case: The edited chunk of the changed page was written.
+    Expected Output: Points of the page outside its current version are deleted.
+    """
+    mock_client, selection, kept, edited = _changed_page_selection()
+
+    prune_stale_points(mock_client, "test_collection", selection, [make_point_id(edited)])
+
+    mock_client.delete.assert_called_once()
+    selector = mock_client.delete.call_args.kwargs["points_selector"]
+    assert selector.filter.must[0].match.value == "https://b.edu"
+    assert set(selector.filter.must_not[0].has_id) == {make_point_id(kept), make_point_id(edited)}
+
+
+def test_prune_stale_points_keeps_pages_with_unwritten_chunks():
+    """
+    Test case: The edited chunk could not be embedded, so it was not written.
+    Expected Output: The page keeps its previous points.
+    """
+    mock_client, selection, _, _ = _changed_page_selection()
+
+    prune_stale_points(mock_client, "test_collection", selection, [])
+
+    mock_client.delete.assert_not_called()
+
+
+def test_prune_stale_points_raises_on_delete_error():
+    """
+    Test case: Qdrant fails to delete the stale points.
+    Expected Output: The error is raised so the ingestion run stops and reports it.
+    """
+    mock_client, selection, _, edited = _changed_page_selection()
+    mock_client.delete.side_effect = Exception("503")
+
+    with pytest.raises(Exception, match="503"):
+        prune_stale_points(mock_client, "test_collection", selection, [make_point_id(edited)])
+
+
+def test_select_chunks_to_index_new_collection():
+    """
+    Test case: The collection does not exist yet.
+    Expected Output: Every chunk is selected and nothing is deleted.
+    """
+    mock_client = MagicMock()
+    mock_client.collection_exists.return_value = False
+    documents = [Document(page_content="Test content", metadata={"url": "https://a.edu"})]
+    selection = select_chunks_to_index(mock_client, documents, "test_collection")
+    assert selection.documents == documents
+    assert selection.keep_ids_by_url == {}
+    mock_client.delete.assert_not_called()
+
+
+def _embedded_documents(n):
+    return [Document(page_content=f"Chunk {i}", metadata={"url": "https://a.edu", "chunk_id": i, "embedding": [0.1, 0.2]}) for i in range(n)]
+
+
+@patch(f'{BASE_PATCH_PATH}.initialize_qdrant_client')
+@patch(f'{BASE_PATCH_PATH}.ensure_collection_exists')
+def test_qdrant_transform_and_upsert_reuses_client_and_slices_points(mock_ensure, mock_initialize):
+    """
+    Test case: A client is passed in and there are more points than batch_size.
+    Expected Output: No new client is created; one upsert per slice, with the requested wait mode;
+    the IDs of all written points are returned.
+    """
+    mock_client = MagicMock()
+    documents = _embedded_documents(5)
+    written_ids = qdrant_transform_and_upsert(None, None, documents, "test_collection", qdrant_client=mock_client, batch_size=2, wait=False)
+
+    mock_initialize.assert_not_called()
+    assert [len(c.kwargs["points"]) for c in mock_client.upsert.call_args_list] == [2, 2, 1]
+    assert written_ids == [make_point_id(doc) for doc in documents]
+    assert all(c.kwargs["wait"] is False for c in mock_client.upsert.call_args_list)
+
+
+@patch(f'{BASE_PATCH_PATH}.time.sleep')
+@patch(f'{BASE_PATCH_PATH}.ensure_collection_exists')
+def test_qdrant_transform_and_upsert_retries_with_backoff(mock_ensure, mock_sleep):
+    """
+    Test case: The first two upsert attempts fail.
+    Expected Output: The upsert is retried after backoff sleeps and succeeds on the third attempt.
+    """
+    mock_client = MagicMock()
+    mock_client.upsert.side_effect = [Exception("503"), Exception("503"), "ok"]
+    qdrant_transform_and_upsert(None, None, _embedded_documents(1), "test_collection", qdrant_client=mock_client)
+
+    assert mock_client.upsert.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+@patch(f'{BASE_PATCH_PATH}.time.sleep')
+@patch(f'{BASE_PATCH_PATH}.ensure_collection_exists')
+def test_qdrant_transform_and_upsert_raises_after_max_retries(mock_ensure, mock_sleep):
+    """
+    Test case: Every upsert attempt of a slice fails.
+    Expected Output: The last error is raised after max_retries attempts and later slices are not written.
+    Why: A batch that could not be written must stop the ingestion run instead of only being logged.
+    """
+    mock_client = MagicMock()
+    mock_client.upsert.side_effect = Exception("503")
+    with pytest.raises(Exception, match="503"):
+        qdrant_transform_and_upsert(None, None, _embedded_documents(4), "test_collection", qdrant_client=mock_client, batch_size=2, max_retries=3)
+
+    assert mock_client.upsert.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+@patch(f'{BASE_PATCH_PATH}.ensure_collection_exists')
+def test_qdrant_transform_and_upsert_bulk_path(mock_ensure):
+    """
+    Test case: bulk=True with parallel workers.
+    Expected Output: upload_points is called once with batch_size, parallel and wait; upsert is not used.
+    """
+    mock_client = MagicMock()
+    qdrant_transform_and_upsert(None, None, _embedded_documents(3), "test_collection", qdrant_client=mock_client, batch_size=64, parallel=4, wait=False, bulk=True)
+
+    mock_client.upsert.assert_not_called()
+    kwargs = mock_client.upload_points.call_args.kwargs
+    assert len(kwargs["points"]) == 3
+    assert (kwargs["batch_size"], kwargs["parallel"], kwargs["wait"]) == (64, 4, False)
+
+
+def test_write_collection_version_upserts_reserved_point():
+    """
+    Test case: A version is written after an ingestion write.
+    Expected Output: One point with the reserved ID, the version in its payload and a vector of the collection's size.
+    """
+    mock_client = MagicMock()
+    assert write_collection_version(mock_client, "test_collection", 4, version=7) == 7
+
+    point = mock_client.upsert.call_args.kwargs["points"][0]
+    assert point.id == COLLECTION_VERSION_POINT_ID
+    assert point.payload == {"collection_version": 7}
+    assert point.vector == [1.0, 0.0, 0.0, 0.0]
+
+
+def test_collection_version_point_id_is_stable():
+    """
+    Test case: The reserved ID, which api_service and rag_pipeline keep a copy of.
+    Expected Output: The same UUID those services exclude from search.
+    """
+    assert COLLECTION_VERSION_POINT_ID == "b2acfac5-15b3-509d-8364-b5113d6447aa"
+
+
+def test_backoff_delay_is_bounded_and_jittered():
+    """
+    Test case: Backoff delays for increasing attempts.
+    Expected Output: Delays never exceed the exponential cap or the maximum delay.
+    """
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base_delay=1.0, max_delay=30.0)
+        assert 0 <= delay <= min(30.0, 2 ** attempt)
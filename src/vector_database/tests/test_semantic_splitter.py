@@ -0,0 +1,185 @@
+import tracemalloc
+import numpy as np
+import pytest
+from langchain_community.utils.math import cosine_similarity
+from vector_database.utils.semantic_splitter import (
+    adjacent_cosine_distances,
+    SemanticChunker,
+    sentence_offsets,
+    SentenceArray,
+)
+
+# Master docstring
+"""
+Unit tests for the distance calculation in semantic_splitter.py.
+
+Function Overview:
+- Purpose: Computes the cosine distance between the embeddings of adjacent combined sentences.
+- Input: An (N, D) embedding matrix, or a sequence of N embeddings.
+- Output: A float32 array of the N - 1 distances.
+"""
+
+
+def test_adjacent_cosine_distances_matches_pairwise_reference():
+    """
+    Test case: Random embeddings.
+    Input: 50 sentences with 64-dimensional embeddings.
+    Expected Output: Same distances as computing cosine_similarity pair by pair (within float32 precision).
+    Why: The vectorized implementation must not change where documents are split.
+    """
+    embeddings = np.random.default_rng(0).standard_normal((50, 64))
+    expected = [1 - cosine_similarity([embeddings[i]], [embeddings[i + 1]])[0][0] for i in range(49)]
+
+    distances = adjacent_cosine_distances([list(e) for e in embeddings])
+
+    assert len(distances) == 49
+    np.testing.assert_allclose(distances, expected, atol=1e-5)
+
+
+def test_adjacent_cosine_distances_known_values():
+    """
+    Test case: Identical, orthogonal and opposite neighbours.
+    Expected Output: Distances 0, 1 and 2.
+    """
+    distances = adjacent_cosine_distances([[1, 0], [2, 0], [0, 3], [0, -1]])
+    np.testing.assert_allclose(distances, [0.0, 1.0, 2.0], atol=1e-6)
+
+
+def test_adjacent_cosine_distances_zero_vector():
+    """
+    Test case: A zero embedding (e.g. a failed embedding).
+    Expected Output: Distance 1 to its neighbours instead of NaN.
+    """
+    distances = adjacent_cosine_distances([[1, 0], [0, 0], [1, 0]])
+    assert distances.tolist() == [1.0, 1.0]
+
+
+def test_adjacent_cosine_distances_single_sentence():
+    """
+    Test case: Fewer than two sentences.
+    Expected Output: No distances.
+    """
+    assert len(adjacent_cosine_distances([[1, 0]])) == 0
+    assert len(adjacent_cosine_distances([])) == 0
+
+
+def test_adjacent_cosine_distances_returns_float32():
+    distances = adjacent_cosine_distances(np.ones((3, 4)))
+    assert distances.dtype == np.float32
+    assert distances.shape == (2,)
+
+
+def test_semantic_chunker_uses_batched_embedding_function():
+    """
+    Test case: A batched embedding function returning a float32 matrix.
+    Input: Four sentences on two topics.
+    Expected Output: One embedding call for all sentences, and a split between the two topics.
+    """
+    calls = []
+
+    def embed(texts, batch_size=250):
+        calls.append((len(texts), batch_size))
+        return np.array([[1.0, 0.0] if "cat" in t else [0.0, 1.0] for t in texts], dtype=np.float32)
+
+    chunker = SemanticChunker(embedding_function=embed, buffer_size=0, breakpoint_threshold_amount=50)
+    chunks = chunker.split_text("The cat sat. The cat ate. Stocks fell. Stocks rose.")
+
+    assert calls == [(4, 50)]
+    assert chunks == ["The cat sat. The cat ate.", "Stocks fell. Stocks rose."]
+
+
+def test_cross_document_batching_matches_per_document_split():
+    """
+    Test case: Several short documents split with and without cross-document batching.
+    Input: Three two-topic pages and one single-sentence page.
+    Expected Output: Identical chunks and metadata, with one embedding call instead of one per page.
+    Why: Thousands of short pages should share embedding requests without changing where they split.
+    """
+    calls = []
+
+    def embed(texts, batch_size=250):
+        calls.append(len(texts))
+        return np.array([[1.0, 0.0] if "cat" in t else [0.0, 1.0] for t in texts], dtype=np.float32)
+
+    texts = [
+        "The cat sat. The cat ate. Stocks fell. Stocks rose.",
+        "Stocks fell. The cat slept.",
+        "One sentence only",
+        "The cat ran. Stocks rose. Stocks fell. The cat hid.",
+    ]
+    metadatas = [{"url": f"https://seas.harvard.edu/{i}"} for i in range(len(texts))]
+
+    per_document = SemanticChunker(embedding_function=embed, buffer_size=0, breakpoint_threshold_amount=50).create_documents(texts, metadatas)
+    per_document_calls = len(calls)
+    calls.clear()
+    batched = SemanticChunker(embedding_function=embed, buffer_size=0, breakpoint_threshold_amount=50, cross_document_batching=True).create_documents(texts, metadatas)
+
+    assert [(d.page_content, d.metadata) for d in batched] == [(d.page_content, d.metadata) for d in per_document]
+    assert per_document_calls == 3
+    assert calls == [10]
+
+
+def _legacy_combine(sentences, buffer_size):
+    """Reference implementation: previous/next sentences concatenated around each sentence."""
+    combined = []
+    for i in range(len(sentences)):
+        window = [sentences[j] for j in range(i - buffer_size, i) if j >= 0]
+        window.append(sentences[i])
+        window += [sentences[j] for j in range(i + 1, i + 1 + buffer_size) if j < len(sentences)]
+        combined.append(" ".join(window))
+    return combined
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 2, 5, 20])
+def test_sentence_array_windows_match_reference(buffer_size):
+    """
+    Test case: Sliding windows over sentences of different lengths, including an empty one.
+    Expected Output: The same combined sentences as concatenating each window sentence by sentence.
+    """
+    sentences = ["First one.", "Second?", "", "A much longer fourth sentence!", "Fifth.", "Last"]
+    assert list(SentenceArray(sentences).windows(buffer_size)) == _legacy_combine(sentences, buffer_size)
+
+
+def test_sentence_offsets_slice_back_to_sentences():
+    text, starts, ends = sentence_offsets(["ab", "c", "def"])
+    assert text == "ab c def"
+    assert [text[s:e] for s, e in zip(starts, ends)] == ["ab", "c", "def"]
+
+
+def test_sentence_array_slices_sentences_windows_and_spans():
+    """
+    Test case: A compact SentenceArray over four sentences.
+    Expected Output: Sentences, windows and spans are the same strings the dict-based code produced.
+    """
+    sentences = SentenceArray(["A.", "Bb?", "Ccc!", "D"])
+    assert len(sentences) == 4
+    assert sentences.sentence(2) == "Ccc!"
+    assert list(sentences.windows(1)) == ["A. Bb?", "A. Bb? Ccc!", "Bb? Ccc! D", "Ccc! D"]
+    assert sentences.span(1, 3) == "Bb? Ccc! D"
+
+    sentences.set_embeddings([[1, 0], [1, 0], [0, 1], [0, 1]])
+    assert sentences.embeddings.dtype == np.float32
+    np.testing.assert_allclose(sentences.distances, [0.0, 1.0, 0.0], atol=1e-6)
+
+
+def test_semantic_chunker_peak_memory_is_proportional_to_embeddings():
+    """
+    Test case: Splitting a 4,000-sentence document with 768-d embeddings.
+    Expected Output: Peak traced memory stays within a small multiple of the N x D float32 matrix.
+    Why: Per-sentence dicts and per-pair copies used to multiply memory for long pages.
+    """
+    n, dim = 4000, 768
+    rng = np.random.default_rng(0)
+
+    def embed(texts, batch_size=250):
+        return rng.standard_normal((len(texts), dim), dtype=np.float32)
+
+    text = " ".join(f"Sentence number {i} is here." for i in range(n))
+    chunker = SemanticChunker(embedding_function=embed)
+    tracemalloc.start()
+    chunks = chunker.split_text(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert " ".join(chunks) == text
+    assert peak < 1.5 * n * dim * 4
@@ -15,7 +15,9 @@ def run_chunking(
     Args:
         documents (Iterable[Document]): An iterable of LangChain Document objects to be split.
         config (Dict): A dictionary containing configuration parameters.
-        embedding_function (Optional[Callable]): A function to generate embeddings for semantic chunking.
+        embedding_function (Optional[Callable]): Batched embedding function for semantic chunking,
+            called as embedding_function(texts, batch_size=...) and returning one embedding row per text
+            (see embedding_utils.make_batch_embedding_function).
 
     Returns:
         List[Document]: A list of LangChain Document objects representing the chunks.
@@ -37,7 +39,10 @@ def run_chunking(
             embedding_function=embedding_function,
             breakpoint_threshold_type=config.get("breakpoint_threshold_type", "percentile"),
             breakpoint_threshold_amount=config.get("breakpoint_threshold_amount", 95),
-            buffer_size=config.get("buffer_size", 1)
+            buffer_size=config.get("buffer_size", 1),
+            # Short pages share embedding requests instead of one round-trip per page
+            cross_document_batching=True,
+            embedding_batch_size=250
         )
     else:
         raise ValueError(f"Invalid chunking method: {chunking_method}")
@@ -36,7 +36,15 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("--chunking_method", type=str, choices=["simple", "semantic"], help="Chunking method")
     parser.add_argument("--qdrant_collection", type=str, help="Name of the Qdrant collection")
     parser.add_argument("--vector_dim", type=int, help="Vector dimension")
-    parser.add_argument("--bucket_file_path", type=str, help="Path for json file in bucket")
+    parser.add_argument("--bucket_file_path", type=str, help="Path for json file in bucket, or prefix of JSONL shards")
+    parser.add_argument("--workers", type=int, help="Number of concurrent embedding requests")
+    parser.add_argument("--max_in_flight", type=int, help="Maximum number of submitted but unfinished embedding requests (default: workers)")
+    parser.add_argument("--incremental", action="store_true", default=None, help="Only embed chunks that are not in the collection yet")
+    # Qdrant write arguments
+    parser.add_argument("--upsert_batch_size", type=int, help="Number of points per Qdrant write request")
+    parser.add_argument("--upsert_parallel", type=int, help="Number of parallel Qdrant upload workers (bulk upload only)")
+    parser.add_argument("--bulk_upload", action="store_true", default=None, help="Write points with upload_points instead of upsert")
+    parser.add_argument("--no_wait", action="store_false", dest="upsert_wait", default=None, help="Do not wait for Qdrant to apply writes (large backfills)")
     # Semantic chunking arguments
     parser.add_argument("--breakpoint_threshold_type", type=str, help="Breakpoint threshold type for semantic chunking")
     parser.add_argument("--buffer_size", type=int, help="Buffer size for semantic chunking")
@@ -65,14 +73,23 @@ def get_configuration() -> Dict[str, Any]:
         'chunk_overlap': None,
         'vector_dim': 768,
         'bucket_file_path': None,
+        'workers': 1,
+        'max_in_flight': None,
+        'incremental': False,
+        'upsert_batch_size': 256,
+        'upsert_parallel': 1,
+        'bulk_upload': False,
+        'upsert_wait': True,
     }
 
     # Helper function to enforce correct data types
     def convert_type(key: str, value: str) -> Any:
-        if key in ["vector_dim", "chunk_size", "chunk_overlap", "buffer_size"]:
+        if key in ["vector_dim", "chunk_size", "chunk_overlap", "buffer_size", "workers", "max_in_flight", "upsert_batch_size", "upsert_parallel"]:
             return int(value)
         elif key in ["breakpoint_threshold_amount"]:
             return float(value)
+        elif key in ["incremental", "bulk_upload", "upsert_wait"]:
+            return str(value).lower() in ["true", "1", "yes"]
         else:
             return value
 
@@ -94,6 +111,9 @@ def print_config(config):
     print(f"Embedding model: {config['embedding_model']}")
     print(f"Chunking method: {config['chunking_method']}")
     print(f"Qdrant collection: {config['qdrant_collection']}")
+    print(f"Embedding workers: {config.get('workers', 1)}")
+    print(f"Max in-flight embedding requests: {config.get('max_in_flight') or config.get('workers', 1)}")
+    print(f"Incremental: {config.get('incremental', False)}")
 
     if config['chunking_method'] == "semantic":
         for key in ['breakpoint_threshold_type', 'buffer_size', 'breakpoint_threshold_amount']:
@@ -43,7 +43,11 @@ Author: Artem Dinh
 Date: 10/10/2024
 """
 
-from typing import List
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+import numpy as np
 from google.cloud import aiplatform
 from langchain.docstore.document import Document
 # from langchain.embeddings import VertexAIEmbeddings
@@ -74,32 +78,222 @@ def get_dense_embedding(text: str, model: TextEmbeddingModel, vector_dim: int =
         return []
 
 
+# Per-request limits of the Vertex AI text embedding models (text-embedding-004 / gecko)
+MAX_BATCH_INSTANCES = 250
+MAX_BATCH_TOKENS = 20000
+# Largest fraction of texts in one SemanticChunker embedding call that may fail and be zero-filled
+MAX_FAILED_FRACTION = 0.1
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate: the larger of ~1.3 tokens per word and ~1 token per 4 characters."""
+    return max(int(len(text.split()) * 1.3), len(text) // 4) + 1
+
+
+def pack_batches(texts: List[str], max_instances: int = MAX_BATCH_INSTANCES, max_tokens: int = MAX_BATCH_TOKENS) -> List[List[int]]:
+    """
+    Group text indices into consecutive batches that respect the per-request instance and token limits.
+    A single text above the token limit gets a batch of its own (Vertex AI truncates it).
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_instances or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_batch(
+    texts: List[str],
+    model: TextEmbeddingModel,
+    vector_dim: Optional[int] = None
+) -> List[List[float]]:
+    """
+    Embed one packed batch with a single get_embeddings call.
+    If the call fails, every item is retried individually so one bad chunk does not fail the batch.
+    Failed items come back as empty lists; the output order matches the input order.
+    """
+    kwargs = {"output_dimensionality": vector_dim} if vector_dim else {}
+    try:
+        embeddings = model.get_embeddings(texts, **kwargs)
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return [embedding.values for embedding in embeddings]
+    except Exception as e:
+        logging.warning(f"Batch embedding of {len(texts)} texts failed ({e}), retrying per item")
+        return [get_dense_embedding(text, model, vector_dim) for text in texts]
+
+
+def get_batch_embeddings(
+    texts: List[str],
+    model: TextEmbeddingModel,
+    vector_dim: Optional[int] = None,
+    max_instances: int = MAX_BATCH_INSTANCES,
+    max_tokens: int = MAX_BATCH_TOKENS,
+    workers: int = 1,
+    max_in_flight: Optional[int] = None,
+    in_flight: Optional[threading.Semaphore] = None
+) -> List[List[float]]:
+    """
+    Embed many texts with as few get_embeddings calls as the model limits allow.
+
+    With workers > 1 the batches are sent concurrently from a thread pool. At most `max_in_flight`
+    batches (default: workers) are submitted at a time; the producer blocks until one completes,
+    so batches are not built faster than Vertex AI can take them. The texts are split into at least
+    `workers` batches so that a single large batch does not leave the other workers idle.
+
+    Callers that embed from several threads at once pass one shared `in_flight` semaphore, which
+    then bounds their requests together; every request, sequential ones included, holds it.
+
+    Args:
+        texts (List[str]): Texts to embed
+        model (TextEmbeddingModel): Embedding model
+        vector_dim (int): Desired dimensionality of the output embeddings (optional)
+        max_instances (int): Maximum number of texts per request
+        max_tokens (int): Maximum estimated tokens per request
+        workers (int): Number of concurrent embedding requests
+        max_in_flight (int): Maximum number of submitted but unfinished requests (optional)
+        in_flight (threading.Semaphore): Limiter shared with other callers, replaces max_in_flight (optional)
+
+    Returns:
+        List[List[float]]: One embedding per input text, in input order; empty list where embedding failed.
+    """
+    results: List[List[float]] = [[] for _ in texts]
+    if workers > 1 and texts:
+        max_instances = max(1, min(max_instances, math.ceil(len(texts) / workers)))
+    batches = pack_batches(texts, max_instances, max_tokens)
+
+    def run(batch: List[int]):
+        # Each batch writes to its own slots, so the results are reassembled in input order
+        for i, embedding in zip(batch, embed_batch([texts[i] for i in batch], model, vector_dim)):
+            results[i] = embedding
+
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            if in_flight is None:
+                run(batch)
+            else:
+                with in_flight:
+                    run(batch)
+        return results
+
+    if in_flight is None:
+        in_flight = threading.BoundedSemaphore(max_in_flight or workers)
+
+    def run_and_release(batch: List[int]):
+        try:
+            run(batch)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for batch in batches:
+            in_flight.acquire()
+            futures.append(executor.submit(run_and_release, batch))
+        for future in futures:
+            future.result()
+    return results
+
+
+def make_batch_embedding_function(
+    model_name: str,
+    vector_dim: Optional[int] = None,
+    workers: int = 1,
+    max_failed_fraction: float = MAX_FAILED_FRACTION,
+    max_in_flight: Optional[int] = None,
+    in_flight: Optional[threading.Semaphore] = None
+) -> Callable[..., np.ndarray]:
+    """
+    Build the batched embedding function used by SemanticChunker.
+
+    The returned function has the signature `embed(texts, batch_size=250) -> np.ndarray`. It sends
+    `batch_size` texts per get_embeddings request (fewer if the token limit requires it), runs up to
+    `workers` requests concurrently and returns a float32 matrix with one row per text, in input order.
+    Rows of texts that could not be embedded are zero, so they count as a maximal distance for the
+    splitter; their number is logged. If more than `max_failed_fraction` of the texts of a call fail
+    (e.g. quota, auth or outage errors), the call raises instead, since the chunk boundaries of a
+    mostly-zero matrix are meaningless. The model is loaded on the first call.
+
+    Args:
+        model_name (str): Name of the embedding model to use
+        vector_dim (int): Desired dimensionality of the output embeddings (optional)
+        workers (int): Number of concurrent embedding requests
+        max_failed_fraction (float): Largest fraction of failed texts per call that is zero-filled
+        max_in_flight (int): Maximum number of submitted but unfinished requests (optional, default: workers)
+        in_flight (threading.Semaphore): Limiter shared with other embedding callers (optional)
+
+    Returns:
+        Callable[..., np.ndarray]: The batched embedding function
+    """
+    model_holder = []
+    lock = threading.Lock()
+
+    def embed(texts: List[str], batch_size: int = MAX_BATCH_INSTANCES) -> np.ndarray:
+        with lock:
+            if not model_holder:
+                model_holder.append(TextEmbeddingModel.from_pretrained(model_name))
+        embeddings = get_batch_embeddings(list(texts), model_holder[0], vector_dim, max_instances=batch_size, workers=workers,
+                                          max_in_flight=max_in_flight, in_flight=in_flight)
+        failed = sum(1 for e in embeddings if not e)
+        if embeddings and failed > max_failed_fraction * len(embeddings):
+            raise ValueError(f"Failed to embed {failed}/{len(embeddings)} texts (more than {max_failed_fraction:.0%})")
+        if failed:
+            logging.warning(f"Failed to embed {failed}/{len(embeddings)} texts; their rows are zero-filled")
+        dim = next((len(e) for e in embeddings if e), vector_dim)
+        matrix = np.zeros((len(embeddings), dim or 0), dtype=np.float32)
+        for i, embedding in enumerate(embeddings):
+            if embedding:
+                matrix[i] = embedding
+        return matrix
+
+    return embed
+
+
 def process_and_embed_documents(
     project_id: str,
     location: str,
     documents: List[Document],
     model_name: str = "text-embedding-004",
-    vector_dim: int = None
+    vector_dim: int = None,
+    workers: int = 1,
+    max_in_flight: Optional[int] = None,
+    model: Optional[TextEmbeddingModel] = None,
+    in_flight: Optional[threading.Semaphore] = None
 ) -> List[Document]:
     """
     Process and embed documents from the input list of LangChain Documents.
+    Chunks are packed into batched get_embeddings calls up to the model's instance and token limits.
 
     Args:
-        project_id (str): Google Cloud Project ID
-        location (str): Google Cloud Location
+        project_id (str): Google Cloud Project ID, used when no model is passed
+        location (str): Google Cloud Location, used when no model is passed
         documents (List[Document]): List of LangChain Document objects
         model_name (str): Name of the embedding model to use
         vector_dim (int): Desired dimensionality of the output embeddings (optional)
+        workers (int): Number of concurrent embedding requests
+        max_in_flight (int): Maximum number of submitted but unfinished requests (optional, default: workers)
+        model (TextEmbeddingModel): Model handle reused across batches (optional, loaded otherwise)
+        in_flight (threading.Semaphore): Limiter shared with other embedding callers (optional)
 
     Returns:
         List[Document]: List of LangChain Document objects with embeddings added to their metadata
     """
-    initialize_vertex_ai(project_id, location)
-    model = TextEmbeddingModel.from_pretrained(model_name)
+    if model is None:
+        initialize_vertex_ai(project_id, location)
+        model = TextEmbeddingModel.from_pretrained(model_name)
+
+    embeddings = get_batch_embeddings([doc.page_content for doc in documents], model, vector_dim, workers=workers,
+                                      max_in_flight=max_in_flight, in_flight=in_flight)
 
     embedded_documents = []
-    for doc in documents:
-        dense_embedding = get_dense_embedding(doc.page_content, model, vector_dim)
+    for doc, dense_embedding in zip(documents, embeddings):
         if dense_embedding:
             embedded_doc = Document(
                 page_content=doc.page_content,
@@ -1,9 +1,67 @@
+import gzip
+import io
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 # from typing import List
+import ijson
 from langchain.schema import Document
 from google.cloud import storage
 from datetime import datetime
 
+STREAM_CHUNK_SIZE = 1024 * 1024  # bytes fetched from GCS per read in streaming mode
+SHARD_SUFFIXES = (".jsonl", ".jsonl.gz")
+SHARD_READ_WORKERS = 4
+SHARD_QUEUE_SIZE = 256  # documents buffered between the shard readers and the consumer
+_SHARD_DONE = object()
+
+
+def validate_entry(url, content):
+    """
+    Validates one URL entry of the knowledge file and returns it as a Document.
+    Raises ValueError if the entry does not match the expected schema.
+    """
+    if not isinstance(content, dict) or 'text_content' not in content or 'metadata' not in content:
+        raise ValueError("Each URL entry must have 'text_content' and 'metadata' fields")
+    metadata = content['metadata']
+    required_fields = ['last_modified', 'scraped_at', 'word_count']
+    if not isinstance(metadata, dict) or not all(field in metadata for field in required_fields):
+        raise ValueError("Metadata must include 'last_modified', 'scraped_at', and 'word_count' fields")
+
+    # Handle None values for datetime fields
+    scraped_at = metadata['scraped_at']
+    last_modified = metadata['last_modified']
+    if scraped_at is not None:
+        try:
+            datetime.fromisoformat(scraped_at.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("'scraped_at' must be a valid ISO 8601 format")
+    if last_modified is not None:
+        try:
+            datetime.fromisoformat(last_modified.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("'last_modified' must be a valid ISO 8601 format")
+
+    # Handle None value for word_count
+    word_count = metadata['word_count']
+    if word_count is not None and not isinstance(word_count, int):
+        raise ValueError("'word_count' must be an integer")
+
+    # Set text_content to empty string if it's None
+    text_content = "" if content['text_content'] is None else content['text_content']
+
+    return Document(
+        page_content=text_content,
+        metadata={
+            'id': url,
+            'url': url,
+            'timestamp': scraped_at,
+            'last_modified': last_modified,
+            'word_count': word_count
+        }
+    )
+
 
 def load_and_validate_json_from_bucket(bucket_name, source_blob_name):
     """
@@ -14,9 +72,7 @@ def load_and_validate_json_from_bucket(bucket_name, source_blob_name):
     storage_client = storage.Client()
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.get_blob(source_blob_name)  # source_blob_name
-    if blob:
-        json_content = blob.download_as_text()
-    else:
+    if not blob:
         print("Blob not found")
         return None
     # Download the file content
@@ -25,53 +81,11 @@ def load_and_validate_json_from_bucket(bucket_name, source_blob_name):
     try:
         # Parse the JSON content
         data = json.loads(json_content)
+        del json_content
         # Validate the JSON structure
         if not isinstance(data, dict):
             raise ValueError("JSON must be a dictionary")
-        documents = []
-        for url, content in data.items():
-            print("processing", url)
-            if not isinstance(content, dict) or 'text_content' not in content or 'metadata' not in content:
-                raise ValueError("Each URL entry must have 'text_content' and 'metadata' fields")
-            metadata = content['metadata']
-            print("metadata", metadata)
-            required_fields = ['last_modified', 'scraped_at', 'word_count']
-            if not all(field in metadata for field in required_fields):
-                raise ValueError("Metadata must include 'last_modified', 'scraped_at', and 'word_count' fields")
-
-            # Handle None values for datetime fields
-            scraped_at = metadata['scraped_at']
-            last_modified = metadata['last_modified']
-            if scraped_at is not None:
-                try:
-                    datetime.fromisoformat(scraped_at.replace('Z', '+00:00'))
-                except ValueError:
-                    raise ValueError("'scraped_at' must be a valid ISO 8601 format")
-            if last_modified is not None:
-                try:
-                    datetime.fromisoformat(last_modified.replace('Z', '+00:00'))
-                except ValueError:
-                    raise ValueError("'last_modified' must be a valid ISO 8601 format")
-
-            # Handle None value for word_count
-            word_count = metadata['word_count']
-            if word_count is not None and not isinstance(word_count, int):
-                raise ValueError("'word_count' must be an integer")
-
-            # Set text_content to empty string if it's None
-            text_content = "" if content['text_content'] is None else content['text_content']
-
-            doc = Document(
-                page_content=text_content,
-                metadata={
-                    'id': url,
-                    'url': url,
-                    'timestamp': scraped_at,
-                    'last_modified': last_modified,
-                    'word_count': word_count
-                }
-            )
-            documents.append(doc)
+        documents = [validate_entry(url, content) for url, content in data.items()]
         print("JSON file has the correct format.")
         return documents
     except json.JSONDecodeError:
@@ -82,17 +96,148 @@ def load_and_validate_json_from_bucket(bucket_name, source_blob_name):
         return None
 
 
-def load_all_documents_in_json(config):
+def stream_documents_from_bucket(bucket_name, source_blob_name, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Streams a JSON file from the specified GCS bucket and lazily yields one Document per URL entry.
+
+    The blob is read as a byte stream in `chunk_size` pieces and parsed incrementally with ijson,
+    so only the entry being validated is held in memory, regardless of the size of the file.
+    Since earlier entries may already have been processed, an invalid entry is skipped with a
+    message instead of rejecting the whole file.
+    """
+    print("Streaming JSON file from bucket...", bucket_name, source_blob_name)
+    storage_client = storage.Client()
+    bucket = storage_client.bucket(bucket_name)
+    blob = bucket.get_blob(source_blob_name)
+    if not blob:
+        print("Blob not found")
+        return
+    valid, skipped = 0, 0
+    with blob.open("rb", chunk_size=chunk_size) as stream:
+        try:
+            # kvitems on the root prefix yields (url, entry) pairs of the top-level object one at a time
+            for url, content in ijson.kvitems(stream, "", use_float=True):
+                try:
+                    document = validate_entry(url, content)
+                except ValueError as e:
+                    skipped += 1
+                    print(f"Skipping {url}: {str(e)}")
+                    continue
+                valid += 1
+                yield document
+        except ijson.JSONError as e:
+            print(f"Error: Invalid JSON format after {valid} entries: {str(e)}")
+    print(f"Streamed {valid} documents from {source_blob_name}, skipped {skipped} invalid entries.")
+
+
+def open_shard_blob(blob, chunk_size=STREAM_CHUNK_SIZE):
+    """Opens a JSON Lines shard blob as a text stream, decompressing .gz shards on the fly."""
+    stream = blob.open("rb", chunk_size=chunk_size)
+    if blob.name.endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def stream_documents_from_shards(bucket_name, prefix, workers=SHARD_READ_WORKERS, queue_size=SHARD_QUEUE_SIZE):
+    """
+    Reads a sharded JSON Lines corpus (one {"url", "text_content", "metadata"} record per line)
+    and lazily yields one validated Document per record.
+
+    Up to `workers` shards are downloaded and parsed in parallel. Documents are handed over through
+    a queue of `queue_size` entries, so readers pause when the consumer falls behind and memory stays
+    bounded by the queue, not by the corpus. Documents of different shards may interleave, so the
+    prefix must hold one record per URL (the data pipeline publishes its current corpus that way);
+    this is not checked, since tracking every URL would grow with the corpus.
+    Invalid records are skipped with a message.
+    """
+    print("Streaming JSONL shards from bucket...", bucket_name, prefix)
+    storage_client = storage.Client()
+    bucket = storage_client.bucket(bucket_name)
+    blobs = sorted(
+        (blob for blob in bucket.list_blobs(prefix=prefix.lstrip("/")) if blob.name.endswith(SHARD_SUFFIXES)),
+        key=lambda blob: blob.name,
+    )
+    if not blobs:
+        print("No shards found")
+        return
+    documents = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    # "skipped" is updated by the reader threads (under counts_lock), "valid" only by the consumer
+    counts = {"valid": 0, "skipped": 0}
+    counts_lock = threading.Lock()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                documents.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_shard(blob):
+        try:
+            with open_shard_blob(blob) as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        document = validate_entry(record.get('url'), record)
+                    except (ValueError, AttributeError) as e:
+                        with counts_lock:
+                            counts["skipped"] += 1
+                        print(f"Skipping record in {blob.name}: {str(e)}")
+                        continue
+                    if not put(document):
+                        return
+        except Exception as e:
+            print(f"Error reading shard {blob.name}: {str(e)}")
+        finally:
+            put(_SHARD_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    for blob in blobs:
+        executor.submit(read_shard, blob)
+    try:
+        finished = 0
+        while finished < len(blobs):
+            item = documents.get()
+            if item is _SHARD_DONE:
+                finished += 1
+                continue
+            counts["valid"] += 1
+            yield item
+    finally:
+        # Also reached when the consumer stops early: let the readers exit
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+    print(f"Streamed {counts['valid']} documents from {len(blobs)} shards, skipped {counts['skipped']} invalid records.")
+
+
+def resolve_bucket_path(config):
     # only loading from bucket, no support for local json file anymore
     default_bucket_name = "cs-crimsonchat"
     default_blob_name = "/rag_knowledge/sample.json"
     if not config.get('bucket_file_path'):
         print(f"No bucket file path provided, using default: {default_bucket_name}/{default_blob_name}")
-        bucket_name = default_bucket_name
-        source_blob_name = default_blob_name
-    else:
-        bucket_name = config['bucket_name']
-        source_blob_name = config['bucket_file_path']
-        print(f"Bucket file path provided, using: {bucket_name}/{source_blob_name}")
+        return default_bucket_name, default_blob_name
+    print(f"Bucket file path provided, using: {config['bucket_name']}/{config['bucket_file_path']}")
+    return config['bucket_name'], config['bucket_file_path']
+
+
+def load_all_documents_in_json(config):
+    bucket_name, source_blob_name = resolve_bucket_path(config)
     documents = load_and_validate_json_from_bucket(bucket_name, source_blob_name)
     return documents
+
+
+def stream_all_documents_in_json(config):
+    """
+    Same as load_all_documents_in_json, but yields the Documents lazily while the data is streamed.
+    A bucket_file_path ending in .json is read as one JSON file; any other path is a prefix of JSONL shards.
+    """
+    bucket_name, source_blob_name = resolve_bucket_path(config)
+    if source_blob_name.endswith(".json"):
+        return stream_documents_from_bucket(bucket_name, source_blob_name)
+    return stream_documents_from_shards(bucket_name, source_blob_name)
@@ -0,0 +1,157 @@
+"""
+pipeline_utils.py
+
+Streaming pipeline of threaded stages connected by bounded queues.
+
+Each stage runs in its own thread, takes items from its input queue, applies its function and
+puts the result on the next stage's queue. Queues are bounded, so a fast stage blocks once it is
+`queue_size` items ahead of a slow one instead of buffering the whole input in memory.
+With chunk -> embed -> upsert stages, the upsert of batch N overlaps the embedding of batch N+1
+and the chunking of batch N+2.
+
+A stage function returning None drops the item (nothing is passed downstream). If any stage
+raises, the pipeline stops feeding new items and the first error is re-raised by run_pipeline.
+
+Usage:
+    from utils.pipeline_utils import run_pipeline, format_stage_stats
+    stats = run_pipeline(batches, [("chunk", chunk_fn), ("embed", embed_fn), ("upsert", upsert_fn)], queue_size=2)
+    print(format_stage_stats(stats))
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    units: int = 0  # total len() of the stage outputs, e.g. chunks or embeddings produced
+    busy_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth_total: int = 0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    @property
+    def units_per_second(self) -> float:
+        return self.units / self.busy_seconds if self.busy_seconds else 0.0
+
+    @property
+    def mean_queue_depth(self) -> float:
+        return self.queue_depth_total / self.items if self.items else 0.0
+
+    @property
+    def utilization(self) -> float:
+        return self.busy_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    """Get with periodic checks of `stop`, so a waiting consumer exits when another stage fails."""
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Put with periodic checks of `stop`, so a blocked producer exits when a later stage fails."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    stages: List[Tuple[str, Callable[[Any], Any]]],
+    queue_size: int = 2
+) -> List[StageStats]:
+    """
+    Run `items` through `stages` concurrently.
+
+    Args:
+        items (Iterable): Input items, consumed lazily by the first stage.
+        stages (List[Tuple[str, Callable]]): (name, function) pairs, applied in order.
+        queue_size (int): Capacity of the queue in front of each stage.
+
+    Returns:
+        List[StageStats]: Per-stage throughput and input queue depth statistics.
+
+    Raises:
+        Exception: The first exception raised by a stage function.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stats = [StageStats(name) for name, _ in stages]
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    start = time.perf_counter()
+
+    def worker(index: int):
+        fn = stages[index][1]
+        stage_stats = stats[index]
+        inbox = queues[index]
+        outbox: Optional[queue.Queue] = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while True:
+                depth = inbox.qsize()
+                item = _get(inbox, stop)
+                if item is _DONE or stop.is_set():
+                    break
+                stage_stats.max_queue_depth = max(stage_stats.max_queue_depth, depth)
+                stage_stats.queue_depth_total += depth
+                started = time.perf_counter()
+                result = fn(item)
+                stage_stats.busy_seconds += time.perf_counter() - started
+                stage_stats.items += 1
+                if result is None:
+                    continue
+                stage_stats.units += len(result) if hasattr(result, "__len__") else 1
+                if outbox is not None and not _put(outbox, result, stop):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            stage_stats.wall_seconds = time.perf_counter() - start
+            if outbox is not None:
+                _put(outbox, _DONE, stop)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"pipeline-{name}", daemon=True) for i, (name, _) in enumerate(stages)]
+    for thread in threads:
+        thread.start()
+    try:
+        for item in items:
+            if not _put(queues[0], item, stop):
+                break
+    finally:
+        _put(queues[0], _DONE, stop)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def format_stage_stats(stats: List[StageStats]) -> str:
+    """Render per-stage statistics as a small text table."""
+    lines = [f"{'stage':<10}{'items':>8}{'units':>10}{'busy s':>10}{'items/s':>10}{'units/s':>10}{'util':>8}{'q max':>8}{'q mean':>8}"]
+    for s in stats:
+        lines.append(
+            f"{s.name:<10}{s.items:>8}{s.units:>10}{s.busy_seconds:>10.2f}{s.items_per_second:>10.2f}"
+            f"{s.units_per_second:>10.2f}{s.utilization:>8.0%}{s.max_queue_depth:>8}{s.mean_queue_depth:>8.2f}"
+        )
+    return "\n".join(lines)
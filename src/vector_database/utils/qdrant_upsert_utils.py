@@ -16,20 +16,63 @@ Usage:
 Output:
     None (performs upsert operation to Qdrant)
 
+Point IDs are deterministic: uuid5 of (url, chunk_id, sha256 of the chunk text). Re-running
+ingestion therefore overwrites points instead of duplicating them, and the content hash is stored
+in the payload as `content_hash`. For incremental re-indexing, select_chunks_to_index drops chunks
+whose point already exists (so they are not embedded again), and prune_stale_points deletes the points
+of previous versions of changed URLs once their new chunks have been written.
+
+After every write, write_collection_version stores a new version in a reserved point
+(COLLECTION_VERSION_POINT_ID, payload `collection_version`). The API reads it to invalidate its
+answer cache, and its searches exclude that point.
+
+Writes go out in slices of `batch_size` points, each retried with exponential backoff and jitter;
+a slice that still fails after the last retry raises, so the ingestion run stops and reports it.
+With bulk=True, points are sent through upload_points with `parallel` workers instead. With wait=False,
+Qdrant acknowledges writes before applying them (fire-and-forget, for large backfills). Pass one
+client created with initialize_qdrant_client to reuse its connection pool across batches.
+
 Note: The collection_name must be manually specified when calling the function.
 
 Author: Artem Dinh
 Date: 10/10/2024
 """
+import hashlib
+import random
 import uuid
 import logging
 import time
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
 from qdrant_client import QdrantClient, models
 # from qdrant_client import http as qhttp
 from langchain.schema import Document
 
 
+# Fixed namespace so the same chunk always maps to the same point ID
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3f4e-8d2a-5b7e-9c1d-2a4b6c8e0f13")
+# Reserved point holding the collection version. The API and RAG services are separate build
+# contexts and keep a copy of this value, so it must never change.
+COLLECTION_VERSION_POINT_ID = str(uuid.uuid5(POINT_ID_NAMESPACE, "collection_version"))
+RETRIEVE_BATCH_SIZE = 1000
+UPSERT_BATCH_SIZE = 256
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 30.0  # seconds
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_point_id(doc: Document) -> str:
+    """Deterministic point ID derived from the chunk's url, chunk_id and content hash."""
+    url = doc.metadata.get('url') or doc.metadata.get('id') or ''
+    chunk_id = doc.metadata.get('chunk_id', 0)
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{url}|{chunk_id}|{content_hash(doc.page_content)}"))
+
+
 def initialize_qdrant_client(qdrant_url: str, qdrant_api_key: str) -> QdrantClient:
     """
     Initialize and return a Qdrant client instance.
@@ -55,12 +98,188 @@ def ensure_collection_exists(qdrant_client: QdrantClient, collection_name: str,
         logging.info(f"Collection {collection_name} already exists")
 
 
-def qdrant_transform_and_upsert(qdrant_url: str, qdrant_api_key: str, documents: List[Document], collection_name: str) -> None:
+def fetch_existing_point_ids(qdrant_client: QdrantClient, collection_name: str, point_ids: List[str]) -> Set[str]:
+    """Return the subset of `point_ids` already stored in the collection."""
+    existing = set()
+    for i in range(0, len(point_ids), RETRIEVE_BATCH_SIZE):
+        records = qdrant_client.retrieve(
+            collection_name=collection_name,
+            ids=point_ids[i:i + RETRIEVE_BATCH_SIZE],
+            with_payload=False,
+            with_vectors=False,
+        )
+        existing.update(str(record.id) for record in records)
+    return existing
+
+
+def delete_stale_points(qdrant_client: QdrantClient, collection_name: str, url: str, keep_ids: List[str]) -> None:
+    """Delete the points of `url` that are not in `keep_ids`, i.e. chunks of a previous version of the page."""
+    qdrant_client.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[models.FieldCondition(key="url", match=models.MatchValue(value=url))],
+                must_not=[models.HasIdCondition(has_id=keep_ids)],
+            )
+        ),
+    )
+
+
+def write_collection_version(qdrant_client: QdrantClient, collection_name: str, vector_size: int, version: Optional[int] = None) -> int:
+    """
+    Store a new collection version (a nanosecond timestamp by default) in the reserved version point.
+
+    Content-hash IDs and stale-point pruning can replace N points with N others, so the point count
+    does not show that the collection changed; readers compare this version instead.
+
+    Returns:
+        int: The version written
+    """
+    version = time.time_ns() if version is None else version
+    point = models.PointStruct(
+        id=COLLECTION_VERSION_POINT_ID,
+        payload={"collection_version": version},
+        # The collection has one unnamed vector, so the marker needs one; searches exclude it by ID
+        vector=[1.0] + [0.0] * (vector_size - 1),
+    )
+    upsert_with_retries(qdrant_client, collection_name, [point])
+    return version
+
+
+@dataclass
+class ChunkSelection:
+    """
+    Result of select_chunks_to_index: the chunks to embed and upsert, and for every URL with new or
+    changed chunks, all point IDs of its current version (`keep_ids_by_url`) and the ones still to be
+    written (`new_ids_by_url`). len() is the number of chunks, so pipeline stage statistics count chunks.
+    """
+    documents: List[Document]
+    keep_ids_by_url: Dict[str, List[str]] = field(default_factory=dict)
+    new_ids_by_url: Dict[str, List[str]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def select_chunks_to_index(qdrant_client: QdrantClient, documents: List[Document], collection_name: str) -> ChunkSelection:
+    """
+    Incremental mode: keep only the chunks whose point is not in the collection yet.
+
+    Since point IDs include the content hash, an unchanged chunk maps to an existing point and is skipped,
+    so it is not embedded again. Nothing is deleted here: the stale points of changed URLs are removed by
+    prune_stale_points once the new chunks have been upserted, so a failed embedding or upsert never
+    leaves a page without any points.
+
+    Args:
+        qdrant_client (QdrantClient): Qdrant client
+        documents (List[Document]): All chunks of the documents being indexed
+        collection_name (str): Target collection
+
+    Returns:
+        ChunkSelection: Chunks that still need to be embedded and upserted, with the point IDs of changed URLs
+    """
+    if not documents or not qdrant_client.collection_exists(collection_name):
+        return ChunkSelection(documents)
+    point_ids = [make_point_id(doc) for doc in documents]
+    existing = fetch_existing_point_ids(qdrant_client, collection_name, point_ids)
+    selection = ChunkSelection([doc for doc, point_id in zip(documents, point_ids) if point_id not in existing])
+
+    ids_by_url = {}
+    for doc, point_id in zip(documents, point_ids):
+        url = doc.metadata.get('url')
+        if not url:
+            continue
+        ids_by_url.setdefault(url, []).append(point_id)
+        if point_id not in existing:
+            selection.new_ids_by_url.setdefault(url, []).append(point_id)
+    selection.keep_ids_by_url = {url: ids_by_url[url] for url in selection.new_ids_by_url}
+
+    logging.info(f"Incremental indexing: {len(selection)}/{len(documents)} chunks are new or changed")
+    return selection
+
+
+def prune_stale_points(qdrant_client: QdrantClient, collection_name: str, selection: ChunkSelection, written_ids: List[str]) -> None:
+    """
+    Delete the points of previous versions of the changed URLs in `selection`, after the upsert.
+
+    A URL is pruned only if all of its new points are in `written_ids` (returned by qdrant_transform_and_upsert).
+    A URL with chunks that failed to embed keeps its old points; the next incremental run selects the
+    missing chunks again and prunes the URL then. Errors from Qdrant are raised.
+    """
+    written = set(written_ids)
+    for url, keep_ids in selection.keep_ids_by_url.items():
+        missing = [point_id for point_id in selection.new_ids_by_url[url] if point_id not in written]
+        if missing:
+            logging.error(f"{len(missing)} new chunks of {url} were not written; keeping its previous points")
+            continue
+        delete_stale_points(qdrant_client, collection_name, url, keep_ids)
+
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter: a random delay in [0, min(max_delay, base_delay * 2**attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def upsert_with_retries(qdrant_client: QdrantClient, collection_name: str, points: List[models.PointStruct], wait: bool = True, max_retries: int = MAX_RETRIES) -> None:
+    """
+    Upsert one slice of points, retrying failures with exponential backoff and jitter.
+
+    Raises:
+        Exception: The error of the last attempt, once all `max_retries` attempts have failed
+    """
+    for attempt in range(max_retries):
+        try:
+            result = qdrant_client.upsert(collection_name=collection_name, points=points, wait=wait)
+            logging.info(f"Qdrant upsert successful: {result}")
+            return
+        except Exception as e:
+            logging.error(f"An unexpected error occurred during Qdrant upsert (Attempt {attempt + 1}/{max_retries}): {e}")
+            if attempt == max_retries - 1:
+                logging.error("Max retries reached. Qdrant upsert failed.")
+                raise
+
+        delay = backoff_delay(attempt)
+        logging.info(f"Retrying in {delay:.1f} seconds...")
+        time.sleep(delay)
+
+
+def qdrant_transform_and_upsert(
+    qdrant_url: str,
+    qdrant_api_key: str,
+    documents: List[Document],
+    collection_name: str,
+    qdrant_client: Optional[QdrantClient] = None,
+    batch_size: int = UPSERT_BATCH_SIZE,
+    parallel: int = 1,
+    wait: bool = True,
+    bulk: bool = False,
+    max_retries: int = MAX_RETRIES
+) -> List[str]:
+    """
+    Transform embedded documents into points and write them to Qdrant.
+
+    Args:
+        qdrant_url (str): Qdrant URL, used when no client is passed
+        qdrant_api_key (str): Qdrant API key, used when no client is passed
+        documents (List[Document]): Documents with an 'embedding' in their metadata
+        collection_name (str): Target collection
+        qdrant_client (QdrantClient): Client reused across batches (optional, a new one is created otherwise)
+        batch_size (int): Number of points per request
+        parallel (int): Number of parallel upload workers (bulk path only)
+        wait (bool): Wait for Qdrant to apply each write; False is fire-and-forget for large backfills
+        bulk (bool): Use upload_points (batched, parallel, retried by the client) instead of upsert calls
+        max_retries (int): Attempts per request
+
+    Returns:
+        List[str]: IDs of the points written
+
+    Raises:
+        Exception: If a write still fails after `max_retries` attempts
+    """
     print("qdrant_transform_and_upsert")
     # Initialize Qdrant client
-    qdrant_client = initialize_qdrant_client(qdrant_url, qdrant_api_key)
-    max_retries = 1
-    retry_delay = 5  # seconds
+    if qdrant_client is None:
+        qdrant_client = initialize_qdrant_client(qdrant_url, qdrant_api_key)
 
     # Transform the documents
     points = []
@@ -80,10 +299,11 @@ def qdrant_transform_and_upsert(qdrant_url: str, qdrant_api_key: str, documents:
 
         # Construct Qdrant point
         point = models.PointStruct(
-            id=str(uuid.uuid4()),
+            id=make_point_id(doc),
             payload={
                 "text": doc.page_content,
-                **{k: v for k, v in doc.metadata.items() if k != 'embedding'}  # Include all metadata fields except 'embedding'
+                **{k: v for k, v in doc.metadata.items() if k != 'embedding'},  # Include all metadata fields except 'embedding'
+                "content_hash": content_hash(doc.page_content),
             },
             vector=embedding  # Ensure embedding is passed correctly
         )
@@ -91,25 +311,26 @@ def qdrant_transform_and_upsert(qdrant_url: str, qdrant_api_key: str, documents:
 
     if not points:
         logging.warning("No valid documents with embeddings to upsert.")
-        return
+        return []
 
     # Ensure the collection exists
     ensure_collection_exists(qdrant_client, collection_name, vector_size)
 
-    # Perform upsert
-    for attempt in range(max_retries):
-        try:
-            result = qdrant_client.upsert(
-                collection_name=collection_name,
-                points=points
-            )
-            logging.info(f"Qdrant upsert successful: {result}")
-            return
-        except Exception as e:
-            logging.error(f"An unexpected error occurred during Qdrant upsert (Attempt {attempt + 1}/{max_retries}): {e}")
+    if bulk:
+        # upload_points splits the points into batch_size requests, sends them from `parallel` workers
+        # and retries failed requests itself
+        qdrant_client.upload_points(
+            collection_name=collection_name,
+            points=points,
+            batch_size=batch_size,
+            parallel=parallel,
+            max_retries=max_retries,
+            wait=wait,
+        )
+        logging.info(f"Qdrant bulk upload of {len(points)} points submitted")
+        return [point.id for point in points]
 
-        if attempt < max_retries - 1:
-            logging.info(f"Retrying in {retry_delay} seconds...")
-            time.sleep(retry_delay)
-        else:
-            logging.error("Max retries reached. Qdrant upsert failed.")
+    # Perform upsert in slices of batch_size points
+    for i in range(0, len(points), batch_size):
+        upsert_with_retries(qdrant_client, collection_name, points[i:i + batch_size], wait=wait, max_retries=max_retries)
+    return [point.id for point in points]
@@ -42,6 +42,8 @@ Usage:
     from your_embedding_module import your_embedding_function
     from langchain_core.documents import Document
 
+    # embedding_function(texts, batch_size=50) must return one embedding row per text,
+    # e.g. embedding_utils.make_batch_embedding_function(model_name, vector_dim)
     chunker = SemanticChunker(embedding_function=your_embedding_function)
     documents = [Document(page_content="Your long text here", metadata={"source": "example.txt"})]
     split_docs = chunker.transform_documents(documents)
@@ -58,91 +60,96 @@ Output:
 
 Dependencies:
 - numpy
-- langchain_community.utils.math
 - langchain_core.documents
 
 Last Modified: 10/10/2024
 """
 import copy
 import re
-from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence, Tuple, cast
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple, cast
 import numpy as np
-from langchain_community.utils.math import cosine_similarity
 from langchain_core.documents import BaseDocumentTransformer, Document
 # from langchain_core.embeddings import Embeddings
 
 
-def combine_sentences(sentences: List[dict], buffer_size: int = 1) -> List[dict]:
-    """Combine sentences based on buffer size.
+def sentence_offsets(sentences: Sequence[str]) -> Tuple[str, np.ndarray, np.ndarray]:
+    """Join sentences with single spaces and return the text with each sentence's start/end offset in it.
 
     Args:
-        sentences: List of sentences to combine.
-        buffer_size: Number of sentences to combine. Defaults to 1.
+        sentences: Sentences to join.
 
     Returns:
-        List of sentences with combined sentences.
+        Tuple of the joined text, start offsets and end offsets (int64 arrays).
     """
+    lengths = np.fromiter((len(x) for x in sentences), dtype=np.int64, count=len(sentences))
+    starts = np.zeros(len(sentences), dtype=np.int64)
+    if len(sentences) > 1:
+        # Each sentence starts after the previous one plus its separating space
+        starts[1:] = np.cumsum(lengths[:-1] + 1)
+    return " ".join(sentences), starts, starts + lengths
 
-    # Go through each sentence dict
-    for i in range(len(sentences)):
-        # Create a string that will hold the sentences which are joined
-        combined_sentence = ""
 
-        # Add sentences before the current one, based on the buffer size.
-        for j in range(i - buffer_size, i):
-            # Check if the index j is not negative
-            # (to avoid index out of range like on the first one)
-            if j >= 0:
-                # Add the sentence at index j to the combined_sentence string
-                combined_sentence += sentences[j]["sentence"] + " "
+def adjacent_cosine_distances(embeddings: Any) -> np.ndarray:
+    """Cosine distance between each row of an (N, D) embedding matrix and the next row.
 
-        # Add the current sentence
-        combined_sentence += sentences[i]["sentence"]
-
-        # Add sentences after the current one, based on the buffer size
-        for j in range(i + 1, i + 1 + buffer_size):
-            # Check if the index j is within the range of the sentences list
-            if j < len(sentences):
-                # Add the sentence at index j to the combined_sentence string
-                combined_sentence += " " + sentences[j]["sentence"]
-
-        # Then add the whole thing to your dict
-        # Store the combined sentence in the current sentence dict
-        sentences[i]["combined_sentence"] = combined_sentence
-
-    return sentences
-
-
-def calculate_cosine_distances(sentences: List[dict]) -> Tuple[List[float], List[dict]]:
-    """Calculate cosine distances between sentences.
+    The rows are stacked into one float32 matrix (no copy if the input already is one),
+    the row norms are computed once and the N - 1 adjacent dot products come from a
+    single vectorized operation, so no second N x D matrix is allocated. Zero vectors
+    get a distance of 1, as with langchain's cosine_similarity.
 
     Args:
-        sentences: List of sentences to calculate distances for.
+        embeddings: (N, D) array or sequence of N embeddings of dimension D.
 
     Returns:
-        Tuple of distances and sentences.
+        float32 array of N - 1 distances.
     """
-    distances = []
-    for i in range(len(sentences) - 1):
-        embedding_current = sentences[i]["combined_sentence_embedding"]
-        embedding_next = sentences[i + 1]["combined_sentence_embedding"]
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] < 2:
+        return np.empty(0, dtype=np.float32)
+    # einsum avoids the N x D temporary that np.linalg.norm allocates
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+    norms[norms == 0] = 1.0
+    similarities = np.einsum("ij,ij->i", matrix[:-1], matrix[1:])
+    similarities /= norms[:-1] * norms[1:]
+    return 1.0 - similarities
+
+
+class SentenceArray:
+    """Compact, array-backed view of a document's sentences.
+
+    Instead of one dict per sentence, a document is held as the sentences joined into one
+    string plus int64 start/end offsets, one contiguous float32 (N, D) embedding matrix and
+    a float32 array of N - 1 adjacent distances. Sentences, combined windows and chunks are
+    all slices of the joined text, so peak memory is dominated by the N x D embeddings.
+    """
+
+    __slots__ = ("text", "starts", "ends", "embeddings", "distances")
 
-        # Calculate cosine similarity
-        similarity = cosine_similarity([embedding_current], [embedding_next])[0][0]
+    def __init__(self, sentences: Sequence[str]):
+        self.text, self.starts, self.ends = sentence_offsets(sentences)
+        self.embeddings: Optional[np.ndarray] = None
+        self.distances: Optional[np.ndarray] = None
 
-        # Convert to cosine distance
-        distance = 1 - similarity
+    def __len__(self) -> int:
+        return len(self.starts)
 
-        # Append cosine distance to the list
-        distances.append(distance)
+    def sentence(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
 
-        # Store distance in the dictionary
-        sentences[i]["distance_to_next"] = distance
+    def span(self, first: int, last: int) -> str:
+        """Sentences first..last (inclusive) joined with spaces."""
+        return self.text[self.starts[first]:self.ends[last]]
 
-    # Optionally handle the last sentence
-    # sentences[-1]['distance_to_next'] = None  # or a default value
+    def windows(self, buffer_size: int) -> Iterator[str]:
+        """Each sentence combined with `buffer_size` neighbours on both sides."""
+        last = len(self) - 1
+        for i in range(len(self)):
+            yield self.span(max(0, i - buffer_size), min(last, i + buffer_size))
 
-    return distances, sentences
+    def set_embeddings(self, embeddings: Any) -> None:
+        """Store the window embeddings and compute the adjacent distances."""
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.distances = adjacent_cosine_distances(self.embeddings)
 
 
 BreakpointThresholdType = Literal[
@@ -177,6 +184,8 @@ class SemanticChunker(BaseDocumentTransformer):
         number_of_chunks: Optional[int] = None,
         sentence_split_regex: str = r"(?<=[.?!])\s+",
         embedding_function=None,
+        embedding_batch_size: int = 50,
+        cross_document_batching: bool = False,
     ):
         self._add_start_index = add_start_index
         self.buffer_size = buffer_size
@@ -190,6 +199,9 @@ class SemanticChunker(BaseDocumentTransformer):
         else:
             self.breakpoint_threshold_amount = breakpoint_threshold_amount
         self.embedding_function = embedding_function
+        self.embedding_batch_size = embedding_batch_size
+        # Embed the sentences of all documents passed to create_documents in shared batches
+        self.cross_document_batching = cross_document_batching
 
     def _calculate_breakpoint_threshold(
         self, distances: List[float]
@@ -248,42 +260,75 @@ class SemanticChunker(BaseDocumentTransformer):
 
         return cast(float, np.percentile(distances, y))
 
-    def _calculate_sentence_distances(
-        self, single_sentences_list: List[str]
-    ) -> Tuple[List[float], List[dict]]:
-        """Split text into multiple components."""
-
-        _sentences = [
-            {"sentence": x, "index": i} for i, x in enumerate(single_sentences_list)
-        ]
-        sentences = combine_sentences(_sentences, self.buffer_size)
-        # print(sentences)
-        # embeddings = self.embeddings.embed_documents(
-        #     [x["combined_sentence"] for x in sentences]
-        # )
-        embeddings = self.embedding_function([x["combined_sentence"] for x in sentences], batch_size=50)
-        for i, sentence in enumerate(sentences):
-            sentence["combined_sentence_embedding"] = embeddings[i]
-
-        return calculate_cosine_distances(sentences)
+    def _calculate_sentence_distances(self, sentences: SentenceArray) -> np.ndarray:
+        """Embed the combined sentences and return the distances between neighbours."""
+        sentences.set_embeddings(self.embedding_function(
+            list(sentences.windows(self.buffer_size)),
+            batch_size=self.embedding_batch_size,
+        ))
+        return sentences.distances
 
-    def split_text(
-        self,
-        text: str,
-    ) -> List[str]:
+    def _split_sentences(self, text: str) -> Tuple[List[str], bool]:
+        """Split text into sentences; the flag is False when there is nothing to threshold."""
         # Splitting the essay (by default on '.', '?', and '!')
         single_sentences_list = re.split(self.sentence_split_regex, text)
 
         # having len(single_sentences_list) == 1 would cause the following
         # np.percentile to fail.
         if len(single_sentences_list) == 1:
-            return single_sentences_list
+            return single_sentences_list, False
         # similarly, the following np.gradient would fail
         if (
             self.breakpoint_threshold_type == "gradient" and len(single_sentences_list) == 2
         ):
+            return single_sentences_list, False
+        return single_sentences_list, True
+
+    def split_text(
+        self,
+        text: str,
+    ) -> List[str]:
+        single_sentences_list, needs_split = self._split_sentences(text)
+        if not needs_split:
             return single_sentences_list
-        distances, sentences = self._calculate_sentence_distances(single_sentences_list)
+        sentences = SentenceArray(single_sentences_list)
+        del single_sentences_list
+        distances = self._calculate_sentence_distances(sentences)
+        return self._chunks_from_distances(distances, sentences)
+
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
+        """Split many texts, sharing embedding batches across them.
+
+        The combined sentences of all texts are embedded together, so short documents
+        are packed into the same `embedding_batch_size` requests instead of each paying
+        for its own round-trip. The embedding rows are then handed back per text (as views
+        of the shared matrix), and distances and thresholds are computed per text exactly
+        as in split_text.
+        """
+        prepared = []
+        all_combined: List[str] = []
+        for text in texts:
+            single_sentences_list, needs_split = self._split_sentences(text)
+            if not needs_split:
+                prepared.append((single_sentences_list, 0))
+                continue
+            sentences = SentenceArray(single_sentences_list)
+            prepared.append((sentences, len(all_combined)))
+            all_combined.extend(sentences.windows(self.buffer_size))
+
+        embeddings = np.asarray(self.embedding_function(all_combined, batch_size=self.embedding_batch_size), dtype=np.float32) if all_combined else None
+        del all_combined
+
+        results = []
+        for sentences, offset in prepared:
+            if not isinstance(sentences, SentenceArray):
+                results.append(sentences)
+                continue
+            sentences.set_embeddings(embeddings[offset:offset + len(sentences)])
+            results.append(self._chunks_from_distances(sentences.distances, sentences))
+        return results
+
+    def _chunks_from_distances(self, distances: np.ndarray, sentences: SentenceArray) -> List[str]:
         if self.number_of_chunks is not None:
             breakpoint_distance_threshold = self._threshold_from_clusters(distances)
             breakpoint_array = distances
@@ -293,41 +338,35 @@ class SemanticChunker(BaseDocumentTransformer):
                 breakpoint_array,
             ) = self._calculate_breakpoint_threshold(distances)
 
-        indices_above_thresh = [
-            i
-            for i, x in enumerate(breakpoint_array)
-            if x > breakpoint_distance_threshold
-        ]
+        indices_above_thresh = np.flatnonzero(np.asarray(breakpoint_array) > breakpoint_distance_threshold)
 
         chunks = []
         start_index = 0
 
         # Iterate through the breakpoints to slice the sentences
         for index in indices_above_thresh:
-            # The end index is the current breakpoint
-            end_index = index
-
-            # Slice the sentence_dicts from the current start index to the end index
-            group = sentences[start_index:end_index + 1]
-            combined_text = " ".join([d["sentence"] for d in group])
-            chunks.append(combined_text)
+            # The end index is the current breakpoint; the chunk is one slice of the joined text
+            chunks.append(sentences.span(start_index, index))
 
             # Update the start index for the next group
             start_index = index + 1
 
         # The last group, if any sentences remain
         if start_index < len(sentences):
-            combined_text = " ".join([d["sentence"] for d in sentences[start_index:]])
-            chunks.append(combined_text)
+            chunks.append(sentences.span(start_index, len(sentences) - 1))
         return chunks
 
     def create_documents(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[Document]:
         """Create documents from a list of texts."""
         _metadatas = metadatas or [{}] * len(texts)
+        if self.cross_document_batching:
+            splits = self.split_texts(texts)
+        else:
+            splits = [self.split_text(text) for text in texts]
         documents = []
-        for i, text in enumerate(texts):
+        for i, chunks in enumerate(splits):
             start_index = 0
-            for chunk_id, chunk in enumerate(self.split_text(text)):
+            for chunk_id, chunk in enumerate(chunks):
                 metadata = copy.deepcopy(_metadatas[i])
                 if self._add_start_index:
                     metadata["start_index"] = start_index